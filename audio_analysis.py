@@ -0,0 +1,186 @@
+import subprocess
+from ffmpeg_tools import get_ffmpeg_binary
+
+# Decoding parameters for fingerprinting: mono, low sample rate, short frames
+FINGERPRINT_SAMPLE_RATE = 8000
+FINGERPRINT_FFT_SIZE = 512
+FINGERPRINT_HOP = 256
+# Spectral peaks kept per second of audio and pairs formed per anchor peak
+PEAKS_PER_SECOND = 10
+FAN_OUT = 3
+# Peaks must be the maximum of this many frames/bins around them
+PEAK_NEIGHBORHOOD_FRAMES = 15
+PEAK_NEIGHBORHOOD_BINS = 15
+# Longest time between paired peaks, in frames
+MAX_PAIR_FRAMES = 63
+# Energy envelope for silence trimming: RMS over short windows of mono audio
+ENERGY_SAMPLE_RATE = 8000
+ENERGY_WINDOW_MS = 20
+# Speech is louder than the film's noise floor (a low percentile) by this much
+SPEECH_MARGIN_DB = 12.0
+SPEECH_MIN_DB = -50.0
+# Windows in a row above the threshold that count as speech, so clicks don't
+SPEECH_MIN_WINDOWS = 5
+
+def iter_audio_chunks(video_path, sample_rate, chunk_seconds=60):
+    """Decode the first audio track to mono float32 and yield it in chunks.
+
+    The decoded track is streamed from ffmpeg, so memory use does not grow
+    with the length of the film.
+    """
+    import numpy as np
+    process = subprocess.Popen(
+        [
+            get_ffmpeg_binary(), "-hide_banner", "-loglevel", "error",
+            "-i", video_path,
+            "-map", "0:a:0", "-vn",
+            "-ac", "1", "-ar", str(sample_rate),
+            "-f", "s16le", "pipe:1"
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE
+    )
+    chunk_bytes = int(sample_rate * chunk_seconds) * 2
+    try:
+        while True:
+            data = process.stdout.read(chunk_bytes)
+            if not data:
+                break
+            data = data[:len(data) // 2 * 2]
+            yield np.frombuffer(data, dtype=np.int16).astype(np.float32) / 32768.0
+    finally:
+        process.stdout.close()
+        stderr = process.stderr.read()
+        if process.wait() != 0:
+            raise RuntimeError(f"ffmpeg failed: {stderr.decode(errors='replace').strip()}")
+
+def local_maxima(values, frames, bins):
+    """Mask of cells equal to the maximum of their frames x bins neighborhood"""
+    import numpy as np
+    from numpy.lib.stride_tricks import sliding_window_view
+    padded = np.pad(values, ((0, 0), (bins // 2, bins // 2)), mode="constant", constant_values=-np.inf)
+    neighborhood = sliding_window_view(padded, bins, axis=1).max(axis=2)
+    padded = np.pad(neighborhood, ((frames // 2, frames // 2), (0, 0)), mode="constant", constant_values=-np.inf)
+    neighborhood = sliding_window_view(padded, frames, axis=0).max(axis=2)
+    return values >= neighborhood
+
+def spectral_peaks(chunks, sample_rate=FINGERPRINT_SAMPLE_RATE, fft_size=FINGERPRINT_FFT_SIZE, hop=FINGERPRINT_HOP):
+    """(frame, bin) of the strongest spectral peaks, as two int32 arrays sorted by frame"""
+    import numpy as np
+    from numpy.lib.stride_tricks import sliding_window_view
+    window = np.hanning(fft_size).astype(np.float32)
+    carry = np.zeros(0, dtype=np.float32)
+    frame_offset = 0
+    peak_frames = []
+    peak_bins = []
+    for chunk in chunks:
+        samples = np.concatenate([carry, chunk])
+        if len(samples) < fft_size:
+            carry = samples
+            continue
+        frames = sliding_window_view(samples, fft_size)[::hop]
+        # Frames that don't fit yet are carried into the next chunk
+        carry = samples[len(frames) * hop:]
+        spectrum = np.log1p(np.abs(np.fft.rfft(frames * window, axis=1)).astype(np.float32))
+        candidates = local_maxima(spectrum, PEAK_NEIGHBORHOOD_FRAMES, PEAK_NEIGHBORHOOD_BINS)
+        candidates &= spectrum > np.median(spectrum) + 1e-3
+        frame_idx, bin_idx = np.nonzero(candidates)
+        keep = int(len(frames) * hop / sample_rate * PEAKS_PER_SECOND) + 1
+        if len(frame_idx) > keep:
+            strongest = np.argpartition(spectrum[frame_idx, bin_idx], -keep)[-keep:]
+            frame_idx, bin_idx = frame_idx[strongest], bin_idx[strongest]
+        peak_frames.append(frame_idx + frame_offset)
+        peak_bins.append(bin_idx)
+        frame_offset += len(frames)
+    if not peak_frames:
+        return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32)
+    frames = np.concatenate(peak_frames).astype(np.int32)
+    bins = np.concatenate(peak_bins).astype(np.int32)
+    order = np.argsort(frames, kind="stable")
+    return frames[order], bins[order]
+
+def peak_hashes(frames, bins, fan_out=FAN_OUT, max_pair_frames=MAX_PAIR_FRAMES):
+    """Pair each peak with the next fan_out peaks into (hash, anchor frame) arrays.
+
+    A hash packs the two frequency bins and their time distance, so it survives
+    re-encoding and does not depend on where the film starts.
+    """
+    import numpy as np
+    hashes = []
+    anchors = []
+    for k in range(1, fan_out + 1):
+        if len(frames) <= k:
+            break
+        delta = frames[k:] - frames[:-k]
+        valid = (delta > 0) & (delta <= max_pair_frames)
+        first = bins[:-k][valid].astype(np.uint32)
+        second = bins[k:][valid].astype(np.uint32)
+        hashes.append((first << 20) | (second << 10) | delta[valid].astype(np.uint32))
+        anchors.append(frames[:-k][valid])
+    if not hashes:
+        return np.zeros(0, dtype=np.uint32), np.zeros(0, dtype=np.int32)
+    return np.concatenate(hashes), np.concatenate(anchors).astype(np.int32)
+
+def fingerprint_audio(video_path):
+    """Fingerprint a film's audio track; returns (hashes, anchor frames)"""
+    chunks = iter_audio_chunks(video_path, FINGERPRINT_SAMPLE_RATE)
+    frames, bins = spectral_peaks(chunks)
+    return peak_hashes(frames, bins)
+
+def frames_to_ms(frames):
+    return frames * FINGERPRINT_HOP * 1000.0 / FINGERPRINT_SAMPLE_RATE
+
+def energy_envelope(video_path, sample_rate=ENERGY_SAMPLE_RATE, window_ms=ENERGY_WINDOW_MS):
+    """RMS energy of the audio track per window_ms window, as a float32 array"""
+    import numpy as np
+    window = int(sample_rate * window_ms / 1000)
+    carry = np.zeros(0, dtype=np.float32)
+    envelope = []
+    for chunk in iter_audio_chunks(video_path, sample_rate):
+        samples = np.concatenate([carry, chunk])
+        usable = len(samples) // window * window
+        carry = samples[usable:]
+        windows = samples[:usable].reshape(-1, window)
+        envelope.append(np.sqrt(np.mean(windows * windows, axis=1)))
+    if len(carry):
+        envelope.append(np.sqrt(np.mean(carry * carry, keepdims=True)))
+    if not envelope:
+        return np.zeros(0, dtype=np.float32)
+    return np.concatenate(envelope).astype(np.float32)
+
+def speech_mask(envelope):
+    """Mask of windows inside runs of speech-level energy"""
+    import numpy as np
+    levels = 20 * np.log10(np.maximum(envelope, 1e-6))
+    threshold = max(np.percentile(levels, 10) + SPEECH_MARGIN_DB, SPEECH_MIN_DB) if len(levels) else SPEECH_MIN_DB
+    loud = (levels > threshold).astype(np.int32)
+    # Keep windows covered by a run of at least SPEECH_MIN_WINDOWS loud ones
+    run = np.convolve(loud, np.ones(SPEECH_MIN_WINDOWS, dtype=np.int32), mode="valid") == SPEECH_MIN_WINDOWS
+    mask = np.zeros(len(loud), dtype=bool)
+    for offset in range(SPEECH_MIN_WINDOWS):
+        mask[offset:offset + len(run)] |= run
+    return mask
+
+def speech_bounds(envelope, start_ms, end_ms, tolerance_ms, pad_ms=150, window_ms=ENERGY_WINDOW_MS, mask=None):
+    """Tighten [start_ms, end_ms] to the speech inside it.
+
+    The start moves forward to just before the first speech onset and the end
+    back to just after the last speech offset, each by at most tolerance_ms.
+    Bounds with no speech near them are only moved by the tolerance; a span
+    with no speech at all is returned unchanged.
+    """
+    import numpy as np
+    if mask is None:
+        mask = speech_mask(envelope)
+    first = int(start_ms // window_ms)
+    last = min(int(np.ceil(end_ms / window_ms)), len(mask))
+    speech = np.flatnonzero(mask[first:last])
+    if first >= last or len(speech) == 0:
+        return start_ms, end_ms
+    onset_ms = (first + int(speech[0])) * window_ms - pad_ms
+    offset_ms = (first + int(speech[-1]) + 1) * window_ms + pad_ms
+    new_start = min(max(onset_ms, start_ms), start_ms + tolerance_ms)
+    new_end = max(min(offset_ms, end_ms), end_ms - tolerance_ms)
+    if new_end <= new_start:
+        return start_ms, end_ms
+    return new_start, new_end
@@ -0,0 +1,313 @@
+"""Backfill text artifacts for every stored transcript through the Message Batches API.
+
+Builds one request per missing or stale artifact (see artifact_status in
+main.py) of every film in transcripts/, submits them as message batches, polls
+until the batches end and writes the results to the usual
+transcripts/{video}_{artifact}.txt files along with their input hashes.
+Submitted batch IDs are kept in catalog/backfill_batches.json, so an
+interrupted run picks up its batches instead of resubmitting. impact_orgs
+needs the target audience analysis, so it goes out in a later round once that
+exists. Run it from the app's working directory.
+
+Usage:
+    python backfill.py [--poll-seconds 60] [--include-untracked] [--dry-run]
+
+Local stand-in for the batch endpoint:
+    python backfill.py --stub-server 8766 [--stub-latency 5]
+    ANTHROPIC_BASE_URL=http://127.0.0.1:8766 ANTHROPIC_API_KEY=stub python backfill.py --poll-seconds 1
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import threading
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Limits per batch, kept below the API's 100,000 requests and 256 MB
+BATCH_MAX_REQUESTS = 10000
+BATCH_MAX_BYTES = 200 * 1024 * 1024
+# Dependency rounds per run (impact_orgs waits for target_audience)
+MAX_ROUNDS = 3
+
+def get_batches(client):
+    """The batches resource (client.beta on SDKs from before batches left beta)"""
+    batches = getattr(client.messages, "batches", None)
+    return batches if batches is not None else client.beta.messages.batches
+
+def load_state(state_path):
+    if not os.path.exists(state_path):
+        return {"batches": {}}
+    with open(state_path, 'r') as f:
+        return json.load(f)
+
+def save_state(state_path, state):
+    tmp_path = f"{state_path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, state_path)
+
+def request_id(video_name, artifact):
+    """custom_id of a request; must be at most 64 of [A-Za-z0-9_-]"""
+    return f"{hashlib.sha1(video_name.encode()).hexdigest()[:24]}-{artifact}"
+
+def in_flight_requests(state):
+    return {
+        (request['video_name'], request['artifact'])
+        for batch in state["batches"].values() if not batch["done"]
+        for request in batch["requests"].values()
+    }
+
+def pending_requests(app, include_untracked, skip):
+    """Requests for every artifact that needs (re)generating and whose inputs are ready"""
+    regenerate = {"missing", "stale", "untracked"} if include_untracked else {"missing", "stale"}
+    requests = []
+    for name in sorted(os.listdir(app.TRANSCRIPTS_DIR)):
+        if not name.endswith("_transcript.json"):
+            continue
+        video_name = name[:-len("_transcript.json")]
+        with open(os.path.join(app.TRANSCRIPTS_DIR, name), 'r') as f:
+            transcript_text = json.load(f)['text']
+        statuses = {
+            artifact: app.artifact_status(video_name, artifact, transcript_text)
+            for artifact in app.ARTIFACTS
+        }
+        for artifact in app.ARTIFACTS:
+            if statuses[artifact] not in regenerate or (video_name, artifact) in skip:
+                continue
+            dependencies = app.ARTIFACT_DEPENDENCIES.get(artifact, [])
+            if any(statuses[dependency] in regenerate or (video_name, dependency) in skip for dependency in dependencies):
+                # Goes out in a later round, built on the new dependency
+                continue
+            target_audience_text = app.load_artifact(video_name, "target_audience") if dependencies else None
+            if dependencies and not target_audience_text:
+                continue
+            requests.append({
+                "custom_id": request_id(video_name, artifact),
+                "video_name": video_name,
+                "artifact": artifact,
+                "inputs": app.artifact_inputs(artifact, transcript_text, target_audience_text),
+                "params": {
+                    "model": app.claude3_sonnet_model,
+                    "max_tokens": 2048,
+                    "messages": [{
+                        "role": "user",
+                        "content": app.artifact_prompt(artifact, transcript_text, target_audience_text)
+                    }]
+                }
+            })
+    return requests
+
+def split_batches(requests):
+    """Group requests into batches under the request-count and size limits"""
+    batch = []
+    batch_bytes = 0
+    for request in requests:
+        request_bytes = len(json.dumps(request["params"]).encode())
+        if batch and (len(batch) >= BATCH_MAX_REQUESTS or batch_bytes + request_bytes > BATCH_MAX_BYTES):
+            yield batch
+            batch = []
+            batch_bytes = 0
+        batch.append(request)
+        batch_bytes += request_bytes
+    if batch:
+        yield batch
+
+def submit_requests(client, requests, state, state_path):
+    for batch_requests in split_batches(requests):
+        batch = get_batches(client).create(requests=[
+            {"custom_id": request["custom_id"], "params": request["params"]}
+            for request in batch_requests
+        ])
+        # Saved right away so a crash after submitting never resubmits the batch
+        state["batches"][batch.id] = {
+            "submitted_at": datetime.now().isoformat(),
+            "done": False,
+            "requests": {
+                request["custom_id"]: {
+                    "video_name": request["video_name"],
+                    "artifact": request["artifact"],
+                    "inputs": request["inputs"]
+                }
+                for request in batch_requests
+            }
+        }
+        save_state(state_path, state)
+        print(f"Submitted batch {batch.id} with {len(batch_requests)} requests")
+
+def collect_results(app, client, batch_id, batch_state):
+    """Write a finished batch's results; returns (succeeded, failed)"""
+    succeeded = failed = 0
+    for entry in get_batches(client).results(batch_id):
+        request = batch_state["requests"].get(entry.custom_id)
+        if request is None:
+            continue
+        if entry.result.type == "succeeded" and entry.result.message.content:
+            app.save_artifact(
+                request["video_name"],
+                request["artifact"],
+                entry.result.message.content[0].text,
+                request["inputs"]
+            )
+            succeeded += 1
+        else:
+            print(f"{request['artifact']} for {request['video_name']}: {entry.result.type}")
+            failed += 1
+    return succeeded, failed
+
+def wait_for_batches(app, client, state, state_path, poll_seconds):
+    """Poll unfinished batches until all have ended, writing results as they do"""
+    while True:
+        unfinished = [batch_id for batch_id, batch in state["batches"].items() if not batch["done"]]
+        if not unfinished:
+            return
+        for batch_id in unfinished:
+            batch = get_batches(client).retrieve(batch_id)
+            counts = batch.request_counts
+            if batch.processing_status != "ended":
+                print(f"Batch {batch_id}: {counts.processing} processing, {counts.succeeded} succeeded")
+                continue
+            succeeded, failed = collect_results(app, client, batch_id, state["batches"][batch_id])
+            state["batches"][batch_id]["done"] = True
+            save_state(state_path, state)
+            print(f"Batch {batch_id} ended: {succeeded} written, {failed} failed")
+        if any(not batch["done"] for batch in state["batches"].values()):
+            time.sleep(poll_seconds)
+
+def run_backfill(args):
+    # Importing the app must not start its background transcription watcher
+    os.environ["DFS_BACKGROUND_JOBS"] = "0"
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import main as app
+
+    client = app.get_client()
+    state_path = os.path.join(app.CATALOG_DIR, "backfill_batches.json")
+    state = load_state(state_path)
+
+    # Finish batches left over from an interrupted run first
+    wait_for_batches(app, client, state, state_path, args.poll_seconds)
+    for round_number in range(1, MAX_ROUNDS + 1):
+        requests = pending_requests(app, args.include_untracked, in_flight_requests(state))
+        if not requests:
+            print("Nothing left to backfill")
+            return
+        print(f"Round {round_number}: {len(requests)} requests across {len({r['video_name'] for r in requests})} films")
+        if args.dry_run:
+            for request in requests:
+                print(f"  {request['video_name']}: {request['artifact']}")
+            return
+        submit_requests(client, requests, state, state_path)
+        wait_for_batches(app, client, state, state_path, args.poll_seconds)
+
+class StubBatchHandler(BaseHTTPRequestHandler):
+    """Minimal stand-in for the Message Batches endpoints"""
+    batches = {}
+    lock = threading.Lock()
+    latency = 5.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, value):
+        body = json.dumps(value).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _batch_json(self, batch_id):
+        batch = self.batches[batch_id]
+        ended = time.time() >= batch["ends_at"]
+        created = datetime.fromtimestamp(batch["created_at"], timezone.utc)
+        host = self.headers.get("Host")
+        return {
+            "id": batch_id,
+            "type": "message_batch",
+            "processing_status": "ended" if ended else "in_progress",
+            "request_counts": {
+                "processing": 0 if ended else len(batch["requests"]),
+                "succeeded": len(batch["requests"]) if ended else 0,
+                "errored": 0,
+                "canceled": 0,
+                "expired": 0
+            },
+            "created_at": created.isoformat(),
+            "expires_at": (created + timedelta(days=1)).isoformat(),
+            "ended_at": datetime.fromtimestamp(batch["ends_at"], timezone.utc).isoformat() if ended else None,
+            "cancel_initiated_at": None,
+            "archived_at": None,
+            "results_url": f"http://{host}/v1/messages/batches/{batch_id}/results" if ended else None
+        }
+
+    def do_POST(self):
+        if self.path.split("?")[0] != "/v1/messages/batches":
+            self.send_error(404)
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        with self.lock:
+            batch_id = f"msgbatch_stub_{len(self.batches) + 1:06d}"
+            now = time.time()
+            self.batches[batch_id] = {"requests": body["requests"], "created_at": now, "ends_at": now + self.latency}
+        self._send_json(self._batch_json(batch_id))
+
+    def do_GET(self):
+        parts = self.path.split("?")[0].strip("/").split("/")
+        if parts[:3] != ["v1", "messages", "batches"] or len(parts) < 4 or parts[3] not in self.batches:
+            self.send_error(404)
+            return
+        batch_id = parts[3]
+        if len(parts) == 4:
+            self._send_json(self._batch_json(batch_id))
+            return
+        lines = []
+        for request in self.batches[batch_id]["requests"]:
+            prompt = request["params"]["messages"][0]["content"]
+            lines.append(json.dumps({
+                "custom_id": request["custom_id"],
+                "result": {
+                    "type": "succeeded",
+                    "message": {
+                        "id": f"msg_{request['custom_id']}",
+                        "type": "message",
+                        "role": "assistant",
+                        "model": request["params"]["model"],
+                        "content": [{"type": "text", "text": f"[stub] {' '.join(prompt.split()[:40])}"}],
+                        "stop_reason": "end_turn",
+                        "stop_sequence": None,
+                        "usage": {"input_tokens": len(prompt.split()), "output_tokens": 40}
+                    }
+                }
+            }))
+        body = ("\n".join(lines) + "\n").encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/binary")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+def run_stub_server(port, latency):
+    StubBatchHandler.latency = latency
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubBatchHandler)
+    print(f"Stub batch endpoint on http://127.0.0.1:{port} (batches end after {latency:.0f}s)")
+    server.serve_forever()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--poll-seconds", type=float, default=60.0, help="Seconds between batch status checks")
+    parser.add_argument("--include-untracked", action="store_true",
+                        help="Also regenerate artifacts saved without a record of their inputs")
+    parser.add_argument("--dry-run", action="store_true", help="List the requests of the first round and exit")
+    parser.add_argument("--stub-server", type=int, metavar="PORT", help="Serve a local stand-in for the batch endpoint")
+    parser.add_argument("--stub-latency", type=float, default=5.0, help="Seconds until a stub batch ends")
+    args = parser.parse_args()
+
+    if args.stub_server:
+        run_stub_server(args.stub_server, args.stub_latency)
+    else:
+        run_backfill(args)
+
+if __name__ == "__main__":
+    main()
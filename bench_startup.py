@@ -0,0 +1,90 @@
+"""Measure cold-start import time of the app, per module.
+
+Runs `python -X importtime -c "import main"` in a fresh interpreter (inside a
+scratch working directory, since the app creates its folders in the cwd) and
+reports the slowest top-level imports. Exits non-zero when the total exceeds
+the budget, so it can guard a cold-start budget in CI.
+
+Usage:
+    python bench_startup.py [--budget-ms 1500] [--runs 3] [--top 15] [--output bench_output.txt]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def measure_import(module="main"):
+    """Import a module in a fresh interpreter and return (wall seconds, import records)"""
+    env = dict(os.environ, PYTHONPATH=APP_DIR + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=scratch_dir,
+            env=env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True
+        )
+        wall = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+    records = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        records.append({
+            "module": name.strip(),
+            "depth": (len(name) - len(name.lstrip()) - 1) // 2,
+            "self_ms": int(self_us) / 1000,
+            "cumulative_ms": int(cumulative_us) / 1000
+        })
+    return wall, records
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("COLD_START_BUDGET_MS", "1500")))
+    parser.add_argument("--runs", type=int, default=3, help="Repetitions; the fastest run is reported")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--output", help="Append a JSON result line to this file")
+    args = parser.parse_args()
+
+    runs = [measure_import(args.module) for _ in range(args.runs)]
+    wall, records = min(runs, key=lambda run: run[0])
+    top_level = sorted(
+        (record for record in records if record["depth"] == 0),
+        key=lambda record: record["cumulative_ms"],
+        reverse=True
+    )
+    total_ms = sum(record["cumulative_ms"] for record in top_level)
+
+    print(f"Cold start of '{args.module}': {total_ms:.1f} ms in imports, {wall * 1000:.1f} ms wall (best of {args.runs})")
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for record in top_level[:args.top]:
+        print(f"{record['cumulative_ms']:>14.1f} {record['self_ms']:>9.1f}  {record['module']}")
+
+    if args.output:
+        with open(args.output, 'a') as f:
+            f.write(json.dumps({
+                "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "module": args.module,
+                "import_ms": round(total_ms, 1),
+                "wall_ms": round(wall * 1000, 1),
+                "modules": {record["module"]: record["cumulative_ms"] for record in top_level}
+            }) + "\n")
+
+    if total_ms > args.budget_ms:
+        print(f"Over cold-start budget: {total_ms:.1f} ms > {args.budget_ms:.1f} ms")
+        sys.exit(1)
+    print(f"Within cold-start budget of {args.budget_ms:.1f} ms")
+
+if __name__ == "__main__":
+    main()
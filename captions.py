@@ -0,0 +1,141 @@
+import os
+
+# Cue layout limits (common broadcast and platform guidelines)
+CAPTION_MAX_LINE_CHARS = 42
+CAPTION_MAX_LINES = 2
+# Reading speed: a cue stays up long enough to read at this many characters per second
+CAPTION_MAX_CHARS_PER_SECOND = 17
+CAPTION_MIN_DURATION_MS = 1000
+CAPTION_MAX_DURATION_MS = 7000
+# A pause in speech at least this long always starts a new cue
+CAPTION_PAUSE_MS = 1200
+
+def wrap_lines(text, max_line_chars=CAPTION_MAX_LINE_CHARS, max_lines=CAPTION_MAX_LINES):
+    """Break cue text into at most max_lines lines of similar length, or None if it doesn't fit"""
+    if len(text) <= max_line_chars:
+        return [text]
+    if max_lines < 2:
+        return None
+    words = text.split(" ")
+    best = None
+    for i in range(1, len(words)):
+        first = " ".join(words[:i])
+        if len(first) > max_line_chars:
+            break
+        rest = wrap_lines(" ".join(words[i:]), max_line_chars, max_lines - 1)
+        if rest is None:
+            continue
+        lines = [first] + rest
+        longest = max(len(line) for line in lines)
+        if best is None or longest < best[0]:
+            best = (longest, lines)
+    return best[1] if best else None
+
+def iter_cues(words, start_ms=0, end_ms=None,
+              max_line_chars=CAPTION_MAX_LINE_CHARS, max_lines=CAPTION_MAX_LINES,
+              max_chars_per_second=CAPTION_MAX_CHARS_PER_SECOND):
+    """Group [start_ms, end_ms, text] words into cues of (start_ms, end_ms, lines).
+
+    Only words inside [start_ms, end_ms) are used and cue times are relative to
+    start_ms. A cue ends when its text would no longer fit in max_lines lines,
+    at a long pause, after CAPTION_MAX_DURATION_MS, or at the end of a sentence
+    once it is half full. Cues are then kept on screen long enough to read at
+    max_chars_per_second, up to the start of the next cue.
+    """
+    max_chars = max_line_chars * max_lines
+    pending = None
+    cue = []
+    cue_text = ""
+
+    def close(cue, next_start):
+        first_ms = max(cue[0][0], start_ms) - start_ms
+        last_ms = cue[-1][1] - start_ms
+        if end_ms is not None:
+            last_ms = min(last_ms, end_ms - start_ms)
+        text = " ".join(word[2] for word in cue)
+        needed_ms = max(CAPTION_MIN_DURATION_MS, len(text) * 1000 // max_chars_per_second)
+        cue_end = max(last_ms, first_ms + needed_ms)
+        if next_start is not None:
+            cue_end = min(cue_end, next_start - start_ms)
+        if end_ms is not None:
+            cue_end = min(cue_end, end_ms - start_ms)
+        # A single word longer than a line is the only text that doesn't wrap
+        lines = wrap_lines(text, max_line_chars, max_lines) or [text]
+        return first_ms, max(cue_end, last_ms), lines
+
+    for word in words:
+        word_start, word_end, text = word
+        if word_end <= start_ms:
+            continue
+        if end_ms is not None and word_start >= end_ms:
+            break
+        if cue:
+            full = wrap_lines(f"{cue_text} {text}", max_line_chars, max_lines) is None
+            paused = word_start - cue[-1][1] >= CAPTION_PAUSE_MS
+            too_long = word_end - cue[0][0] > CAPTION_MAX_DURATION_MS
+            sentence_end = cue[-1][2][-1:] in ".?!" and len(cue_text) >= max_chars // 2
+            if full or paused or too_long or sentence_end:
+                if pending is not None:
+                    yield pending
+                pending = close(cue, word_start)
+                cue = []
+                cue_text = ""
+        cue.append(word)
+        cue_text = f"{cue_text} {text}" if cue_text else text
+
+    if pending is not None:
+        yield pending
+    if cue:
+        yield close(cue, None)
+
+def format_timestamp(ms, decimal_separator):
+    ms = max(int(ms), 0)
+    hours, ms = divmod(ms, 3600000)
+    minutes, ms = divmod(ms, 60000)
+    seconds, ms = divmod(ms, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}{decimal_separator}{ms:03d}"
+
+def iter_srt(cues):
+    """SubRip text, one cue at a time"""
+    for number, (start, end, lines) in enumerate(cues, 1):
+        yield f"{number}\n{format_timestamp(start, ',')} --> {format_timestamp(end, ',')}\n" + "\n".join(lines) + "\n\n"
+
+def iter_vtt(cues):
+    """WebVTT text, one cue at a time"""
+    yield "WEBVTT\n\n"
+    for start, end, lines in cues:
+        # "-->" may not appear in cue text
+        text = "\n".join(lines).replace("-->", "->")
+        yield f"{format_timestamp(start, '.')} --> {format_timestamp(end, '.')}\n{text}\n\n"
+
+CAPTION_FORMATS = {
+    "srt": iter_srt,
+    "vtt": iter_vtt
+}
+
+def write_captions(words, output_path, start_ms=0, end_ms=None):
+    """Write the captions of [start_ms, end_ms) to an .srt or .vtt file; returns the number of cues"""
+    writer = CAPTION_FORMATS[os.path.splitext(output_path)[1].lstrip(".").lower()]
+    count = 0
+
+    def counted(cues):
+        nonlocal count
+        for cue in cues:
+            count += 1
+            yield cue
+
+    tmp_path = f"{output_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        for chunk in writer(counted(iter_cues(words, start_ms, end_ms))):
+            f.write(chunk)
+    os.replace(tmp_path, output_path)
+    return count
+
+def subtitles_filter(caption_path, font_size=18):
+    """ffmpeg filter that burns a caption file into the video (needs ffmpeg built with libass)"""
+    # Escaped once for the option value and once for the filter graph
+    escaped = caption_path.replace("\\", "/").replace(":", "\\\\:").replace("'", "\\\\\\'")
+    for char in ",;[]":
+        escaped = escaped.replace(char, f"\\{char}")
+    style = f"FontName=Arial,FontSize={font_size},Outline=2,Shadow=0,MarginV=24"
+    return f"subtitles=filename={escaped}:force_style='{style}'"
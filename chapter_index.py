@@ -0,0 +1,194 @@
+import os
+import json
+import glob
+import threading
+from contextlib import contextmanager
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    # No cross-process lock on this platform
+    fcntl = None
+
+DEFAULT_EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+def chapter_text(chapter):
+    """Text embedded for a chapter"""
+    return f"{chapter['gist']}. {chapter['summary']}"
+
+class ChapterIndex:
+    """Append-only vector index over chapter summaries across all films.
+
+    Vectors are L2-normalised float32 rows in one contiguous file that is
+    memory-mapped for queries; row metadata lives in a JSON-lines file with one
+    line per row. Adding a film appends only its rows, under a file lock on
+    the index directory so processes sharing it never interleave appends.
+    """
+
+    def __init__(self, index_dir, model_name=None):
+        self.index_dir = index_dir
+        self.model_name = model_name or os.getenv("CHAPTER_EMBEDDING_MODEL", DEFAULT_EMBEDDING_MODEL)
+        self.vectors_path = os.path.join(index_dir, "vectors.f32")
+        self.rows_path = os.path.join(index_dir, "chapters.jsonl")
+        self.meta_path = os.path.join(index_dir, "meta.json")
+        self.lock_path = os.path.join(index_dir, "index.lock")
+        self._lock = threading.Lock()
+        self._model = None
+        self._matrix = None
+        self._rows = []
+        self._film_ids = np.zeros(0, dtype=np.int32)
+        self._films = {}
+        self._row_lookup = {}
+        self._rows_size = 0
+        os.makedirs(index_dir, exist_ok=True)
+        self.dim = self._load_meta()
+        self._load_rows()
+
+    def _load_meta(self):
+        if not os.path.exists(self.meta_path):
+            return None
+        with open(self.meta_path, 'r') as f:
+            meta = json.load(f)
+        if meta["model"] != self.model_name:
+            raise ValueError(f"Chapter index was built with {meta['model']}, not {self.model_name}")
+        return meta["dim"]
+
+    def _load_rows(self):
+        self._rows = []
+        self._rows_size = self._current_rows_size()
+        if os.path.exists(self.rows_path):
+            with open(self.rows_path, 'r') as f:
+                self._rows = [json.loads(line) for line in f if line.strip()]
+        self._films = {}
+        film_ids = []
+        for row in self._rows:
+            film_ids.append(self._films.setdefault(row["film"], len(self._films)))
+        self._film_ids = np.array(film_ids, dtype=np.int32)
+        self._row_lookup = {(row["film"], row["chapter"]): idx for idx, row in enumerate(self._rows)}
+        self._matrix = None
+
+    def _current_rows_size(self):
+        return os.path.getsize(self.rows_path) if os.path.exists(self.rows_path) else 0
+
+    @contextmanager
+    def _write_lock(self):
+        """Hold the index across threads and, where fcntl exists, across processes"""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.lock_path, 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _get_model(self):
+        if self._model is None:
+            from sentence_transformers import SentenceTransformer
+            self._model = SentenceTransformer(self.model_name, device="cpu")
+        return self._model
+
+    def embed(self, texts):
+        """Embed texts into L2-normalised float32 vectors"""
+        vectors = self._get_model().encode(
+            list(texts),
+            batch_size=64,
+            convert_to_numpy=True,
+            normalize_embeddings=True
+        )
+        return np.ascontiguousarray(vectors, dtype=np.float32)
+
+    def _get_matrix(self):
+        """Memory-map the vectors (remapped only after rows were appended)"""
+        if self._matrix is None or self._matrix.shape[0] != len(self._rows):
+            if not self._rows:
+                return np.zeros((0, self.dim or 0), dtype=np.float32)
+            self._matrix = np.memmap(
+                self.vectors_path,
+                dtype=np.float32,
+                mode='r',
+                shape=(len(self._rows), self.dim)
+            )
+        return self._matrix
+
+    def has_film(self, film):
+        return film in self._films
+
+    def add_film(self, film, chapters):
+        """Append a film's chapters to the index"""
+        if not chapters:
+            return 0
+        vectors = self.embed(chapter_text(chapter) for chapter in chapters)
+        with self._write_lock():
+            # Pick up rows and metadata another process wrote while this one embedded
+            if self._current_rows_size() != self._rows_size:
+                self._load_rows()
+            if self.has_film(film):
+                return 0
+            if self.dim is None:
+                self.dim = self._load_meta()
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+                tmp_path = f"{self.meta_path}.tmp"
+                with open(tmp_path, 'w') as f:
+                    json.dump({"model": self.model_name, "dim": self.dim}, f)
+                os.replace(tmp_path, self.meta_path)
+            # Vectors first, so every metadata row always has its vector on disk
+            with open(self.vectors_path, 'ab') as f:
+                f.write(vectors.tobytes())
+            with open(self.rows_path, 'a') as f:
+                for idx, chapter in enumerate(chapters, 1):
+                    f.write(json.dumps({
+                        "film": film,
+                        "chapter": idx,
+                        "start": chapter['start'],
+                        "end": chapter['end'],
+                        "gist": chapter['gist'],
+                        "headline": chapter['headline']
+                    }) + "\n")
+            self._load_rows()
+        print(f"Indexed {len(chapters)} chapters of {film}")
+        return len(chapters)
+
+    def sync(self, transcripts_dir):
+        """Index every stored transcript that is not in the index yet"""
+        # Pick up rows appended by other processes first
+        if self._current_rows_size() != self._rows_size:
+            with self._lock:
+                self._load_rows()
+        added = 0
+        for transcript_path in sorted(glob.glob(os.path.join(transcripts_dir, "*_transcript.json"))):
+            film = os.path.basename(transcript_path)[:-len("_transcript.json")]
+            if self.has_film(film):
+                continue
+            with open(transcript_path, 'r') as f:
+                transcript_data = json.load(f)
+            added += self.add_film(film, transcript_data.get('chapters', []))
+        return added
+
+    def query_vector(self, vector, k=5, exclude_film=None):
+        """Top-k rows by cosine similarity as a list of (score, row metadata)"""
+        matrix = self._get_matrix()
+        if matrix.shape[0] == 0:
+            return []
+        scores = matrix @ np.asarray(vector, dtype=np.float32)
+        if exclude_film in self._films:
+            scores = np.where(self._film_ids == self._films[exclude_film], -np.inf, scores)
+        k = min(k, scores.shape[0])
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(float(scores[i]), self._rows[i]) for i in top if np.isfinite(scores[i])]
+
+    def query(self, text, k=5, exclude_film=None):
+        return self.query_vector(self.embed([text])[0], k, exclude_film)
+
+    def related_chapters(self, film, chapter_idx, k=5):
+        """Chapters from other films most similar to one chapter of a film"""
+        row_idx = self._row_lookup.get((film, chapter_idx))
+        if row_idx is None:
+            return []
+        vector = np.array(self._get_matrix()[row_idx])
+        return self.query_vector(vector, k, exclude_film=film)
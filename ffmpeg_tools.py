@@ -0,0 +1,64 @@
+import os
+import shutil
+import subprocess
+
+def get_ffmpeg_binary():
+    """Locate ffmpeg: FFMPEG_BINARY, then imageio-ffmpeg's bundled binary if installed, then PATH"""
+    binary = os.getenv("FFMPEG_BINARY")
+    if binary:
+        return binary
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        return "ffmpeg"
+
+def get_ffprobe_binary():
+    """Locate ffprobe: FFPROBE_BINARY, then next to the ffmpeg binary, then PATH"""
+    binary = os.getenv("FFPROBE_BINARY")
+    if binary:
+        return binary
+    ffmpeg_binary = get_ffmpeg_binary()
+    sibling = os.path.join(os.path.dirname(ffmpeg_binary), os.path.basename(ffmpeg_binary).replace("ffmpeg", "ffprobe"))
+    if os.path.dirname(ffmpeg_binary) and os.path.exists(sibling):
+        return sibling
+    return "ffprobe"
+
+def partial_path(path):
+    """Where to write an output before renaming it into place: clip.mov -> clip.partial.mov.
+
+    The extension is kept so ffmpeg still infers the container from it.
+    """
+    root, ext = os.path.splitext(path)
+    return f"{root}.partial{ext}"
+
+def lower_priority(niceness):
+    """Command prefix that starts the child at a lower CPU priority, where `nice` exists.
+
+    A preexec_fn would do the same, but it is not safe in a multithreaded
+    process such as the Streamlit server: the child can deadlock before exec.
+    """
+    if not niceness:
+        return []
+    nice = shutil.which("nice")
+    return [nice, "-n", str(niceness)] if nice else []
+
+def run_ffmpeg(args, niceness=None, threads=None, timeout=None):
+    """Run ffmpeg with the given arguments and raise with its stderr on failure.
+
+    threads goes before args, so it applies to the first input's decoder;
+    encoder and filter threads need their own options in args.
+    """
+    command = lower_priority(niceness) + [get_ffmpeg_binary(), "-hide_banner", "-loglevel", "error", "-y"]
+    if threads:
+        command += ["-threads", str(threads)]
+    command += list(args)
+    result = subprocess.run(
+        command,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        timeout=timeout
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {result.stderr.decode(errors='replace').strip()}")
+    return result
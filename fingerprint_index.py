@@ -0,0 +1,116 @@
+import os
+import glob
+import threading
+import numpy as np
+from audio_analysis import frames_to_ms
+
+# Hashes matching more catalog entries than this (silence, tones) are ignored
+MAX_MATCHES_PER_HASH = 50
+# Fewer agreeing hashes than this is never a match
+MIN_MATCH_VOTES = 50
+# Query hashes sampled at most; enough to identify a film, bounded for long ones
+MAX_QUERY_HASHES = 200000
+
+class FingerprintIndex:
+    """Audio fingerprints of every processed film, searchable as one sorted array.
+
+    Each film's (hash, anchor frame) pairs are saved to {film}.npz; in memory
+    all films are merged into arrays sorted by hash, so a lookup is a
+    vectorized binary search.
+    """
+
+    def __init__(self, index_dir):
+        self.index_dir = index_dir
+        self._lock = threading.Lock()
+        self._films = []
+        self._hashes = np.zeros(0, dtype=np.uint32)
+        self._frames = np.zeros(0, dtype=np.int32)
+        self._film_ids = np.zeros(0, dtype=np.int32)
+        os.makedirs(index_dir, exist_ok=True)
+        self._load()
+
+    def _film_path(self, film):
+        return os.path.join(self.index_dir, f"{film}.npz")
+
+    def _load(self):
+        hashes, frames, film_ids = [], [], []
+        for path in sorted(glob.glob(os.path.join(self.index_dir, "*.npz"))):
+            with np.load(path) as data:
+                film_id = len(self._films)
+                self._films.append(os.path.basename(path)[:-len(".npz")])
+                hashes.append(data["hashes"])
+                frames.append(data["frames"])
+                film_ids.append(np.full(len(data["hashes"]), film_id, dtype=np.int32))
+        if hashes:
+            self._merge(hashes, frames, film_ids)
+
+    def _merge(self, hashes, frames, film_ids):
+        hashes = np.concatenate([self._hashes] + hashes)
+        order = np.argsort(hashes, kind="stable")
+        self._hashes = hashes[order]
+        self._frames = np.concatenate([self._frames] + frames)[order]
+        self._film_ids = np.concatenate([self._film_ids] + film_ids)[order]
+
+    def __contains__(self, film):
+        return film in self._films
+
+    def add(self, film, hashes, frames):
+        """Save a film's fingerprint and merge it into the in-memory index"""
+        with self._lock:
+            if film in self._films:
+                return
+            tmp_path = self._film_path(film) + ".tmp"
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, hashes=hashes.astype(np.uint32), frames=frames.astype(np.int32))
+            os.replace(tmp_path, self._film_path(film))
+            film_id = len(self._films)
+            self._films.append(film)
+            self._merge(
+                [hashes.astype(np.uint32)],
+                [frames.astype(np.int32)],
+                [np.full(len(hashes), film_id, dtype=np.int32)]
+            )
+
+    def match(self, hashes, frames, exclude=None):
+        """Best matching film for a fingerprint.
+
+        Returns (film, offset_ms, score) or None. offset_ms is how far into the
+        matched film the query starts (positive when the query was trimmed at
+        the start); score is the share of query hashes agreeing on that offset.
+        """
+        with self._lock:
+            catalog_hashes, catalog_frames, catalog_films = self._hashes, self._frames, self._film_ids
+            films = list(self._films)
+        if len(hashes) == 0 or len(catalog_hashes) == 0:
+            return None
+        if len(hashes) > MAX_QUERY_HASHES:
+            step = int(np.ceil(len(hashes) / MAX_QUERY_HASHES))
+            hashes, frames = hashes[::step], frames[::step]
+
+        lo = np.searchsorted(catalog_hashes, hashes, side="left")
+        hi = np.searchsorted(catalog_hashes, hashes, side="right")
+        counts = hi - lo
+        usable = (counts > 0) & (counts <= MAX_MATCHES_PER_HASH)
+        lo, counts, query_frames = lo[usable], counts[usable], frames[usable]
+        total = int(counts.sum())
+        if total == 0:
+            return None
+        # Expand every query hash into its catalog matches
+        starts = np.repeat(np.cumsum(counts) - counts, counts)
+        positions = np.repeat(lo, counts) + (np.arange(total) - starts)
+        offsets = catalog_frames[positions].astype(np.int64) - np.repeat(query_frames, counts)
+        film_ids = catalog_films[positions].astype(np.int64)
+        if exclude is not None and exclude in films:
+            keep = film_ids != films.index(exclude)
+            offsets, film_ids = offsets[keep], film_ids[keep]
+            if len(film_ids) == 0:
+                return None
+
+        # The true match is the film and offset most query hashes agree on
+        keys, votes = np.unique(film_ids * (1 << 32) + (offsets + (1 << 31)), return_counts=True)
+        best = int(np.argmax(votes))
+        if votes[best] < MIN_MATCH_VOTES:
+            return None
+        film_id = int(keys[best] >> 32)
+        offset_frames = int(keys[best] & 0xFFFFFFFF) - (1 << 31)
+        return films[film_id], float(frames_to_ms(offset_frames)), float(votes[best] / len(hashes))
@@ -0,0 +1,246 @@
+import os
+import re
+import shutil
+import tempfile
+from collections import Counter
+from ffmpeg_tools import partial_path, run_ffmpeg
+
+# Candidate moments are whole sentences within these lengths (seconds)
+MOMENT_MIN_SECONDS = 4.0
+MOMENT_MAX_SECONDS = 15.0
+# Space left between chosen moments so cuts don't run into each other (seconds)
+MOMENT_GAP_SECONDS = 2.0
+# Boundary pieces shorter than this are dropped instead of re-encoded (seconds)
+MIN_PIECE_SECONDS = 0.05
+
+STOPWORDS = set("""
+a an and are as at be but by for from has have he her his i in is it its of on or our she so
+that the their them they this to was we were what when which who will with you your not just
+about into than then there these those been being do does did can could would should my me us
+""".split())
+
+def tokenize(text):
+    return [token for token in re.findall(r"[a-z']+", (text or "").lower()) if token not in STOPWORDS and len(token) > 2]
+
+def sentence_spans(words):
+    """Split [start_ms, end_ms, text] words into sentences of (first word, end word) indices"""
+    spans = []
+    first = 0
+    for i, (_, _, text) in enumerate(words):
+        if text[-1:] in ".?!" or i == len(words) - 1:
+            spans.append((first, i + 1))
+            first = i + 1
+    return spans
+
+def score_moments(transcript_data):
+    """Candidate moments as dicts with start/end (ms), chapter and score.
+
+    A sentence scores for the chapter keywords it repeats (headline, gist and
+    summary, weighted by how often the chapter uses them), for how densely it
+    is spoken, and a little for questions and exclamations. Without word
+    timings each chapter's opening is a candidate.
+    """
+    chapters = transcript_data.get('chapters') or []
+    words = transcript_data.get('words') or []
+    if not words:
+        return [
+            {
+                "start": chapter['start'],
+                "end": min(chapter['end'], chapter['start'] + int(MOMENT_MAX_SECONDS * 1000)),
+                "chapter": idx,
+                "score": 1.0
+            }
+            for idx, chapter in enumerate(chapters, 1)
+        ]
+
+    chapter_keywords = []
+    for chapter in chapters:
+        counts = Counter(tokenize(chapter['summary']))
+        for token in tokenize(f"{chapter['headline']} {chapter['gist']}"):
+            counts[token] += 2
+        total = sum(counts.values()) or 1
+        chapter_keywords.append({token: count / total for token, count in counts.items()})
+
+    moments = []
+    for first, end in sentence_spans(words):
+        start_ms = words[first][0]
+        end_ms = words[end - 1][1]
+        seconds = (end_ms - start_ms) / 1000.0
+        if seconds < MOMENT_MIN_SECONDS or seconds > MOMENT_MAX_SECONDS:
+            continue
+        chapter_idx = next(
+            (idx for idx, chapter in enumerate(chapters, 1) if chapter['start'] <= start_ms < chapter['end']),
+            None
+        )
+        if chapter_idx is None:
+            continue
+        keywords = chapter_keywords[chapter_idx - 1]
+        tokens = tokenize(" ".join(text for _, _, text in words[first:end]))
+        relevance = sum(keywords.get(token, 0.0) for token in set(tokens))
+        density = (end - first) / seconds
+        emphasis = 0.1 if words[end - 1][2][-1:] in "?!" else 0.0
+        moments.append({
+            "start": start_ms,
+            "end": end_ms,
+            "chapter": chapter_idx,
+            "score": relevance + 0.05 * min(density, 4.0) + emphasis
+        })
+    return moments
+
+def select_spans(moments, target_seconds=75.0, max_seconds=90.0):
+    """Choose non-overlapping moments, in film order, totalling about target_seconds.
+
+    The best moment of each chapter goes in first so the reel covers the whole
+    film; remaining time is filled with the next best moments.
+    """
+    by_score = sorted(moments, key=lambda moment: moment['score'], reverse=True)
+    best_per_chapter = {}
+    for moment in by_score:
+        best_per_chapter.setdefault(moment['chapter'], moment)
+    ordered = sorted(best_per_chapter.values(), key=lambda moment: moment['score'], reverse=True)
+    ordered += [moment for moment in by_score if moment not in ordered]
+
+    gap_ms = MOMENT_GAP_SECONDS * 1000
+    chosen = []
+    total = 0.0
+    for moment in ordered:
+        if total >= target_seconds:
+            break
+        seconds = (moment['end'] - moment['start']) / 1000.0
+        if total + seconds > max_seconds:
+            continue
+        if any(moment['start'] < other['end'] + gap_ms and other['start'] < moment['end'] + gap_ms for other in chosen):
+            continue
+        chosen.append(moment)
+        total += seconds
+    return sorted(chosen, key=lambda moment: moment['start'])
+
+def plan_pieces(spans, media_index):
+    """Split spans into ('copy' | 'encode', start_sec, end_sec) pieces.
+
+    The part of a span between its first and last keyframe is stream-copied;
+    only the frames before the first keyframe and after the last are encoded.
+    """
+    pieces = []
+    for span in spans:
+        start = span['start'] / 1000.0
+        end = span['end'] / 1000.0
+        copy_start = media_index.keyframe_after(start)
+        copy_end = media_index.keyframe_before(end)
+        if copy_start is None or copy_end - copy_start < MIN_PIECE_SECONDS:
+            pieces.append(("encode", start, end))
+            continue
+        for kind, piece_start, piece_end in (
+            ("encode", start, copy_start),
+            ("copy", copy_start, copy_end),
+            ("encode", copy_end, end)
+        ):
+            if piece_end - piece_start >= MIN_PIECE_SECONDS:
+                pieces.append((kind, piece_start, piece_end))
+    return pieces
+
+# ffprobe's H.264 profile names and the libx264 profiles that encode them
+X264_PROFILES = {
+    "Constrained Baseline": "baseline",
+    "Baseline": "baseline",
+    "Main": "main",
+    "High": "high",
+    "High 10": "high10",
+    "High 4:2:2": "high422",
+    "High 4:4:4 Predictive": "high444"
+}
+
+def h264_level(level):
+    """ffprobe's level_idc (e.g. 31) as libx264's -level ('3.1'), or None if unknown"""
+    if not level or level <= 0:
+        return None
+    if level == 9:
+        return "1b"
+    return f"{level // 10}.{level % 10}"
+
+def track_timescale(video):
+    """MP4 timescale of the source's video track ('1/15360' -> 15360), or None"""
+    numerator, _, denominator = (video.get("time_base") or "").partition("/")
+    if numerator == "1" and denominator.isdigit():
+        return int(denominator)
+    return None
+
+def encode_args(media_index):
+    """Encoder settings matching the source, so encoded pieces concatenate with copied ones.
+
+    Boundary pieces share one H.264 stream with the copied pieces, so they use
+    the source's profile, level and pixel format as well as its size and rate.
+    """
+    if media_index is None:
+        return ["-c:v", "libx264", "-preset", "veryfast", "-crf", "18", "-pix_fmt", "yuv420p",
+                "-c:a", "aac", "-ar", "48000", "-ac", "2"]
+    video = media_index.stream("video") or {}
+    audio = media_index.stream("audio")
+    args = ["-c:v", "libx264", "-preset", "veryfast", "-crf", "18", "-pix_fmt", video.get("pix_fmt") or "yuv420p"]
+    if video.get("profile") in X264_PROFILES:
+        args += ["-profile:v", X264_PROFILES[video["profile"]]]
+    if h264_level(video.get("level")):
+        args += ["-level", h264_level(video["level"])]
+    if video.get("width") and video.get("height"):
+        args += ["-s", f"{video['width']}x{video['height']}"]
+    if video.get("fps"):
+        args += ["-r", f"{video['fps']:.6f}"]
+    if audio:
+        args += ["-c:a", "aac", "-ar", str(audio.get("sample_rate") or 48000), "-ac", str(audio.get("channels") or 2)]
+    return args
+
+def assemble_reel(video_path, spans, media_index, output_path, threads=None, niceness=None):
+    """Cut the spans out of the film and join them into one MP4.
+
+    Pieces are written as MPEG-TS and joined by the concat demuxer without
+    re-encoding. Sources that aren't H.264 can't share a stream with the
+    encoded boundary pieces, so every span is encoded for them, as it is when
+    the film could not be probed (media_index is None).
+    Returns the number of seconds that were stream-copied.
+    """
+    if media_index is None:
+        video = {}
+        has_audio = True
+        audio_map = ["-map", "0:a:0?"]
+    else:
+        video = media_index.stream("video") or {}
+        has_audio = media_index.stream("audio") is not None
+        audio_map = ["-map", "0:a:0"] if has_audio else ["-an"]
+    if video.get("codec") == "h264":
+        pieces = plan_pieces(spans, media_index)
+    else:
+        pieces = [("encode", span['start'] / 1000.0, span['end'] / 1000.0) for span in spans]
+
+    work_dir = tempfile.mkdtemp(prefix="reel_", dir=os.path.dirname(output_path))
+    try:
+        list_lines = []
+        for i, (kind, start, end) in enumerate(pieces):
+            piece_path = os.path.join(work_dir, f"piece_{i:03d}.ts")
+            if kind == "copy":
+                args = [
+                    "-ss", f"{start:.6f}", "-i", video_path, "-t", f"{end - start:.6f}",
+                    "-map", "0:v:0"
+                ] + audio_map + ["-c", "copy", "-bsf:v", "h264_mp4toannexb"]
+            else:
+                args = [
+                    "-ss", f"{start:.6f}", "-i", video_path, "-t", f"{end - start:.6f}",
+                    "-map", "0:v:0"
+                ] + audio_map + encode_args(media_index)
+            run_ffmpeg(args + ["-f", "mpegts", piece_path], niceness=niceness, threads=threads)
+            list_lines.append(f"file '{piece_path}'")
+
+        list_path = os.path.join(work_dir, "pieces.txt")
+        with open(list_path, 'w') as f:
+            f.write("\n".join(list_lines) + "\n")
+        tmp_path = partial_path(output_path)
+        concat_args = ["-f", "concat", "-safe", "0", "-i", list_path, "-c", "copy"]
+        if has_audio:
+            concat_args += ["-bsf:a", "aac_adtstoasc"]
+        # The pieces come back with MPEG-TS's 90 kHz clock; keep the source's track timescale
+        if track_timescale(video):
+            concat_args += ["-video_track_timescale", str(track_timescale(video))]
+        run_ffmpeg(concat_args + ["-movflags", "+faststart", tmp_path], niceness=niceness, threads=threads)
+        os.replace(tmp_path, output_path)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return sum(end - start for kind, start, end in pieces if kind == "copy")
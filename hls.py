@@ -0,0 +1,122 @@
+import os
+import shutil
+from ffmpeg_tools import partial_path, run_ffmpeg
+
+SOURCE_PLAYLIST = "index.m3u8"
+INIT_SEGMENT = "init.mp4"
+# hls.js is vendored under static/ (see README) rather than loaded from a CDN
+HLS_JS_VERSION = "1.5.20"
+HLS_JS_URL = "/app/static/vendor/hls.min.js"
+
+def segment_source(video_path, output_dir, segment_seconds=4):
+    """Split the source once into fMP4 HLS segments without re-encoding.
+
+    Segments and index.m3u8 are written to a temporary directory first, so a
+    half-finished run is never mistaken for a complete one.
+    """
+    playlist_path = os.path.join(output_dir, SOURCE_PLAYLIST)
+    if os.path.exists(playlist_path):
+        return playlist_path
+    tmp_dir = f"{output_dir}.partial"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    run_ffmpeg([
+        "-i", video_path,
+        "-map", "0:v:0", "-map", "0:a:0?",
+        "-c", "copy",
+        "-f", "hls",
+        "-hls_time", str(segment_seconds),
+        "-hls_playlist_type", "vod",
+        "-hls_segment_type", "fmp4",
+        "-hls_fmp4_init_filename", INIT_SEGMENT,
+        "-hls_segment_filename", os.path.join(tmp_dir, "seg_%05d.m4s"),
+        os.path.join(tmp_dir, SOURCE_PLAYLIST)
+    ])
+    shutil.rmtree(output_dir, ignore_errors=True)
+    os.replace(tmp_dir, output_dir)
+    return playlist_path
+
+def read_segments(playlist_path):
+    """Parse a VOD playlist into a list of (uri, start_sec, duration_sec)"""
+    segments = []
+    position = 0.0
+    duration = None
+    with open(playlist_path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith("#EXTINF:"):
+                duration = float(line[len("#EXTINF:"):].split(",")[0])
+            elif line and not line.startswith("#") and duration is not None:
+                segments.append((line, position, duration))
+                position += duration
+                duration = None
+    return segments
+
+def write_chapter_playlist(segments, start_ms, end_ms, playlist_path):
+    """Write a playlist for a chapter that references the existing segments.
+
+    The chapter is widened to segment boundaries; no media is written.
+    Returns the offset in seconds of the chapter start within the playlist.
+    """
+    start_sec = start_ms / 1000.0
+    end_sec = end_ms / 1000.0
+    selected = [
+        segment for segment in segments
+        if segment[1] + segment[2] > start_sec and segment[1] < end_sec
+    ]
+    if not selected:
+        raise ValueError("Chapter does not overlap any segment")
+    target_duration = max(int(segment[2] + 0.999) for segment in selected)
+    lines = [
+        "#EXTM3U",
+        "#EXT-X-VERSION:7",
+        f"#EXT-X-TARGETDURATION:{target_duration}",
+        "#EXT-X-PLAYLIST-TYPE:VOD",
+        "#EXT-X-MEDIA-SEQUENCE:0",
+        f'#EXT-X-MAP:URI="{INIT_SEGMENT}"'
+    ]
+    for uri, _, duration in selected:
+        lines.append(f"#EXTINF:{duration:.6f},")
+        lines.append(uri)
+    lines.append("#EXT-X-ENDLIST")
+    if not os.path.exists(playlist_path):
+        tmp_path = f"{playlist_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, playlist_path)
+    return start_sec - selected[0][1]
+
+def materialize_clip(playlist_path, output_path):
+    """Concatenate a chapter playlist's segments into a standalone MP4 (stream copy)"""
+    tmp_path = partial_path(output_path)
+    run_ffmpeg([
+        "-allowed_extensions", "ALL",
+        "-i", playlist_path,
+        "-c", "copy",
+        "-movflags", "+faststart",
+        "-f", "mp4",
+        tmp_path
+    ])
+    os.replace(tmp_path, output_path)
+    return output_path
+
+def hls_player_html(playlist_url, start_offset=0.0, height=360, hls_js_url=HLS_JS_URL):
+    """HTML for an in-page HLS player (native HLS where supported, hls.js elsewhere)"""
+    return f"""
+    <video id="player" controls playsinline style="width:100%;max-height:{height}px;background:#000"></video>
+    <script src="{hls_js_url}"></script>
+    <script>
+        var video = document.getElementById('player');
+        var src = "{playlist_url}";
+        video.addEventListener('loadedmetadata', function() {{
+            video.currentTime = {start_offset:.3f};
+        }}, {{ once: true }});
+        if (video.canPlayType('application/vnd.apple.mpegurl')) {{
+            video.src = src;
+        }} else if (window.Hls && Hls.isSupported()) {{
+            var hls = new Hls();
+            hls.loadSource(src);
+            hls.attachMedia(video);
+        }}
+    </script>
+    """
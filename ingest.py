@@ -0,0 +1,179 @@
+import os
+import time
+import hashlib
+import subprocess
+import http.client
+import urllib.error
+import urllib.parse
+import urllib.request
+from ffmpeg_tools import get_ffmpeg_binary
+
+# Bytes per read while streaming a download
+INGEST_CHUNK_SIZE = 4 * 1024 * 1024
+INGEST_MAX_RETRIES = 5
+INGEST_TIMEOUT = 60
+
+def is_remote_source(url):
+    return urllib.parse.urlparse(url).scheme in ("http", "https", "s3")
+
+def filename_from_url(url, default="film.mp4"):
+    """File name a URL's object gets in UPLOADS_DIR: its basename qualified by a hash of the URL.
+
+    Two URLs ending in the same name (e.g. .../a/film.mp4 and .../b/film.mp4)
+    never share a file.
+    """
+    name = os.path.basename(urllib.parse.unquote(urllib.parse.urlparse(url).path)) or default
+    stem, ext = os.path.splitext(name)
+    return f"{stem}_{hashlib.sha256(url.encode()).hexdigest()[:8]}{ext or '.mp4'}"
+
+def resolve_url(url, expires=6 * 3600):
+    """Turn s3://bucket/key into a presigned HTTPS URL (S3_ENDPOINT_URL for S3-compatible stores)"""
+    if not url.startswith("s3://"):
+        return url
+    try:
+        import boto3
+    except ImportError:
+        raise RuntimeError("s3:// URLs need boto3 (pip install boto3)")
+    bucket, _, key = url[len("s3://"):].partition("/")
+    client = boto3.client("s3", endpoint_url=os.getenv("S3_ENDPOINT_URL") or None)
+    return client.generate_presigned_url("get_object", Params={"Bucket": bucket, "Key": key}, ExpiresIn=expires)
+
+class AudioTee:
+    """Extracts the audio track from bytes as they are downloaded.
+
+    Chunks are piped into ffmpeg, which writes an AAC file. This only works
+    for containers that can be read front to back (e.g. MP4 with the index
+    first); finish() returns False otherwise and the caller extracts from the
+    finished file instead.
+    """
+
+    def __init__(self, output_path, audio_bitrate="64k"):
+        self.output_path = output_path
+        self.tmp_path = output_path.replace(".m4a", ".partial.m4a")
+        self.failed = False
+        self.process = subprocess.Popen(
+            [
+                get_ffmpeg_binary(), "-hide_banner", "-loglevel", "error", "-y",
+                "-i", "pipe:0",
+                "-map", "0:a:0", "-vn",
+                "-c:a", "aac", "-b:a", audio_bitrate,
+                self.tmp_path
+            ],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+
+    def write(self, chunk):
+        if self.failed:
+            return
+        try:
+            self.process.stdin.write(chunk)
+        except (BrokenPipeError, OSError):
+            # ffmpeg gave up on the stream; the download carries on without it
+            self.failed = True
+
+    def abort(self):
+        self.failed = True
+        self.process.kill()
+        self.process.wait()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+    def finish(self):
+        """Wait for ffmpeg; True if the audio file was written"""
+        if self.failed:
+            self.abort()
+            return False
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        if self.process.wait() != 0 or not os.path.exists(self.tmp_path):
+            if os.path.exists(self.tmp_path):
+                os.remove(self.tmp_path)
+            return False
+        os.replace(self.tmp_path, self.output_path)
+        return True
+
+def content_range_total(value):
+    """Total size from a 'bytes 100-199/1000' header, or None"""
+    total = (value or "").rpartition("/")[2]
+    return int(total) if total.isdigit() else None
+
+def stream_download(url, dest_path, on_progress=None, tee=None,
+                    chunk_size=INGEST_CHUNK_SIZE, max_retries=INGEST_MAX_RETRIES, timeout=INGEST_TIMEOUT):
+    """Stream a URL to dest_path in chunks and return the SHA-256 of its contents.
+
+    Bytes go to dest_path + '.partial' first. After a dropped connection, or on
+    a later call, the download continues from the partial file with a Range
+    request; the partial bytes are re-hashed once. on_progress(done, total) is
+    called per chunk and tee.write(chunk) sees the bytes in order. Once a
+    transfer is resumed the tee can no longer see every byte, so it is aborted.
+    """
+    partial_path = f"{dest_path}.partial"
+    digest = hashlib.sha256()
+    done = 0
+    if os.path.exists(partial_path):
+        with open(partial_path, 'rb') as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                done += len(chunk)
+        print(f"Resuming download of {os.path.basename(dest_path)} at {done} bytes")
+    if done and tee is not None:
+        tee.abort()
+        tee = None
+
+    attempts = 0
+    total = None
+    while True:
+        headers = {"Range": f"bytes={done}-"} if done else {}
+        try:
+            with urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=timeout) as response:
+                if done and response.status != 206:
+                    # The server ignored the range; start over
+                    print("Server does not support range requests; restarting download")
+                    done = 0
+                    digest = hashlib.sha256()
+                if response.status == 206:
+                    total = content_range_total(response.headers.get("Content-Range"))
+                elif response.headers.get("Content-Length"):
+                    total = int(response.headers["Content-Length"])
+                with open(partial_path, 'ab' if done else 'wb') as f:
+                    while True:
+                        chunk = response.read(chunk_size)
+                        if not chunk:
+                            break
+                        f.write(chunk)
+                        digest.update(chunk)
+                        done += len(chunk)
+                        if tee is not None:
+                            tee.write(chunk)
+                        if on_progress:
+                            on_progress(done, total)
+            if total is not None and done < total:
+                raise http.client.IncompleteRead(b"", total - done)
+            break
+        except urllib.error.HTTPError as e:
+            if e.code == 416 and done and total in (None, done):
+                # Range starts at the end: the partial file is already complete
+                break
+            if e.code < 500:
+                raise
+            error = e
+        except (urllib.error.URLError, http.client.HTTPException, OSError) as e:
+            error = e
+        attempts += 1
+        if attempts > max_retries:
+            raise RuntimeError(f"Download failed after {max_retries} retries: {str(error)}")
+        if tee is not None:
+            tee.abort()
+            tee = None
+        print(f"Download interrupted at {done} bytes ({str(error)}); retrying...")
+        time.sleep(min(2 ** attempts, 30))
+
+    os.replace(partial_path, dest_path)
+    return digest.hexdigest()
@@ -0,0 +1,390 @@
+"""Concurrent-session load test for the Streamlit app.
+
+Drives N simulated sessions through the real main() flow with Streamlit's
+app-testing API (upload, browse chapters, generate every artifact, export)
+against stub AssemblyAI and Anthropic backends with configurable latency, and
+reports rerun latency percentiles, throughput and peak RSS per concurrency level.
+
+Usage:
+    python load_test.py --concurrency 1,4,8 [--sessions 8] [--video sample.mp4]
+                        [--llm-latency 2.0] [--transcribe-latency 5.0] [--output results.json]
+
+Without --video the sessions upload a dummy file and skip clip extraction.
+The app runs in a scratch working directory, so nothing is written next to it.
+"""
+import io
+import os
+import sys
+import json
+import time
+import types
+import random
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+
+ARTIFACT_BUTTONS = [
+    "Generate Summary",
+    "Generate Target Audience Analysis",
+    "Generate Impact Organizations",
+    "Generate Discussion Guide",
+    "Generate Social Media Posts"
+]
+
+STUB_WORDS = (
+    "the houseboat community gathers at dawn to talk about housing policy water rights "
+    "and the future of the bay while mothers share stories of care and resilience"
+).split()
+
+def stub_text(num_words, seed=0):
+    rng = random.Random(seed)
+    return " ".join(rng.choice(STUB_WORDS) for _ in range(num_words))
+
+class StubMessages:
+    def __init__(self, latency):
+        self.latency = latency
+
+    def create(self, model, max_tokens, messages, **kwargs):
+        time.sleep(self.latency)
+        prompt = messages[0]["content"]
+        if "<summary>" in prompt:
+            text = "".join(
+                f"<{tag}>\n{stub_text(120)}\n</{tag}>\n"
+                for tag in ["summary", "target_audience", "discussion_guide", "social_posts"]
+            )
+        else:
+            text = stub_text(300)
+        return types.SimpleNamespace(
+            content=[types.SimpleNamespace(text=text)],
+            stop_reason="end_turn"
+        )
+
+def install_stub_anthropic(latency):
+    """Replace the anthropic package with a stub client that sleeps for `latency` seconds"""
+    module = types.ModuleType("anthropic")
+
+    class Anthropic:
+        def __init__(self, api_key=None, **kwargs):
+            self.messages = StubMessages(latency)
+
+    module.Anthropic = Anthropic
+    sys.modules["anthropic"] = module
+
+def stub_transcript(film_seconds, transcript_id="stub-transcript", seed=0):
+    """A completed transcript with chapters every 30 seconds and word timings.
+
+    Each seed (the film's name) gets its own text, so prompts differ per film.
+    """
+    words = []
+    for i, word in enumerate(stub_text(int(film_seconds * 2.5), seed).split()):
+        start = int(i * 400)
+        words.append(types.SimpleNamespace(text=word, start=start, end=start + 350, confidence=0.95))
+    chapters = [
+        types.SimpleNamespace(
+            start=start * 1000,
+            end=min(start + 30, film_seconds) * 1000,
+            headline=stub_text(8, f"{seed}:{start}"),
+            summary=stub_text(40, f"{seed}:{start}"),
+            gist=stub_text(3, f"{seed}:{start}")
+        )
+        for start in range(0, int(film_seconds), 30)
+    ]
+    return types.SimpleNamespace(
+        id=transcript_id,
+        status="completed",
+        error=None,
+        text=" ".join(word.text for word in words),
+        words=words,
+        chapters=chapters,
+        iab_categories=types.SimpleNamespace(summary={
+            "Society>Housing": 0.9,
+            "Family and Relationships>Parenting": 0.4
+        })
+    )
+
+def install_stub_assemblyai(latency, film_seconds):
+    """Replace the assemblyai package with a stub transcriber that sleeps for `latency` seconds"""
+    module = types.ModuleType("assemblyai")
+    module.settings = types.SimpleNamespace(api_key=None)
+
+    def film_seed(data):
+        """Name of the uploaded film (or its audio track) a request refers to"""
+        return os.path.splitext(os.path.basename(str(data)))[0]
+
+    class TranscriptionConfig:
+        def __init__(self, **kwargs):
+            self.options = kwargs
+
+    class Transcriber:
+        def __init__(self, config=None):
+            self.config = config
+
+        def upload_file(self, data):
+            return f"https://stub.invalid/upload/{os.path.basename(str(data))}"
+
+        def submit(self, data, config=None):
+            return types.SimpleNamespace(id=f"{film_seed(data)}:{time.time_ns()}", status="queued")
+
+        def transcribe(self, data, config=None):
+            time.sleep(latency)
+            return stub_transcript(film_seconds, seed=film_seed(data))
+
+    class Transcript:
+        @classmethod
+        def get_by_id(cls, transcript_id):
+            time.sleep(latency)
+            return stub_transcript(film_seconds, transcript_id, transcript_id.rpartition(":")[0])
+
+    module.TranscriptionConfig = TranscriptionConfig
+    module.Transcriber = Transcriber
+    module.Transcript = Transcript
+    sys.modules["assemblyai"] = module
+
+class StubUpload(io.BytesIO):
+    """Stands in for Streamlit's UploadedFile (a BytesIO with a name)"""
+    def __init__(self, name, data):
+        super().__init__(data)
+        self.name = name
+
+def install_stub_uploader(video_bytes):
+    """Make st.file_uploader return the file named in session_state['load_test_upload'].
+
+    The film's name is appended to its bytes, so differently named films hash
+    differently (players and ffmpeg ignore trailing data after the last box).
+    """
+    import streamlit as st
+
+    def file_uploader(label, *args, **kwargs):
+        name = st.session_state.get("load_test_upload")
+        return StubUpload(name, video_bytes + f"\nload test film {name}".encode()) if name else None
+
+    st.file_uploader = file_uploader
+
+def make_apptest_thread_safe():
+    """Let AppTest sessions run side by side in one process.
+
+    AppTest installs a mock Runtime singleton for each run and clears it when
+    the run ends, so one session's script lost the runtime in the middle of
+    another's run; the last runtime installed now stays visible. Each session
+    also compiles main.py itself, and concurrent ast.parse calls trip CPython
+    3.11's AST recursion check, so compiles take a lock. Runs also patch and
+    restore config.get_option to turn on global.appTest, which overlapping runs
+    undo for each other, so it is turned on for the whole process.
+    """
+    from streamlit import config
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.testing.v1.util import build_mock_config_get_option
+
+    config.get_option = build_mock_config_get_option({"global.appTest": True})
+    last = [None]
+
+    def current(cls):
+        if cls._instance is not None:
+            last[0] = cls._instance
+        return last[0]
+
+    def instance(cls):
+        runtime = current(cls)
+        if runtime is None:
+            raise RuntimeError("Runtime hasn't been created!")
+        return runtime
+
+    Runtime.instance = classmethod(instance)
+    Runtime.exists = classmethod(lambda cls: current(cls) is not None)
+
+    compile_lock = threading.Lock()
+    get_bytecode = ScriptCache.get_bytecode
+
+    def locked_get_bytecode(self, script_path):
+        with compile_lock:
+            return get_bytecode(self, script_path)
+
+    ScriptCache.get_bytecode = locked_get_bytecode
+
+class RssSampler:
+    """Samples the resident set size of this process in the background"""
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    @staticmethod
+    def current_rss():
+        try:
+            with open("/proc/self/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1]) * 1024
+        except OSError:
+            pass
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self.current_rss())
+            time.sleep(self.interval)
+
+    def __enter__(self):
+        self.peak = self.current_rss()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+def run_session(session_id, film_name, extract_clip, timeout):
+    """One simulated user going through the whole flow; returns (rerun latencies, errors)"""
+    from streamlit.testing.v1 import AppTest
+
+    latencies = []
+    errors = []
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+
+    def rerun(action=None):
+        start = time.perf_counter()
+        if action is None:
+            at.run()
+        else:
+            action().run()
+        latencies.append(time.perf_counter() - start)
+        for exception in at.exception:
+            errors.append(f"session {session_id}: {exception.message}")
+
+    def click(label=None, key=None):
+        if key is not None:
+            return lambda: at.button(key=key).click()
+        button = next((b for b in at.button if b.label == label), None)
+        if button is None:
+            errors.append(f"session {session_id}: button '{label}' not found")
+            return None
+        return button.click
+
+    rerun()
+    at.session_state["load_test_upload"] = f"{film_name}.mp4"
+    rerun()
+
+    # Browse chapters and extract the first clip
+    if extract_clip:
+        rerun(click(key=f"extract_chapter_1_{film_name}.mp4"))
+
+    for label in ARTIFACT_BUTTONS:
+        action = click(label)
+        if action is not None:
+            rerun(action)
+
+    action = click("Create Content Package")
+    if action is not None:
+        rerun(action)
+    return latencies, errors
+
+def percentile(values, pct):
+    """Nearest-rank percentile"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(int(round(pct / 100 * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+def run_level(concurrency, sessions, args, level_idx):
+    """Run `sessions` sessions with at most `concurrency` at a time"""
+    results = []
+    with RssSampler() as sampler:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            futures = [
+                pool.submit(
+                    run_session,
+                    i,
+                    # Distinct films have their own bytes and transcripts, so nothing is a cache hit
+                    f"loadtest_{level_idx}_{i}" if args.distinct_films else "loadtest_shared",
+                    bool(args.video),
+                    args.timeout
+                )
+                for i in range(sessions)
+            ]
+            for future in futures:
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    results.append(([], [f"session crashed: {str(e)}"]))
+        wall = time.perf_counter() - start
+
+    latencies = [latency for session_latencies, _ in results for latency in session_latencies]
+    errors = [error for _, session_errors in results for error in session_errors]
+    return {
+        "concurrency": concurrency,
+        "sessions": sessions,
+        "reruns": len(latencies),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else 0.0,
+        "peak_rss_mb": round(sampler.peak / 1024 ** 2, 1),
+        "errors": len(errors),
+        "error_samples": errors[:5]
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", default="1,4,8", help="Comma-separated concurrency levels")
+    parser.add_argument("--sessions", type=int, help="Sessions per level (default: 2x concurrency)")
+    parser.add_argument("--video", help="MP4 to upload; enables clip extraction")
+    parser.add_argument("--llm-latency", type=float, default=2.0, help="Seconds per stub Anthropic call")
+    parser.add_argument("--transcribe-latency", type=float, default=5.0, help="Seconds per stub transcription")
+    parser.add_argument("--film-seconds", type=float, default=120.0, help="Length of the stub transcript")
+    parser.add_argument("--shared-film", dest="distinct_films", action="store_false",
+                        help="All sessions upload the same film (measures caching and coalescing)")
+    parser.add_argument("--timeout", type=float, default=600.0, help="Seconds allowed per rerun")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+    if args.output:
+        args.output = os.path.abspath(args.output)
+
+    video_bytes = b"\x00" * 1024
+    if args.video:
+        with open(args.video, 'rb') as f:
+            video_bytes = f.read()
+
+    install_stub_anthropic(args.llm_latency)
+    install_stub_assemblyai(args.transcribe_latency, args.film_seconds)
+    install_stub_uploader(video_bytes)
+    make_apptest_thread_safe()
+    if args.distinct_films:
+        # Every film shares --video's audio; don't let fingerprint matching reuse the first transcript
+        os.environ["FINGERPRINT_MATCH_THRESHOLD"] = "2"
+
+    scratch_dir = tempfile.mkdtemp(prefix="dfs_load_test_")
+    os.chdir(scratch_dir)
+    print(f"Working directory: {scratch_dir}")
+
+    report = []
+    for level_idx, concurrency in enumerate(int(level) for level in args.concurrency.split(",")):
+        sessions = args.sessions or concurrency * 2
+        print(f"Running {sessions} sessions at concurrency {concurrency}...")
+        report.append(run_level(concurrency, sessions, args, level_idx))
+
+    print()
+    print(f"{'conc':>5} {'sess':>5} {'reruns':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'rerun/s':>8} {'RSS MB':>8} {'errors':>7}")
+    for row in report:
+        print(
+            f"{row['concurrency']:>5} {row['sessions']:>5} {row['reruns']:>7} "
+            f"{row['p50_ms']:>9.1f} {row['p95_ms']:>9.1f} {row['p99_ms']:>9.1f} "
+            f"{row['throughput_rps']:>8.2f} {row['peak_rss_mb']:>8.1f} {row['errors']:>7}"
+        )
+        for error in row["error_samples"]:
+            print(f"      {error}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
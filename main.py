@@ -1,43 +1,180 @@
 import streamlit as st
-import assemblyai as aai
-from moviepy.editor import VideoFileClip
 import os
 from dotenv import load_dotenv
 import json
-from anthropic import Anthropic
 import re
 import zipfile
 import io
 import base64
+import threading
+import hashlib
 from datetime import datetime
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from storage_manager import StorageManager, format_bytes, replace_file
+from ffmpeg_tools import partial_path, run_ffmpeg
+from zip_tools import copy_zip_entry_raw
+from media_probe import MediaIndex
+import hls
+import social_render
+import highlight_reel
+import captions
+import ingest
+import transcript_viewer
+import urllib.parse
+import streamlit.components.v1 as components
+from rerun_profiler import RerunProfiler
+import time
+import socket
+from shared_state import open_state
+from single_flight import SingleFlight, film_hash, text_hash, work_key
 
-client = Anthropic(
-    api_key=os.getenv("ANTHROPIC_API_KEY"),
-)
+# Heavy dependencies (anthropic, assemblyai, numpy, sentence-transformers)
+# are imported the first time their feature is used to keep cold start fast.
+
+load_dotenv()
 
 claude3_sonnet_model = "claude-3-5-sonnet-20240620"
 
+# Streamlit re-executes this script on every rerun, so process-wide objects
+# (clients, executors, indexes) are kept with st.cache_resource.
 
-load_dotenv()
+@st.cache_resource
+def get_client():
+    """Anthropic client, created on first use"""
+    from anthropic import Anthropic
+    return Anthropic(
+        api_key=os.getenv("ANTHROPIC_API_KEY"),
+    )
 
-# Configure AssemblyAI
-aai.settings.api_key = os.getenv("ASSEMBLYAI_API_KEY")
-transcriber = aai.Transcriber(
-    config=aai.TranscriptionConfig(
-        auto_chapters=True,
-        iab_categories=True
+@st.cache_resource
+def get_transcriber():
+    """AssemblyAI transcriber, configured on first use"""
+    import assemblyai as aai
+    aai.settings.api_key = os.getenv("ASSEMBLYAI_API_KEY")
+    return aai.Transcriber(
+        config=aai.TranscriptionConfig(
+            auto_chapters=True,
+            iab_categories=True
+        )
     )
-)
 
 # Get current directory and create necessary folders
 CURRENT_DIR = os.getcwd()
 UPLOADS_DIR = os.path.join(CURRENT_DIR, "uploads")
 CHAPTERS_DIR = os.path.join(CURRENT_DIR, "chapters")
 TRANSCRIPTS_DIR = os.path.join(CURRENT_DIR, "transcripts")
+PROXIES_DIR = os.path.join(CURRENT_DIR, "proxies")
+SOCIAL_DIR = os.path.join(CURRENT_DIR, "social_clips")
+# HLS segments live under static/ so Streamlit serves them at /app/static/
+STATIC_DIR = os.path.join(CURRENT_DIR, "static")
+SEGMENTS_DIR = os.path.join(STATIC_DIR, "segments")
+WORD_INDEX_DIR = os.path.join(STATIC_DIR, "words")
+# Catalog-wide indexes built across every stored transcript
+CATALOG_DIR = os.path.join(CURRENT_DIR, "catalog")
 
 os.makedirs(UPLOADS_DIR, exist_ok=True)
 os.makedirs(CHAPTERS_DIR, exist_ok=True)
 os.makedirs(TRANSCRIPTS_DIR, exist_ok=True)
+os.makedirs(PROXIES_DIR, exist_ok=True)
+os.makedirs(SOCIAL_DIR, exist_ok=True)
+os.makedirs(SEGMENTS_DIR, exist_ok=True)
+os.makedirs(WORD_INDEX_DIR, exist_ok=True)
+os.makedirs(CATALOG_DIR, exist_ok=True)
+
+# Players load hls.js from static serving instead of a CDN (browsers without native HLS need it)
+HLS_JS_PATH = os.path.join(STATIC_DIR, "vendor", "hls.min.js")
+
+@st.cache_resource
+def check_vendored_assets():
+    """Warn once per process, not on every rerun"""
+    if not os.path.exists(HLS_JS_PATH):
+        print(f"Warning: {HLS_JS_PATH} is missing; HLS playback will only work in browsers with native HLS (see README)")
+
+check_vendored_assets()
+
+def quota_from_env(name, default_gb):
+    """Read a directory quota in GB from the environment (0 disables it)"""
+    quota_gb = float(os.getenv(name, default_gb))
+    return int(quota_gb * 1024 ** 3) or None
+
+# Blobs, locks, queued jobs and cache metadata shared by every replica. Without
+# STATE_URL (see state_server.py) they stay on this host: blobs are the files in
+# the working directory and the tables live in a SQLite file.
+@st.cache_resource
+def get_shared_state():
+    return open_state(os.getenv("STATE_URL"), CURRENT_DIR, os.path.join(CURRENT_DIR, "state.db"))
+
+shared_state = get_shared_state()
+
+# Name of this replica in the job table; stable across restarts on the same host
+REPLICA_ID = os.getenv("REPLICA_ID", socket.gethostname())
+
+def shared_key(path):
+    """Blob key of a file under the working directory, e.g. 'transcripts/film_transcript.json'"""
+    return os.path.relpath(path, CURRENT_DIR).replace(os.sep, "/")
+
+def publish_file(path):
+    """Make a finished file available to every replica"""
+    try:
+        shared_state.put_blob(shared_key(path), path)
+    except Exception as e:
+        print(f"Could not publish {shared_key(path)}: {str(e)}")
+
+def fetch_shared_file(path, kind):
+    """Make sure a file, possibly produced by another replica, exists locally"""
+    if os.path.exists(path):
+        return True
+    try:
+        fetched = shared_state.fetch_blob(shared_key(path), path)
+    except Exception as e:
+        print(f"Could not fetch {shared_key(path)}: {str(e)}")
+        return False
+    if fetched and shared_state.shared:
+        print(f"Fetched {shared_key(path)} from shared storage")
+        storage.register(path, kind)
+    return fetched
+
+# Coalesce identical transcription, generation and clip work across sessions, server processes and replicas
+@st.cache_resource
+def get_single_flight():
+    return SingleFlight(
+        os.path.join(CURRENT_DIR, "locks"),
+        shared_state if shared_state.shared else None
+    )
+
+single_flight = get_single_flight()
+
+# Track derived files and evict least-recently-used ones once a directory goes over quota
+@st.cache_resource
+def get_storage():
+    return StorageManager(
+        os.path.join(CURRENT_DIR, "storage_index.json"),
+        {
+            UPLOADS_DIR: quota_from_env("UPLOADS_QUOTA_GB", 50),
+            CHAPTERS_DIR: quota_from_env("CHAPTERS_QUOTA_GB", 20),
+            TRANSCRIPTS_DIR: quota_from_env("TRANSCRIPTS_QUOTA_GB", 5),
+            PROXIES_DIR: quota_from_env("PROXIES_QUOTA_GB", 10),
+            SOCIAL_DIR: quota_from_env("SOCIAL_QUOTA_GB", 10),
+            # Stream-copied HLS segments: a full copy of each film, evicted a film at a time
+            SEGMENTS_DIR: quota_from_env("SEGMENTS_QUOTA_GB", 20),
+            WORD_INDEX_DIR: quota_from_env("WORD_INDEX_QUOTA_GB", 1)
+        },
+        folder_dirs=[SEGMENTS_DIR]
+    )
+
+storage = get_storage()
+
+# Sources open in a session, or read by a proxy encode or transcription, are
+# held so quota eviction never removes them; session holds lapse once the
+# session stops rerunning
+SESSION_HOLD_SECONDS = int(os.getenv("SESSION_HOLD_SECONDS", "3600"))
+SOURCE_JOB_HOLD_SECONDS = 6 * 3600
+
+def get_session_owner():
+    """Identifies this browser session's storage holds"""
+    if 'storage_owner' not in st.session_state:
+        st.session_state.storage_owner = f"session:{os.urandom(8).hex()}"
+    return st.session_state.storage_owner
 
 # def create_export_package(video_name, transcript_data):
 #     """Create a ZIP file containing all generated content"""
@@ -94,81 +231,223 @@ os.makedirs(TRANSCRIPTS_DIR, exist_ok=True)
     
 #     return zip_path
 
-def create_export_package(video_name, transcript_data):
-    """Create a ZIP file containing all generated content"""
-    # Create a timestamp for the export
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    zip_filename = f"{video_name}_export_{timestamp}.zip"
-    zip_path = os.path.join(TRANSCRIPTS_DIR, zip_filename)
-    
-    # Create a ZIP file
-    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        # Add transcript data
-        if transcript_data:
-            transcript_json = os.path.join(TRANSCRIPTS_DIR, f"{video_name}_transcript.json")
-            if os.path.exists(transcript_json):
-                zipf.write(transcript_json, os.path.basename(transcript_json))
-        
-        # Add chapter clips - Modified this section
-        clips_added = False
-        for idx, chapter in enumerate(transcript_data['chapters'], 1):
-            clip_filename = f"chapter_{idx}_{video_name}.mp4"
-            clip_path = os.path.join(CHAPTERS_DIR, clip_filename)
-            if os.path.exists(clip_path):
-                clips_added = True
-                zipf.write(
-                    clip_path, 
-                    os.path.join("chapter_clips", clip_filename)
-                )
-                print(f"Added clip: {clip_filename}")  # Debug print
-        
-        if not clips_added:
-            print("No chapter clips found to add to package")  # Debug print
-        
-        # Add generated content files
-        content_files = {
-            "summary": f"{video_name}_summary.txt",
-            "target_audience": f"{video_name}_target_audience.txt",
-            "discussion_guide": f"{video_name}_discussion_guide.txt",
-            "social_posts": f"{video_name}_social_posts.txt",
-            "impact_orgs": f"{video_name}_impact_orgs.txt"
-        }
-        
-        for content_type, filename in content_files.items():
-            file_path = os.path.join(TRANSCRIPTS_DIR, filename)
-            if os.path.exists(file_path):
-                zipf.write(file_path, os.path.join("generated_content", filename))
-        
-        # Add a README with content overview and included files list
-        readme_content = [
-            f"Documentary Film Content Package",
-            f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
-            f"Video: {video_name}\n",
-            "Package Contents:",
-            "----------------"
-        ]
-        
-        # List actual included content
-        if os.path.exists(transcript_json):
-            readme_content.append("1. Transcript Data:")
-            readme_content.append(f"   - {os.path.basename(transcript_json)}")
-        
-        if clips_added:
-            readme_content.append("\n2. Chapter Clips:")
-            for idx, chapter in enumerate(transcript_data['chapters'], 1):
-                clip_filename = f"chapter_{idx}_{video_name}.mp4"
-                if os.path.exists(os.path.join(CHAPTERS_DIR, clip_filename)):
-                    readme_content.append(f"   - {clip_filename}")
-                    readme_content.append(f"     Gist: {chapter['gist']}")
-        
-        readme_content.append("\n3. Generated Content:")
+def collect_export_entries(video_name, transcript_data):
+    """List the files of a content package as (archive name, source path) and build its README"""
+    entries = []
+
+    # Add transcript data
+    transcript_json = os.path.join(TRANSCRIPTS_DIR, f"{video_name}_transcript.json")
+    if transcript_data and os.path.exists(transcript_json):
+        entries.append((os.path.basename(transcript_json), transcript_json))
+
+    # Add film captions
+    caption_files = []
+    words = transcript_data.get('words') or []
+    if words:
+        for fmt, caption_path in write_film_captions(video_name, transcript_data).items():
+            caption_files.append(os.path.basename(caption_path))
+            entries.append((os.path.join("captions", os.path.basename(caption_path)), caption_path))
+
+    # Add chapter clips
+    clip_entries = []
+    for idx, chapter in enumerate(transcript_data['chapters'], 1):
+        clip_path = find_chapter_clip(video_name, idx) or get_chapter_clip_path(video_name, idx)
+        clip_filename = os.path.basename(clip_path)
+        # Chapters served as HLS playlists only get a standalone MP4 when exported
+        playlist_path = get_chapter_playlist_path(video_name, idx)
+        if not os.path.exists(clip_path) and os.path.exists(playlist_path):
+            print(f"Materializing clip: {clip_filename}")
+            hls.materialize_clip(playlist_path, clip_path)
+            storage.register(clip_path, "clip")
+            if words:
+                # The playlist starts at the segment boundary before the chapter
+                clip_start = chapter['start'] - int(chapter_playlist_offset(video_name, chapter) * 1000)
+                write_clip_captions(clip_path, words, clip_start, chapter['end'])
+        if os.path.exists(clip_path):
+            clip_entries.append((idx, chapter, clip_filename))
+            entries.append((os.path.join("chapter_clips", clip_filename), clip_path))
+            print(f"Added clip: {clip_filename}")  # Debug print
+            if words:
+                for fmt in captions.CAPTION_FORMATS:
+                    caption_path = get_clip_caption_path(clip_path, fmt)
+                    # Clips extracted before captions existed are timed from the chapter start
+                    if not fetch_shared_file(caption_path, "artifact"):
+                        write_clip_captions(clip_path, words, chapter['start'], chapter['end'])
+                    caption_files.append(os.path.basename(caption_path))
+                    entries.append((os.path.join("chapter_clips", os.path.basename(caption_path)), caption_path))
+
+    if not clip_entries:
+        print("No chapter clips found to add to package")  # Debug print
+
+    # Add social clips rendered for other aspect ratios
+    social_clips = []
+    for idx, chapter in enumerate(transcript_data['chapters'], 1):
+        for aspect in social_render.ASPECT_SIZES:
+            social_path = get_social_clip_path(video_name, idx, aspect)
+            if os.path.exists(social_path):
+                social_clips.append(os.path.basename(social_path))
+                entries.append((os.path.join("social_clips", os.path.basename(social_path)), social_path))
+
+    # Add the highlight reel
+    reel_path = get_highlight_reel_path(video_name)
+    has_reel = os.path.exists(reel_path)
+    if has_reel:
+        entries.append((os.path.join("highlight_reel", os.path.basename(reel_path)), reel_path))
+
+    # Add generated content files
+    content_files = {
+        "summary": f"{video_name}_summary.txt",
+        "target_audience": f"{video_name}_target_audience.txt",
+        "discussion_guide": f"{video_name}_discussion_guide.txt",
+        "social_posts": f"{video_name}_social_posts.txt",
+        "impact_orgs": f"{video_name}_impact_orgs.txt"
+    }
+    content_added = []
+    for content_type, filename in content_files.items():
+        file_path = os.path.join(TRANSCRIPTS_DIR, filename)
+        if os.path.exists(file_path):
+            content_added.append(filename)
+            entries.append((os.path.join("generated_content", filename), file_path))
+
+    # Add translations under a folder per language
+    translations_added = []
+    for language in LOCALIZATION_LANGUAGES:
         for content_type, filename in content_files.items():
-            if os.path.exists(os.path.join(TRANSCRIPTS_DIR, filename)):
-                readme_content.append(f"   - {filename}")
-        
-        zipf.writestr("README.txt", "\n".join(readme_content))
+            translation_path = get_translation_path(video_name, content_type, language)
+            if os.path.exists(translation_path):
+                arcname = os.path.join("generated_content", language_slug(language), filename)
+                translations_added.append(arcname)
+                entries.append((arcname, translation_path))
+
+    # Add a README with content overview and included files list
+    readme_content = [
+        f"Documentary Film Content Package",
+        f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+        f"Video: {video_name}\n",
+        "Package Contents:",
+        "----------------"
+    ]
+    
+    # List actual included content
+    if os.path.exists(transcript_json):
+        readme_content.append("1. Transcript Data:")
+        readme_content.append(f"   - {os.path.basename(transcript_json)}")
+
+    if caption_files:
+        readme_content.append("\n1b. Captions (SRT and WebVTT; chapter captions are timed to their clip):")
+        for caption_file in caption_files:
+            readme_content.append(f"   - {caption_file}")
     
-    return zip_path
+    if clip_entries:
+        readme_content.append("\n2. Chapter Clips:")
+        for idx, chapter, clip_filename in clip_entries:
+            readme_content.append(f"   - {clip_filename}")
+            readme_content.append(f"     Gist: {chapter['gist']}")
+    
+    if social_clips:
+        readme_content.append("\n2b. Social Clips:")
+        for social_clip in social_clips:
+            readme_content.append(f"   - {social_clip}")
+    
+    if has_reel:
+        readme_content.append("\n2c. Highlight Reel:")
+        readme_content.append(f"   - {os.path.basename(reel_path)}")
+
+    readme_content.append("\n3. Generated Content:")
+    for filename in content_added:
+        readme_content.append(f"   - {filename}")
+
+    if translations_added:
+        readme_content.append("\n4. Translations:")
+        for arcname in translations_added:
+            readme_content.append(f"   - {arcname}")
+
+    return entries, "\n".join(readme_content)
+
+# Entries whose contents are hashed for the manifest; media is identified by size and mtime
+HASHED_EXPORT_EXTENSIONS = (".txt", ".json", ".srt", ".vtt")
+
+def export_entry_version(source_path):
+    """Version of one package input used in the export manifest"""
+    if source_path.endswith(HASHED_EXPORT_EXTENSIONS):
+        with open(source_path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    stat = os.stat(source_path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+def find_previous_export(video_name, exclude_path):
+    """Most recent content package of a video, to reuse unchanged entries from"""
+    candidates = [
+        os.path.join(TRANSCRIPTS_DIR, name)
+        for name in os.listdir(TRANSCRIPTS_DIR)
+        if name.startswith(f"{video_name}_export_") and name.endswith(".zip")
+    ]
+    candidates = [path for path in candidates if path != exclude_path]
+    return max(candidates, key=os.path.getmtime) if candidates else None
+
+def create_export_package(video_name, transcript_data):
+    """Create a ZIP file containing all generated content.
+
+    Packages are named by a hash of their inputs, so an unchanged package is
+    served from the previous build. Entries that did not change since the last
+    package are copied as raw compressed bytes instead of being recompressed.
+    """
+    entries, readme = collect_export_entries(video_name, transcript_data)
+    manifest = {arcname: export_entry_version(source_path) for arcname, source_path in entries}
+    manifest_hash = hashlib.sha256(json.dumps(manifest, sort_keys=True).encode()).hexdigest()[:16]
+    zip_path = os.path.join(TRANSCRIPTS_DIR, f"{video_name}_export_{manifest_hash}.zip")
+
+    if os.path.exists(zip_path):
+        print(f"Content package unchanged, reusing {os.path.basename(zip_path)}")
+        storage.touch(zip_path)
+        return zip_path
+
+    def build():
+        previous_path = find_previous_export(video_name, zip_path)
+        previous_zip = None
+        previous_manifest = {}
+        if previous_path:
+            try:
+                previous_zip = zipfile.ZipFile(previous_path, 'r')
+                previous_manifest = json.loads(previous_zip.read("MANIFEST.json"))
+            except (KeyError, ValueError, zipfile.BadZipFile, OSError) as e:
+                print(f"Not reusing {os.path.basename(previous_path)}: {str(e)}")
+                previous_zip = None
+                previous_manifest = {}
+
+        tmp_path = f"{zip_path}.tmp"
+        reused = 0
+        try:
+            with zipfile.ZipFile(tmp_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+                for arcname, source_path in entries:
+                    if previous_zip is not None and previous_manifest.get(arcname) == manifest[arcname]:
+                        copy_zip_entry_raw(previous_zip.fp, previous_zip.getinfo(arcname), zipf)
+                        reused += 1
+                    else:
+                        # Video is already compressed; deflating it only costs CPU
+                        compress_type = zipfile.ZIP_STORED if source_path.endswith(".mp4") else zipfile.ZIP_DEFLATED
+                        zipf.write(source_path, arcname, compress_type=compress_type)
+                zipf.writestr("MANIFEST.json", json.dumps(manifest, sort_keys=True, indent=2))
+                zipf.writestr("README.txt", readme)
+        finally:
+            if previous_zip is not None:
+                previous_zip.close()
+        os.replace(tmp_path, zip_path)
+        print(f"Built {os.path.basename(zip_path)}: {reused} of {len(entries)} entries reused")
+
+        # Superseded packages of this video are no longer needed
+        if previous_path and os.path.exists(previous_path):
+            os.remove(previous_path)
+            storage.forget(previous_path)
+        storage.register(zip_path, "export")
+        storage.enforce_quota(TRANSCRIPTS_DIR, protect=[zip_path])
+        return zip_path
+
+    return single_flight.run(
+        work_key("export", video_name, manifest_hash),
+        build,
+        lambda: zip_path if os.path.exists(zip_path) else None
+    )
 
 def get_binary_file_downloader_html(bin_file, file_label='File'):
     with open(bin_file, 'rb') as f:
@@ -177,60 +456,67 @@ def get_binary_file_downloader_html(bin_file, file_label='File'):
     href = f'<a href="data:application/zip;base64,{bin_str}" download="{os.path.basename(bin_file)}">Download {file_label}</a>'
     return href
 
-def get_completion(client, prompt):
-	try:
+# Shared cap on concurrent Anthropic requests across sessions and background work
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+
+@st.cache_resource
+def get_llm_slots():
+    return threading.BoundedSemaphore(LLM_MAX_CONCURRENCY)
+
+llm_slots = get_llm_slots()
+
+# claude-3-5-sonnet-20240620 returns at most 4096 output tokens unless this beta is requested
+MAX_OUTPUT_TOKENS = 4096
+LONG_OUTPUT_BETA = "max-tokens-3-5-sonnet-2024-07-15"
+
+def request_completion(client, prompt, max_tokens=2048):
+	"""Raises on failure instead of reporting it, so worker threads can use it"""
+	extra_headers = {"anthropic-beta": LONG_OUTPUT_BETA} if max_tokens > MAX_OUTPUT_TOKENS else None
+	with llm_slots:
 		return client.messages.create(
 			model=claude3_sonnet_model,
-			max_tokens=2048,
+			max_tokens=max_tokens,
 			messages=[{
 				"role": 'user', "content":  prompt
-			}]
+			}],
+			extra_headers=extra_headers
 		).content[0].text
+
+def get_completion(client, prompt, max_tokens=2048):
+	try:
+		return request_completion(client, prompt, max_tokens)
 	except Exception as e:
 		st.error(f"Error generating completion: {str(e)}")
 		return None
 
-def generate_summary(transcript_text):
-	summary = get_completion(client,
-	f"""Here is an documentary film transcript: 
+# Prompt templates; their hashes are recorded with each artifact (see artifact_inputs)
+SUMMARY_PROMPT = """Here is an documentary film transcript: 
 		{transcript_text}
 
 	Please do the following:
 	1. Summarize the transcript at a graduate students reading level.
 	2. Highlight the key moments / topics from the transcript as 3-5 word sub headings. Then for each of these subheadings, add a one sentence summary.
 	"""
-	)
-	print(summary)
-	return summary
 
-def generate_target_audience(transcript_text):
-    prompt = f"""Analyze the transcript of my documentary film and identify potential target audiences based on the salient themes. For each audience, explain how their receptivity to various issues and content framing might differ, considering factors such as demographics, interests, and values.
+TARGET_AUDIENCE_PROMPT = """Analyze the transcript of my documentary film and identify potential target audiences based on the salient themes. For each audience, explain how their receptivity to various issues and content framing might differ, considering factors such as demographics, interests, and values.
 
     Transcript:
     {transcript_text}
     """
-    return get_completion(client, prompt)
 
-def generate_discussion_guide(transcript_text):
-    prompt = f"""Create thought-provoking discussion / study guide questions for my documentary film that challenge the audience to engage with its themes, reflect on their own experiences, and explore actionable solutions. Give me 15-20 questions.
+DISCUSSION_GUIDE_PROMPT = """Create thought-provoking discussion / study guide questions for my documentary film that challenge the audience to engage with its themes, reflect on their own experiences, and explore actionable solutions. Give me 15-20 questions.
 
     Transcript:
     {transcript_text}
     """
-    return get_completion(client, prompt)
 
-def generate_social_posts(transcript_text):
-    prompt = f"""Create impactful social media posts to promote my documentary film. The posts should capture attention, highlight key themes, and encourage viewers to watch and engage with the film. Include calls to action, thought-provoking questions, and hashtags relevant to the social issue. Posts should be tailored for platforms like Instagram, Twitter, and Facebook.
+SOCIAL_POSTS_PROMPT = """Create impactful social media posts to promote my documentary film. The posts should capture attention, highlight key themes, and encourage viewers to watch and engage with the film. Include calls to action, thought-provoking questions, and hashtags relevant to the social issue. Posts should be tailored for platforms like Instagram, Twitter, and Facebook.
 
     Transcript:
     {transcript_text}
     """
-    return get_completion(client, prompt)
 
-
-# Add this new function with your other generation functions:
-def generate_impact_orgs(transcript_text, target_audience_text):
-    prompt = f"""Based on this documentary transcript and its target audience analysis, suggest relevant organizations or communities that would be ideal for sharing the film. Consider factors like their interests, mission, and potential engagement with the film's themes.
+IMPACT_ORGS_PROMPT = """Based on this documentary transcript and its target audience analysis, suggest relevant organizations or communities that would be ideal for sharing the film. Consider factors like their interests, mission, and potential engagement with the film's themes.
 		Transcript:
 		{transcript_text}
 
@@ -244,30 +530,1160 @@ def generate_impact_orgs(transcript_text, target_audience_text):
 		* Organization's Website:
 		* Organization's Core Values:
 		"""
-    return get_completion(client, prompt)
 
-# def extract_tagged_content(text, tag):
-#     """Extract content between XML-style tags"""
-#     pattern = f"<{tag}>(.*?)</{tag}>"
-#     match = re.search(pattern, text, re.DOTALL)
-#     return match.group(1).strip() if match else ""
+COMBINED_PROMPT = """Here is the transcript of my documentary film:
+    {transcript_text}
+
+    Please produce all of the following, wrapping each one in its XML-style tag exactly as shown:
+
+    <summary>
+    1. Summarize the transcript at a graduate students reading level.
+    2. Highlight the key moments / topics from the transcript as 3-5 word sub headings. Then for each of these subheadings, add a one sentence summary.
+    </summary>
+
+    <target_audience>
+    Identify potential target audiences based on the salient themes. For each audience, explain how their receptivity to various issues and content framing might differ, considering factors such as demographics, interests, and values.
+    </target_audience>
+
+    <discussion_guide>
+    Create thought-provoking discussion / study guide questions that challenge the audience to engage with the film's themes, reflect on their own experiences, and explore actionable solutions. Give me 15-20 questions.
+    </discussion_guide>
+
+    <social_posts>
+    Create impactful social media posts to promote the film. The posts should capture attention, highlight key themes, and encourage viewers to watch and engage with the film. Include calls to action, thought-provoking questions, and hashtags relevant to the social issue. Posts should be tailored for platforms like Instagram, Twitter, and Facebook.
+    </social_posts>
+
+    Replace the instructions inside each tag with the requested content. Do not write anything outside the tags.
+    """
+
+def generate_summary(transcript_text):
+	summary = get_completion(get_client(), SUMMARY_PROMPT.format(transcript_text=transcript_text))
+	print(summary)
+	return summary
+
+def generate_target_audience(transcript_text):
+    prompt = TARGET_AUDIENCE_PROMPT.format(transcript_text=transcript_text)
+    return get_completion(get_client(), prompt)
+
+def generate_discussion_guide(transcript_text):
+    prompt = DISCUSSION_GUIDE_PROMPT.format(transcript_text=transcript_text)
+    return get_completion(get_client(), prompt)
+
+def generate_social_posts(transcript_text):
+    prompt = SOCIAL_POSTS_PROMPT.format(transcript_text=transcript_text)
+    return get_completion(get_client(), prompt)
+
+
+# Add this new function with your other generation functions:
+def generate_impact_orgs(transcript_text, target_audience_text):
+    prompt = IMPACT_ORGS_PROMPT.format(transcript_text=transcript_text, target_audience_text=target_audience_text)
+    return get_completion(get_client(), prompt)
+
+COMBINED_SECTIONS = ["summary", "target_audience", "discussion_guide", "social_posts"]
+
+def generate_combined_content(transcript_text):
+    """Generate summary, target audience, discussion guide and social posts in one request.
+
+    Returns a dict keyed by section name. Sections that are missing or truncated
+    in the combined response are regenerated on their own.
+    """
+    prompt = COMBINED_PROMPT.format(transcript_text=transcript_text)
+    try:
+        completion = request_completion(get_client(), prompt, max_tokens=8192) or ""
+    except Exception as e:
+        # Every section falls back to its own request below
+        print(f"Combined generation failed: {str(e)}")
+        completion = ""
+
+    section_generators = {
+        "summary": generate_summary,
+        "target_audience": generate_target_audience,
+        "discussion_guide": generate_discussion_guide,
+        "social_posts": generate_social_posts
+    }
+
+    results = {}
+    for section in COMBINED_SECTIONS:
+        content = extract_tagged_content(completion, section)
+        if not content:
+            print(f"Section '{section}' missing or truncated, retrying on its own...")
+            content = section_generators[section](transcript_text)
+        results[section] = content
+    return results
+
+def extract_tagged_content(text, tag):
+    """Extract content between XML-style tags.
+
+    Returns None if the tag is missing, empty or has no closing tag (truncated response).
+    """
+    if not text:
+        return None
+    pattern = rf"<\s*{tag}\s*>(.*?)<\s*/\s*{tag}\s*>"
+    match = re.search(pattern, text, re.DOTALL | re.IGNORECASE)
+    if not match:
+        return None
+    content = match.group(1).strip()
+    return content or None
+
+def get_artifact_path(video_name, artifact):
+    """Get the path for a generated text artifact"""
+    return os.path.join(TRANSCRIPTS_DIR, f"{video_name}_{artifact}.txt")
+
+# Artifacts in generation order; impact_orgs consumes target_audience so it comes after it
+ARTIFACTS = ["summary", "target_audience", "impact_orgs", "discussion_guide", "social_posts"]
+
+# Artifacts whose prompts consume other artifacts
+ARTIFACT_DEPENDENCIES = {"impact_orgs": ["target_audience"]}
+
+ARTIFACT_PROMPTS = {
+    "summary": SUMMARY_PROMPT,
+    "target_audience": TARGET_AUDIENCE_PROMPT,
+    "impact_orgs": IMPACT_ORGS_PROMPT,
+    "discussion_guide": DISCUSSION_GUIDE_PROMPT,
+    "social_posts": SOCIAL_POSTS_PROMPT
+}
+
+def artifact_prompt(artifact, transcript_text, target_audience_text=None):
+    """The prompt that generates an artifact"""
+    return ARTIFACT_PROMPTS[artifact].format(
+        transcript_text=transcript_text,
+        target_audience_text=target_audience_text
+    )
+
+def generate_artifact(artifact, transcript_text, target_audience_text=None, background=False):
+    """Generate a single text artifact from the transcript.
+
+    In the background (worker threads) failures are raised for the session to
+    report instead of being shown with st.error.
+    """
+    if background:
+        return request_completion(get_client(), artifact_prompt(artifact, transcript_text, target_audience_text))
+    if artifact == "summary":
+        return generate_summary(transcript_text)
+    if artifact == "target_audience":
+        return generate_target_audience(transcript_text)
+    if artifact == "impact_orgs":
+        return generate_impact_orgs(transcript_text, target_audience_text)
+    if artifact == "discussion_guide":
+        return generate_discussion_guide(transcript_text)
+    if artifact == "social_posts":
+        return generate_social_posts(transcript_text)
+    raise ValueError(f"Unknown artifact: {artifact}")
+
+def get_artifact_meta_path(video_name, artifact):
+    """Get the path of the record of what an artifact was built from"""
+    return os.path.join(TRANSCRIPTS_DIR, f"{video_name}_{artifact}.meta.json")
+
+def artifact_inputs(artifact, transcript_text, target_audience_text=None, prompt=None):
+    """Hashes of everything an artifact is built from: transcript, upstream artifacts, prompt and model"""
+    upstream = {"target_audience": target_audience_text}
+    return {
+        "transcript": text_hash(transcript_text),
+        "upstream": {
+            dependency: text_hash(upstream[dependency])
+            for dependency in ARTIFACT_DEPENDENCIES.get(artifact, [])
+        },
+        "prompt": text_hash(prompt if prompt is not None else ARTIFACT_PROMPTS[artifact]),
+        "model": claude3_sonnet_model
+    }
+
+def save_artifact(video_name, artifact, content, inputs=None):
+    """Save a generated text artifact next to the transcript, with the inputs it was built from"""
+    artifact_path = get_artifact_path(video_name, artifact)
+    with open(artifact_path, 'w') as f:
+        f.write(content)
+    storage.register(artifact_path, "artifact")
+    publish_file(artifact_path)
+
+    meta_path = get_artifact_meta_path(video_name, artifact)
+    if inputs is None:
+        # Provenance unknown; drop any record that no longer describes the file
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+            storage.forget(meta_path)
+        return
+    with open(meta_path, 'w') as f:
+        json.dump({"inputs": inputs, "content": text_hash(content)}, f, indent=2)
+    storage.register(meta_path, "artifact")
+    publish_file(meta_path)
+
+def load_artifact(video_name, artifact):
+    """Load a previously generated text artifact, or None if it doesn't exist"""
+    artifact_path = get_artifact_path(video_name, artifact)
+    if not fetch_shared_file(artifact_path, "artifact"):
+        return None
+    storage.touch(artifact_path)
+    with open(artifact_path, 'r') as f:
+        return f.read()
+
+def load_artifact_meta(video_name, artifact):
+    meta_path = get_artifact_meta_path(video_name, artifact)
+    if not fetch_shared_file(meta_path, "artifact"):
+        return None
+    try:
+        with open(meta_path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def artifact_status(video_name, artifact, transcript_text):
+    """'missing', 'untracked' (no record of its inputs), 'stale' or 'fresh'"""
+    content = load_artifact(video_name, artifact)
+    if content is None:
+        return "missing"
+    meta = load_artifact_meta(video_name, artifact)
+    if meta is None or meta.get("content") != text_hash(content):
+        return "untracked"
+    recorded = meta["inputs"]
+    expected = artifact_inputs(
+        artifact,
+        transcript_text,
+        load_artifact(video_name, "target_audience") if ARTIFACT_DEPENDENCIES.get(artifact) else None
+    )
+    # Sections of the combined request were built from its prompt instead of their own
+    accepted_prompts = {expected["prompt"]}
+    if artifact in COMBINED_SECTIONS:
+        accepted_prompts.add(text_hash(COMBINED_PROMPT))
+    if recorded.get("prompt") not in accepted_prompts:
+        return "stale"
+    for field in ("transcript", "upstream", "model"):
+        if recorded.get(field) != expected[field]:
+            return "stale"
+    return "fresh"
+
+def generate_and_save_artifact(video_name, artifact, transcript_text, target_audience_text=None, background=False):
+    """Generate a text artifact and save it to the transcripts folder.
+
+    Identical requests running at the same time (in any session or server
+    process) share one API call.
+    """
+    requested_at = time.time()
+    inputs = artifact_inputs(artifact, transcript_text, target_audience_text)
+
+    def load_fresh_artifact():
+        # Only pick up a file written while this request was waiting
+        artifact_path = get_artifact_path(video_name, artifact)
+        if os.path.exists(artifact_path) and os.path.getmtime(artifact_path) >= requested_at:
+            return load_artifact(video_name, artifact)
+        return None
+
+    def generate():
+        content = generate_artifact(artifact, transcript_text, target_audience_text, background)
+        if content:
+            save_artifact(video_name, artifact, content, inputs)
+        return content
+
+    key = work_key(artifact, text_hash(json.dumps(inputs, sort_keys=True)))
+    content = single_flight.run(key, generate, load_fresh_artifact)
+    # Sessions with a different file name for the same transcript still get their own copy
+    if content and load_artifact(video_name, artifact) != content:
+        save_artifact(video_name, artifact, content, inputs)
+    return content
+
+def refresh_stale_artifacts(video_name, transcript_text, include_untracked=False):
+    """Regenerate saved artifacts whose inputs changed, in dependency order.
+
+    Missing artifacts are left to their own Generate buttons, and artifacts
+    saved without a record of their inputs are only regenerated with
+    include_untracked. Returns {artifact: new content}. Fresh artifacts cost no
+    API call; an artifact is re-checked after its dependencies are refreshed,
+    so a new target audience analysis also refreshes impact_orgs.
+    """
+    regenerate = {"stale", "untracked"} if include_untracked else {"stale"}
+    refreshed = {}
+    for artifact in ARTIFACTS:
+        status = artifact_status(video_name, artifact, transcript_text)
+        if status not in regenerate:
+            continue
+        target_audience_text = None
+        if ARTIFACT_DEPENDENCIES.get(artifact):
+            target_audience_text = load_artifact(video_name, "target_audience")
+            if not target_audience_text:
+                print(f"Skipping {artifact} refresh for {video_name}: no target audience")
+                continue
+        print(f"Refreshing {status} {artifact} for {video_name}...")
+        content = generate_and_save_artifact(video_name, artifact, transcript_text, target_audience_text)
+        if content:
+            refreshed[artifact] = content
+    return refreshed
+
+# Localization of finished artifacts into other languages
+LOCALIZATION_LANGUAGES = [
+    language.strip()
+    for language in os.getenv("LOCALIZATION_LANGUAGES", "Spanish,French,Portuguese").split(",")
+    if language.strip()
+]
+LOCALIZABLE_ARTIFACTS = ["summary", "discussion_guide", "social_posts"]
+
+def language_slug(language):
+    return re.sub(r"[^a-z0-9]+", "_", language.lower()).strip("_")
+
+def get_translation_path(video_name, artifact, language):
+    """Get the path for a translated text artifact"""
+    return os.path.join(TRANSCRIPTS_DIR, f"{video_name}_{artifact}_{language_slug(language)}.txt")
+
+def get_translation_index_path(video_name):
+    return os.path.join(TRANSCRIPTS_DIR, f"{video_name}_translations.json")
+
+def load_translation_index(video_name):
+    """{"artifact:language": hash of the source text it was translated from}"""
+    index_path = get_translation_index_path(video_name)
+    if not fetch_shared_file(index_path, "artifact"):
+        return {}
+    with open(index_path, 'r') as f:
+        return json.load(f)
+
+def update_translation_index(video_name, updates):
+    """Merge {"artifact:language": source hash} entries into the index.
+
+    The read-modify-write runs under the index's lock, against the latest
+    published copy, so concurrent sessions and replicas keep each other's entries.
+    """
+    index_path = get_translation_index_path(video_name)
+    with single_flight.lock(work_key("translation_index", video_name)):
+        if shared_state.shared:
+            try:
+                shared_state.fetch_blob(shared_key(index_path), index_path)
+            except Exception as e:
+                print(f"Could not fetch {shared_key(index_path)}: {str(e)}")
+        index = load_translation_index(video_name)
+        index.update(updates)
+        tmp_path = f"{index_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(index, f, indent=2)
+        os.replace(tmp_path, index_path)
+        storage.register(index_path, "artifact")
+        publish_file(index_path)
+
+def translate_text(text, language):
+    prompt = f"""Translate the following content about a documentary film into {language}. Keep the markdown formatting, headings, lists and hashtags structure. Adapt idioms and calls to action naturally for a {language}-speaking audience, but do not add or remove content. Reply with the translation only.
+
+    Content:
+    {text}
+    """
+    return request_completion(get_client(), prompt, max_tokens=4096)
+
+def load_translation(video_name, artifact, language):
+    translation_path = get_translation_path(video_name, artifact, language)
+    if not fetch_shared_file(translation_path, "artifact"):
+        return None
+    with open(translation_path, 'r') as f:
+        return f.read()
+
+def localize_artifacts(video_name, artifacts, languages):
+    """Translate finished artifacts into each language concurrently.
+
+    Each artifact/language pair is keyed by the hash of its source text, so
+    unchanged text is never translated twice. Translations run on worker
+    threads, so failures are returned rather than shown. Returns
+    ({(artifact, language): status}, {(artifact, language): error message}).
+    """
+    index = load_translation_index(video_name)
+    statuses = {}
+    errors = {}
+    pending = {}
+    with ThreadPoolExecutor(max_workers=LLM_MAX_CONCURRENCY, thread_name_prefix="localize") as pool:
+        for artifact in artifacts:
+            source = load_artifact(video_name, artifact)
+            if not source:
+                for language in languages:
+                    statuses[(artifact, language)] = "missing source"
+                continue
+            source_hash = text_hash(source)
+            for language in languages:
+                cache_key = f"{artifact}:{language}"
+                translation_path = get_translation_path(video_name, artifact, language)
+                if index.get(cache_key) == source_hash and fetch_shared_file(translation_path, "artifact"):
+                    statuses[(artifact, language)] = "up to date"
+                    continue
+                future = pool.submit(
+                    single_flight.run,
+                    work_key("translation", language, source_hash),
+                    lambda source=source, language=language: translate_text(source, language)
+                )
+                pending[future] = (artifact, language, source_hash)
+
+        for future in as_completed(pending):
+            artifact, language, source_hash = pending[future]
+            try:
+                translation = future.result()
+                if not translation:
+                    raise ValueError("empty translation")
+            except Exception as e:
+                print(f"Error translating {artifact} into {language}: {str(e)}")
+                statuses[(artifact, language)] = "failed"
+                errors[(artifact, language)] = str(e)
+                continue
+            translation_path = get_translation_path(video_name, artifact, language)
+            tmp_path = f"{translation_path}.tmp"
+            with open(tmp_path, 'w') as f:
+                f.write(translation)
+            os.replace(tmp_path, translation_path)
+            storage.register(translation_path, "artifact")
+            publish_file(translation_path)
+            update_translation_index(video_name, {f"{artifact}:{language}": source_hash})
+            statuses[(artifact, language)] = "translated"
+    return statuses, errors
+
+# Background pre-generation of artifacts once a transcript is ready (opt-in)
+PREFETCH_ENABLED_DEFAULT = os.getenv("PREFETCH_ARTIFACTS", "0") == "1"
+# A small dedicated pool keeps prefetching at low priority next to interactive requests
+@st.cache_resource
+def get_prefetch_executor():
+    return ThreadPoolExecutor(
+        max_workers=int(os.getenv("PREFETCH_WORKERS", "1")),
+        thread_name_prefix="prefetch"
+    )
+
+prefetch_executor = get_prefetch_executor()
+
+def prefetch_artifact(video_name, artifact, transcript_text, jobs):
+    """Background job: generate and save one artifact"""
+    target_audience_text = None
+    if artifact == "impact_orgs":
+        target_audience_job = jobs.get("target_audience")
+        if target_audience_job is not None and not target_audience_job.cancelled():
+            target_audience_text = target_audience_job.result()
+        else:
+            # The session generated it itself (see take_prefetched_artifact)
+            target_audience_text = load_artifact(video_name, "target_audience")
+        if not target_audience_text:
+            print(f"Skipping impact_orgs prefetch for {video_name}: no target audience")
+            return None
+    print(f"Prefetching {artifact} for {video_name}...")
+    return generate_and_save_artifact(video_name, artifact, transcript_text, target_audience_text, background=True)
+
+def schedule_prefetch(video_name, transcript_text):
+    """Schedule every text artifact for background generation.
+
+    Artifacts already saved on disk and not stale become completed jobs, so they
+    are not regenerated.
+    """
+    jobs = {}
+    for artifact in ARTIFACTS:
+        existing = load_artifact(video_name, artifact)
+        # Stale artifacts, and those built on a dependency being regenerated, are regenerated too
+        if existing and (
+            artifact_status(video_name, artifact, transcript_text) == "stale"
+            or any(not jobs[dependency].done() for dependency in ARTIFACT_DEPENDENCIES.get(artifact, []))
+        ):
+            existing = None
+        if existing:
+            job = Future()
+            job.set_result(existing)
+        else:
+            job = prefetch_executor.submit(prefetch_artifact, video_name, artifact, transcript_text, jobs)
+        jobs[artifact] = job
+    return jobs
+
+def cancel_prefetch(jobs):
+    """Cancel prefetch jobs that have not started yet"""
+    for artifact, job in jobs.items():
+        if job.cancel():
+            print(f"Cancelled prefetch of {artifact}")
+
+def take_prefetched_artifact(artifact):
+    """Return a prefetched artifact for the current video, or None to generate it inline.
+
+    The prefetch pool is shared by every session, so a job that has not
+    started may be queued behind other films; it is cancelled rather than
+    waited for. A job already running is waited for, and its error reported here.
+    """
+    job = st.session_state.prefetch_jobs.pop(artifact, None)
+    if job is None or job.cancel() or job.cancelled():
+        return None
+    try:
+        return job.result()
+    except Exception as e:
+        print(f"Prefetch of {artifact} failed: {str(e)}")
+        st.warning(f"Background generation failed ({str(e)}); generating it now.")
+        return None
+
+class IngestedFile:
+    """Stands in for an UploadedFile whose film was streamed straight into UPLOADS_DIR"""
+    def __init__(self, name):
+        self.name = name
+
+def ingest_film(url, audio_only=False, on_progress=None):
+    """Stream a film from an HTTP(S) or S3 URL into UPLOADS_DIR and return its file name.
+
+    With audio_only the audio track is extracted while the film downloads.
+    """
+    if not ingest.is_remote_source(url):
+        raise ValueError("Enter an http(s):// or s3:// URL")
+    name = ingest.filename_from_url(url)
+    video_name = os.path.splitext(name)[0]
+    video_path = os.path.join(UPLOADS_DIR, name)
+
+    def download():
+        tee = None
+        if audio_only and not os.path.exists(get_transcription_audio_path(video_name)):
+            tee = ingest.AudioTee(get_transcription_audio_path(video_name))
+        start = time.time()
+        try:
+            sha256 = ingest.stream_download(ingest.resolve_url(url), video_path, on_progress, tee)
+        except BaseException:
+            if tee is not None:
+                tee.abort()
+            raise
+        print(f"Ingested {name} in {time.time() - start:.1f}s (sha256 {sha256})")
+        if tee is not None:
+            if tee.finish():
+                storage.register(get_transcription_audio_path(video_name), "upload")
+            else:
+                print("Audio could not be extracted during download; extracting from the file instead")
+        storage.register(video_path, "upload", sha256)
+        shared_state.set_meta(f"ingest:{name}", {'url': url, 'sha256': sha256, 'size': os.path.getsize(video_path)})
+        return name
+
+    def load_existing():
+        """The finished download, if the file on disk is the one recorded for this URL"""
+        known = shared_state.get_meta(f"ingest:{name}")
+        if not known or known.get('url') != url or not os.path.exists(video_path):
+            return None
+        if os.path.getsize(video_path) != known.get('size'):
+            return None
+        storage.register(video_path, "upload")
+        if storage.sha256(video_path) != known.get('sha256'):
+            print(f"{name} does not match its recorded download; downloading again")
+            return None
+        return name
+
+    return single_flight.run(work_key("ingest", url), download, load_existing)
+
+def get_chapter_clip_path(video_name, chapter_idx, trim_silence=False, burn_captions=False):
+    """Get the path for a chapter clip; each trim/caption variant gets its own file.
+
+    video_name is the film's name without its extension: clips are always
+    encoded as MP4, whatever container the film was uploaded in.
+    """
+    variant = ("_trimmed" if trim_silence else "") + ("_captioned" if burn_captions else "")
+    return os.path.join(CHAPTERS_DIR, f"chapter_{chapter_idx}{variant}_{video_name}.mp4")
+
+def find_chapter_clip(video_name, chapter_idx):
+    """Path of an extracted clip of the chapter, preferring the plain variant, or None"""
+    for trim_silence in (False, True):
+        for burn_captions in (False, True):
+            clip_path = get_chapter_clip_path(video_name, chapter_idx, trim_silence, burn_captions)
+            if os.path.exists(clip_path):
+                return clip_path
+    return None
+
+# Low-bitrate renditions used by the in-app player, smallest first
+PROXY_RENDITIONS = [
+    {"name": "540p", "height": 540, "video_bitrate": "1M", "audio_bitrate": "96k"}
+]
+# Proxy encodes run at reduced priority so they never starve interactive work
+PROXY_NICENESS = int(os.getenv("PROXY_NICENESS", "10"))
+# Short per-upload jobs (publishing, probing, fingerprint backfills) get their own
+# workers, so they never wait behind another film's full-length proxy encode
+@st.cache_resource
+def get_media_executor():
+    return ThreadPoolExecutor(max_workers=int(os.getenv("MEDIA_WORKERS", "2")), thread_name_prefix="media")
+
+@st.cache_resource
+def get_proxy_executor():
+    return ThreadPoolExecutor(max_workers=int(os.getenv("PROXY_WORKERS", "1")), thread_name_prefix="proxy")
+
+@st.cache_resource
+def get_proxy_jobs():
+    return {}
+
+media_executor = get_media_executor()
+proxy_executor = get_proxy_executor()
+proxy_jobs = get_proxy_jobs()
+
+def get_proxy_path(video_name, rendition):
+    """Get the path for a playback proxy rendition"""
+    return os.path.join(PROXIES_DIR, f"{video_name}_proxy_{rendition['name']}.mp4")
+
+def create_playback_proxy(video_path, video_name, rendition):
+    """Encode one low-bitrate playback rendition of the source video"""
+    proxy_path = get_proxy_path(video_name, rendition)
+    if os.path.exists(proxy_path):
+        return proxy_path
+    print(f"Creating {rendition['name']} playback proxy for {video_name}...")
+    # Encode to a temporary file so the player never picks up a partial proxy
+    tmp_path = partial_path(proxy_path)
+    video_bitrate = rendition['video_bitrate']
+    run_ffmpeg([
+        "-i", video_path,
+        "-vf", f"scale=-2:'min({rendition['height']},ih)'",
+        "-c:v", "libx264", "-preset", "veryfast",
+        "-b:v", video_bitrate, "-maxrate", video_bitrate, "-bufsize", video_bitrate,
+        "-c:a", "aac", "-b:a", rendition['audio_bitrate'],
+        "-movflags", "+faststart",
+        tmp_path
+    ], niceness=PROXY_NICENESS)
+    os.replace(tmp_path, proxy_path)
+    storage.register(proxy_path, "proxy")
+    storage.enforce_quota(PROXIES_DIR, protect=[proxy_path])
+    return proxy_path
+
+def create_playback_proxies(video_path, video_name):
+    """Encode every configured playback rendition, smallest first; returns the proxies made"""
+    created = []
+    storage.hold(video_path, f"proxy:{video_name}", SOURCE_JOB_HOLD_SECONDS)
+    try:
+        for rendition in PROXY_RENDITIONS:
+            try:
+                created.append(create_playback_proxy(video_path, video_name, rendition))
+            except Exception as e:
+                print(f"Error creating {rendition['name']} proxy: {str(e)}")
+    finally:
+        storage.release(video_path, f"proxy:{video_name}")
+    return created
+
+def schedule_playback_proxies(video_path, video_name):
+    """Start proxy generation in the background unless it is already running"""
+    job = proxy_jobs.get(video_name)
+    if job is not None and not job.done():
+        return job
+    proxy_jobs[video_name] = proxy_executor.submit(create_playback_proxies, video_path, video_name)
+    return proxy_jobs[video_name]
+
+def get_playback_path(video_path, video_name):
+    """Pick the smallest finished proxy for the player, falling back to the original"""
+    for rendition in PROXY_RENDITIONS:
+        proxy_path = get_proxy_path(video_name, rendition)
+        if os.path.exists(proxy_path):
+            storage.touch(proxy_path)
+            return proxy_path
+    return video_path
+
+# Seconds between checks for a finished proxy while the player shows a placeholder
+PROXY_POLL_SECONDS = 5
+
+def show_playback_placeholder(video_path, video_name):
+    """Stand-in for the player until a proxy exists; reruns the page once one does"""
+    job = proxy_jobs.get(video_name)
+    if job is not None and job.done() and not job.result():
+        st.warning("A playback version could not be created. Turn on 'Play original quality' to stream the upload.")
+        return
+    # Starts the encode again if an earlier proxy was evicted
+    job = schedule_playback_proxies(video_path, video_name)
+    st.info("Preparing a lighter playback version of this video...")
+
+    def poll():
+        if get_playback_path(video_path, video_name) != video_path or job.done():
+            st.rerun()
+
+    if hasattr(st, "fragment"):
+        st.fragment(poll, run_every=PROXY_POLL_SECONDS)()
+    elif st.button("Check again"):
+        st.rerun()
+
+# Serve chapters as playlists over segments of the source instead of re-encoded MP4 copies
+HLS_CLIPS_DEFAULT = os.getenv("CHAPTER_CLIPS_MODE", "mp4") == "hls"
+HLS_SEGMENT_SECONDS = int(os.getenv("HLS_SEGMENT_SECONDS", "4"))
 
-def get_chapter_clip_path(video_name, chapter_idx):
-    """Get the path for a chapter clip"""
-    return os.path.join(CHAPTERS_DIR, f"chapter_{chapter_idx}_{video_name}")
+def get_segments_dir(video_name):
+    """Get the folder holding a video's HLS segments and playlists"""
+    return os.path.join(SEGMENTS_DIR, video_name)
 
-def create_transcript(input_video_path, video_name):
+def segment_film(video_path, video_name):
+    """Segment a film for HLS playback once and keep its folder under the segments quota"""
+    segments_dir = get_segments_dir(video_name)
+    source_playlist = hls.segment_source(video_path, segments_dir, HLS_SEGMENT_SECONDS)
+    if storage.is_tracked(segments_dir):
+        storage.touch(segments_dir)
+    else:
+        storage.register(segments_dir, "segments")
+        storage.enforce_quota(SEGMENTS_DIR, protect=[segments_dir])
+    # Other sessions may not evict the segments this one is streaming
+    storage.hold(segments_dir, get_session_owner(), SESSION_HOLD_SECONDS)
+    return source_playlist
+
+def get_chapter_playlist_path(video_name, chapter_idx):
+    """Get the path for a chapter's HLS playlist"""
+    return os.path.join(get_segments_dir(video_name), f"chapter_{chapter_idx}.m3u8")
+
+def get_static_url(path):
+    """URL under which Streamlit's static file serving exposes a file in STATIC_DIR"""
+    relative_path = os.path.relpath(path, STATIC_DIR).replace(os.sep, "/")
+    return f"/app/static/{urllib.parse.quote(relative_path)}"
+
+def prepare_chapter_playlists(video_path, video_name, chapters):
+    """Segment the source once and write a lightweight playlist per chapter.
+
+    Returns {chapter_idx: start offset in seconds within the chapter playlist}.
+    """
+    source_playlist = segment_film(video_path, video_name)
+    segments = hls.read_segments(source_playlist)
+    offsets = {}
+    for idx, chapter in enumerate(chapters, 1):
+        offsets[idx] = hls.write_chapter_playlist(
+            segments,
+            chapter['start'],
+            chapter['end'],
+            get_chapter_playlist_path(video_name, idx)
+        )
+    return offsets
+
+def get_word_index_path(video_name):
+    """Get the path of the word timings the transcript viewer fetches"""
+    return os.path.join(WORD_INDEX_DIR, f"{video_name}_words.json")
+
+def prepare_transcript_viewer(video_path, video_name, words):
+    """Segment the playback proxy and write the word index once.
+
+    Like the player, the viewer never streams the master: the proxy is
+    stream-copied into HLS segments (small and quick) the first time the
+    viewer opens. Returns the static URLs of the playlist and of the word
+    index, or (None, None) while the proxy is still being made.
+    """
+    proxy_path = get_playback_path(video_path, video_name)
+    if proxy_path == video_path:
+        return None, None
+    source_playlist = segment_film(proxy_path, os.path.splitext(os.path.basename(proxy_path))[0])
+    words_path = transcript_viewer.write_word_index(words, get_word_index_path(video_name))
+    storage.register(words_path, "artifact")
+    storage.enforce_quota(WORD_INDEX_DIR, protect=[words_path])
+    storage.hold(words_path, get_session_owner(), SESSION_HOLD_SECONDS)
+    return get_static_url(source_playlist), get_static_url(words_path)
+
+# Social clip rendering: one decode per chapter fanned out to every selected aspect ratio
+SOCIAL_RENDER_THREADS = int(os.getenv("SOCIAL_RENDER_THREADS", "2"))
+SOCIAL_RENDER_NICENESS = int(os.getenv("SOCIAL_RENDER_NICENESS", "5"))
+SOCIAL_RENDER_TIMEOUT = int(os.getenv("SOCIAL_RENDER_TIMEOUT", "0")) or None
+
+def get_social_clip_path(video_name, chapter_idx, aspect):
+    """Get the path for a chapter rendered to a social aspect ratio"""
+    return os.path.join(SOCIAL_DIR, f"social_{aspect}_chapter_{chapter_idx}_{video_name}.mp4")
+
+def render_chapter_social_clips(video_path, video_name, chapter_idx, chapter, aspects, crop_mode,
+                                words=None, burn_captions=False):
+    """Render the missing aspect ratios of a chapter in a single ffmpeg pass.
+
+    With burn_captions the chapter's captions are burned in by that same pass.
+    """
+    outputs = {
+        aspect: get_social_clip_path(video_name, chapter_idx, aspect)
+        for aspect in aspects
+        if not fetch_shared_file(get_social_clip_path(video_name, chapter_idx, aspect), "clip")
+    }
+    if not outputs:
+        return outputs
+
+    burn_captions = bool(burn_captions and words)
+
+    def render():
+        captions_path = None
+        if burn_captions:
+            captions_path = os.path.join(SOCIAL_DIR, f"captions_chapter_{chapter_idx}_{video_name}.burn.srt")
+            captions.write_captions(words, captions_path, chapter['start'], chapter['end'])
+        try:
+            social_render.render_social_clips(
+                video_path,
+                chapter['start'],
+                chapter['end'],
+                outputs,
+                crop_mode=crop_mode,
+                threads=SOCIAL_RENDER_THREADS,
+                niceness=SOCIAL_RENDER_NICENESS,
+                timeout=SOCIAL_RENDER_TIMEOUT,
+                captions_path=captions_path
+            )
+        finally:
+            if captions_path and os.path.exists(captions_path):
+                os.remove(captions_path)
+        for output_path in outputs.values():
+            storage.register(output_path, "clip")
+            publish_file(output_path)
+        storage.enforce_quota(SOCIAL_DIR, protect=outputs.values())
+        return outputs
+
+    return single_flight.run(
+        work_key("social", film_hash(video_path), chapter['start'], chapter['end'], crop_mode, burn_captions, *sorted(outputs)),
+        render,
+        lambda: outputs if all(os.path.exists(path) for path in outputs.values()) else None
+    )
+
+# Highlight reels: the best moments of a film joined mostly by stream copy
+HIGHLIGHT_TARGET_SECONDS = float(os.getenv("HIGHLIGHT_TARGET_SECONDS", "75"))
+HIGHLIGHT_MAX_SECONDS = float(os.getenv("HIGHLIGHT_MAX_SECONDS", "90"))
+
+def get_highlight_reel_path(video_name):
+    """Get the path for a film's highlight reel"""
+    return os.path.join(CHAPTERS_DIR, f"highlight_reel_{video_name}.mp4")
+
+# Captions are built from the transcript's word timings, as sidecar files or
+# burned into clips during their encode
+CAPTION_BURN_IN_DEFAULT = os.getenv("CAPTION_BURN_IN", "0") == "1"
+
+def get_caption_path(video_name, fmt):
+    """Get the path of a film's caption file ('srt' or 'vtt')"""
+    return os.path.join(TRANSCRIPTS_DIR, f"{video_name}_captions.{fmt}")
+
+def get_clip_caption_path(clip_path, fmt):
+    """Get the path of the caption sidecar of a clip"""
+    return f"{os.path.splitext(clip_path)[0]}.{fmt}"
+
+def write_film_captions(video_name, transcript_data):
+    """Write the film's SRT and WebVTT captions unless they are newer than the transcript"""
     transcript_path = os.path.join(TRANSCRIPTS_DIR, f"{video_name}_transcript.json")
+    transcript_mtime = os.path.getmtime(transcript_path) if os.path.exists(transcript_path) else 0
+    paths = {}
+    for fmt in captions.CAPTION_FORMATS:
+        caption_path = get_caption_path(video_name, fmt)
+        if not os.path.exists(caption_path) or os.path.getmtime(caption_path) < transcript_mtime:
+            cue_count = captions.write_captions(transcript_data.get('words') or [], caption_path)
+            storage.register(caption_path, "artifact")
+            print(f"Wrote {cue_count} caption cues to {os.path.basename(caption_path)}")
+        paths[fmt] = caption_path
+    return paths
+
+def write_clip_captions(clip_path, words, start_ms, end_ms):
+    """Write SRT and WebVTT sidecars for a clip covering [start_ms, end_ms) of the film"""
+    paths = {}
+    for fmt in captions.CAPTION_FORMATS:
+        caption_path = get_clip_caption_path(clip_path, fmt)
+        captions.write_captions(words, caption_path, start_ms, end_ms)
+        storage.register(caption_path, "artifact")
+        publish_file(caption_path)
+        paths[fmt] = caption_path
+    return paths
+
+def chapter_playlist_offset(video_name, chapter):
+    """Seconds between the start of a chapter's HLS playlist and the chapter itself"""
+    source_playlist = os.path.join(get_segments_dir(video_name), hls.SOURCE_PLAYLIST)
+    start_sec = ms_to_seconds(chapter['start'])
+    for _, segment_start, duration in hls.read_segments(source_playlist):
+        if segment_start + duration > start_sec:
+            return start_sec - segment_start
+    return 0.0
+
+def create_highlight_reel(video_path, video_name, transcript_data, target_seconds=HIGHLIGHT_TARGET_SECONDS):
+    """Pick the film's strongest moments and join them into one MP4; returns (path, spans)"""
+    reel_path = get_highlight_reel_path(video_name)
+    spans = highlight_reel.select_spans(
+        highlight_reel.score_moments(transcript_data),
+        target_seconds,
+        max(target_seconds, HIGHLIGHT_MAX_SECONDS)
+    )
+    if not spans:
+        raise ValueError("No moments long enough for a highlight reel")
+
+    def assemble():
+        start = time.time()
+        copied = highlight_reel.assemble_reel(
+            video_path,
+            spans,
+            try_media_index(video_path, video_name),
+            reel_path,
+            threads=SOCIAL_RENDER_THREADS,
+            niceness=SOCIAL_RENDER_NICENESS
+        )
+        total = sum(span['end'] - span['start'] for span in spans) / 1000.0
+        print(f"Highlight reel for {video_name}: {total:.1f}s, {copied:.1f}s stream-copied, built in {time.time() - start:.1f}s")
+        storage.register(reel_path, "clip")
+        storage.enforce_quota(CHAPTERS_DIR, protect=[reel_path])
+        publish_file(reel_path)
+        return reel_path
+
+    single_flight.run(
+        work_key("highlight", film_hash(video_path), *[f"{span['start']}-{span['end']}" for span in spans]),
+        assemble
+    )
+    return reel_path, spans
+
+@st.cache_resource
+def open_chapter_index():
+    from chapter_index import ChapterIndex
+    return ChapterIndex(os.path.join(CATALOG_DIR, "chapter_index"))
+
+@st.cache_resource
+def open_topic_matrix():
+    from topic_matrix import TopicMatrix
+    return TopicMatrix(os.path.join(CATALOG_DIR, "topic_matrix"))
+
+def get_topic_matrix():
+    """Open the film-by-topic matrix, adding any transcripts it has not seen"""
+    topic_matrix = open_topic_matrix()
+    topic_matrix.sync(TRANSCRIPTS_DIR)
+    return topic_matrix
+
+def get_chapter_index():
+    """Open the cross-film chapter index, indexing any transcripts it has not seen"""
+    chapter_index = open_chapter_index()
+    chapter_index.sync(TRANSCRIPTS_DIR)
+    return chapter_index
+
+def load_transcript(transcript_path):
+    """Load a cached transcript, or None if it doesn't exist"""
+    if not fetch_shared_file(transcript_path, "transcript"):
+        return None
+    print("Loading existing transcript...")
+    storage.touch(transcript_path)
+    with open(transcript_path, 'r') as f:
+        return json.load(f)
+
+def get_transcript_path(video_name):
+    return os.path.join(TRANSCRIPTS_DIR, f"{video_name}_transcript.json")
+
+def save_transcript(video_name, transcript_data):
+    """Write the transcript cache file unless another session already did"""
+    transcript_path = get_transcript_path(video_name)
+    if not os.path.exists(transcript_path):
+        tmp_path = f"{transcript_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(transcript_data, f)
+        os.replace(tmp_path, transcript_path)
+        storage.register(transcript_path, "transcript")
+        publish_file(transcript_path)
+        try:
+            open_topic_matrix().add_film(
+                video_name,
+                transcript_data.get('categories') or {},
+                os.path.getmtime(transcript_path)
+            )
+        except Exception as e:
+            print(f"Could not add {video_name} to the topic matrix: {str(e)}")
+
+def create_transcript(input_video_path, video_name, audio_only=False):
+    transcript_path = get_transcript_path(video_name)
     
     # Check if transcript already exists
-    if os.path.exists(transcript_path):
-        print("Loading existing transcript...")
-        with open(transcript_path, 'r') as f:
-            transcript_data = json.load(f)
+    transcript_data = load_transcript(transcript_path)
+    if transcript_data is not None:
+        schedule_fingerprint_backfill(input_video_path, video_name)
+        return transcript_data
+
+    # The same film may already have been transcribed under another name, on any replica
+    current_hash = film_hash(input_video_path)
+    known = shared_state.get_meta(f"film:{current_hash}")
+    if known and known.get('video_name') != video_name:
+        transcript_data = load_transcript(get_transcript_path(known['video_name']))
+        if transcript_data is not None:
+            save_transcript(video_name, transcript_data)
+            schedule_fingerprint_backfill(input_video_path, video_name)
             return transcript_data
+
+    # Sessions uploading the same film at the same time share one transcription job
+    storage.hold(input_video_path, f"transcript:{video_name}", SOURCE_JOB_HOLD_SECONDS)
+    try:
+        transcript_data = single_flight.run(
+            work_key("transcript", current_hash),
+            lambda: transcribe_or_reuse(input_video_path, video_name, audio_only),
+            lambda: load_transcript(transcript_path)
+        )
+    finally:
+        storage.release(input_video_path, f"transcript:{video_name}")
+
+    save_transcript(video_name, transcript_data)
+    remove_transcript_job(video_name)
+    shared_state.set_meta(f"film:{current_hash}", {'video_name': video_name})
     
-    print("Creating new transcript...")
-    transcript = transcriber.transcribe(input_video_path)
+    return transcript_data
+
+# Re-encoded or trimmed copies of a processed film are recognised by their audio
+# and reuse its transcript and artifacts instead of being transcribed again
+FINGERPRINT_MATCH_THRESHOLD = float(os.getenv("FINGERPRINT_MATCH_THRESHOLD", "0.02"))
+
+@st.cache_resource
+def open_fingerprint_index():
+    from fingerprint_index import FingerprintIndex
+    return FingerprintIndex(os.path.join(CATALOG_DIR, "fingerprints"))
+
+def fingerprint_film(video_path):
+    """Audio fingerprint of a film as (hashes, anchor frames)"""
+    from audio_analysis import fingerprint_audio
+    start = time.time()
+    fingerprint = fingerprint_audio(video_path)
+    print(f"Fingerprinted {os.path.basename(video_path)} in {time.time() - start:.1f}s ({len(fingerprint[0])} hashes)")
+    return fingerprint
+
+def backfill_fingerprint(video_path, video_name):
+    """Background job: fingerprint a film transcribed before fingerprints were kept"""
+    def fingerprint():
+        open_fingerprint_index().add(video_name, *fingerprint_film(video_path))
+        return True
+
+    storage.hold(video_path, f"fingerprint:{video_name}", SOURCE_JOB_HOLD_SECONDS)
+    try:
+        single_flight.run(
+            work_key("fingerprint", video_name),
+            fingerprint,
+            lambda: True if video_name in open_fingerprint_index() else None
+        )
+    except Exception as e:
+        print(f"Could not fingerprint {video_name}: {str(e)}")
+    finally:
+        storage.release(video_path, f"fingerprint:{video_name}")
+
+def schedule_fingerprint_backfill(video_path, video_name):
+    """Queue a fingerprint for a film with a cached transcript, so copies of it are recognised"""
+    try:
+        if video_name in open_fingerprint_index():
+            return
+    except Exception as e:
+        print(f"Could not open the fingerprint index: {str(e)}")
+        return
+    media_executor.submit(backfill_fingerprint, video_path, video_name)
+
+def shift_transcript(transcript_data, offset_ms, duration_ms=None):
+    """Move a transcript onto the timeline of a copy starting offset_ms into the original.
+
+    Chapters and words outside the copy are dropped and the rest clamped to it.
+    """
+    def inside(start, end):
+        return end - offset_ms > 0 and (duration_ms is None or start - offset_ms < duration_ms)
+
+    def clamp(ms):
+        ms = max(ms - offset_ms, 0)
+        return min(ms, duration_ms) if duration_ms is not None else ms
+
+    shifted = dict(transcript_data)
+    shifted['chapters'] = [
+        dict(chapter, start=clamp(chapter['start']), end=clamp(chapter['end']))
+        for chapter in transcript_data['chapters']
+        if inside(chapter['start'], chapter['end'])
+    ]
+    words = transcript_data.get('words') or []
+    if words:
+        shifted['words'] = [
+            [clamp(start), clamp(end), text]
+            for start, end, text in words
+            if inside(start, end)
+        ]
+        if len(shifted['words']) < len(words):
+            shifted['text'] = " ".join(text for _, _, text in shifted['words'])
+    return shifted
+
+def reuse_matched_film(video_name, matched_name, offset_ms, input_video_path):
+    """Copy a matching film's transcript (offset-corrected) and artifacts to this film"""
+    transcript_data = load_transcript(get_transcript_path(matched_name))
+    if transcript_data is None:
+        return None
+    media_index = try_media_index(input_video_path, video_name)
+    duration = media_index.duration if media_index else None
+    duration_ms = int(duration * 1000) if duration else None
+    transcript_data = shift_transcript(transcript_data, int(round(offset_ms)), duration_ms)
+
+    for artifact in ARTIFACTS:
+        content = load_artifact(matched_name, artifact)
+        if content and load_artifact(video_name, artifact) is None:
+            # The recorded inputs come along, so a trimmed transcript shows them as stale
+            meta = load_artifact_meta(matched_name, artifact)
+            save_artifact(video_name, artifact, content, meta['inputs'] if meta else None)
+    return transcript_data
+
+def transcribe_or_reuse(input_video_path, video_name, audio_only=False):
+    """Reuse the transcript of a film with matching audio, or transcribe the film"""
+    job = load_transcript_job(video_name)
+    if job and job.get('transcript_id'):
+        return transcribe_video(input_video_path, video_name, audio_only)
+
+    fingerprint = None
+    try:
+        fingerprint = fingerprint_film(input_video_path)
+        match = open_fingerprint_index().match(*fingerprint, exclude=video_name)
+        if match and match[2] >= FINGERPRINT_MATCH_THRESHOLD:
+            matched_name, offset_ms, score = match
+            print(f"Audio matches {matched_name} (score {score:.2f}, offset {offset_ms / 1000:.2f}s)")
+            transcript_data = reuse_matched_film(video_name, matched_name, offset_ms, input_video_path)
+            if transcript_data is not None:
+                open_fingerprint_index().add(video_name, *fingerprint)
+                return transcript_data
+    except Exception as e:
+        print(f"Audio fingerprint matching failed: {str(e)}")
+
+    transcript_data = transcribe_video(input_video_path, video_name, audio_only)
+    if fingerprint is not None:
+        open_fingerprint_index().add(video_name, *fingerprint)
+    return transcript_data
+
+# Remote AssemblyAI jobs are recorded in the shared job table as soon as their
+# IDs are known, so a restarted server, or any other replica, resumes polling
+# instead of re-uploading and paying again.
+TRANSCRIPT_JOB_LEASE = int(os.getenv("TRANSCRIPT_JOB_LEASE", "900"))
+TRANSCRIPT_JOB_POLL = int(os.getenv("TRANSCRIPT_JOB_POLL", "60"))
+
+def get_transcript_job_id(video_name):
+    return f"transcript:{video_name}"
+
+def load_transcript_job(video_name):
+    return shared_state.get_job(get_transcript_job_id(video_name))
+
+def save_transcript_job(video_name, job):
+    """Record a job; this replica holds it for TRANSCRIPT_JOB_LEASE seconds"""
+    shared_state.put_job(
+        get_transcript_job_id(video_name),
+        "transcript",
+        dict(job, video_name=video_name),
+        owner=REPLICA_ID,
+        lease=TRANSCRIPT_JOB_LEASE
+    )
+
+def remove_transcript_job(video_name):
+    shared_state.delete_job(get_transcript_job_id(video_name))
+
+# Audio-only transcription uploads a compact AAC track instead of the whole film
+TRANSCRIBE_AUDIO_ONLY_DEFAULT = os.getenv("TRANSCRIBE_AUDIO_ONLY", "0") == "1"
+
+def get_transcription_audio_path(video_name):
+    """Get the path of the audio track uploaded for audio-only transcription"""
+    return os.path.join(UPLOADS_DIR, f"{video_name}_audio.m4a")
+
+def extract_transcription_audio(input_video_path, video_name):
+    """Extract the film's audio track once (URL ingest may already have done it)"""
+    audio_path = get_transcription_audio_path(video_name)
+    if os.path.exists(audio_path):
+        return audio_path
+    print(f"Extracting audio track of {video_name}...")
+    tmp_path = audio_path.replace(".m4a", ".partial.m4a")
+    run_ffmpeg([
+        "-i", input_video_path,
+        "-map", "0:a:0", "-vn",
+        "-c:a", "aac", "-b:a", "64k",
+        tmp_path
+    ])
+    os.replace(tmp_path, audio_path)
+    storage.register(audio_path, "upload")
+    return audio_path
+
+def transcribe_video(input_video_path, video_name, audio_only=False):
+    """Transcribe a video with AssemblyAI and return the transcript data.
+
+    Upload, submit and polling are separate steps; the upload URL and remote
+    transcript ID are persisted after each one, and an existing job for the
+    same film is resumed rather than resubmitted. With audio_only just the
+    audio track is uploaded.
+    """
+    transcriber = get_transcriber()
+    current_hash = film_hash(input_video_path)
+    job = load_transcript_job(video_name)
+    if not job or job.get('film_hash') != current_hash:
+        job = {'film_hash': current_hash, 'video_path': input_video_path}
+
+    if job.get('transcript_id'):
+        print(f"Resuming transcription job {job['transcript_id']}...")
+    else:
+        if not job.get('upload_url'):
+            upload_path = input_video_path
+            if audio_only:
+                upload_path = extract_transcription_audio(input_video_path, video_name)
+            print(f"Uploading {os.path.basename(upload_path)} for transcription...")
+            job['upload_url'] = transcriber.upload_file(upload_path)
+            save_transcript_job(video_name, job)
+        print("Creating new transcript...")
+        transcript = transcriber.submit(job['upload_url'])
+        job['transcript_id'] = transcript.id
+        job['submitted_at'] = datetime.now().isoformat()
+        save_transcript_job(video_name, job)
+
+    try:
+        return wait_for_transcript(job['transcript_id'])
+    except RuntimeError:
+        # A failed job can't be resumed; the next attempt starts over
+        remove_transcript_job(video_name)
+        raise
+
+def wait_for_transcript(transcript_id):
+    """Poll a remote transcript until it finishes and return the transcript data"""
+    import assemblyai as aai
+    get_transcriber()  # make sure the API key is configured
+    transcript = aai.Transcript.get_by_id(transcript_id)
     
     if transcript.error: raise RuntimeError(transcript.error)
     print("Transcript Text:")
@@ -287,17 +1703,90 @@ def create_transcript(input_video_path, video_name):
             }
             for chapter in transcript.chapters
         ],
+        # [start_ms, end_ms, text] per word, for captions and the transcript viewer
+        'words': [
+            [word.start, word.end, word.text]
+            for word in (transcript.words or [])
+        ],
         'categories': {
             topic: relevance
             for topic, relevance in transcript.iab_categories.summary.items()
         }
     }
     
-    with open(transcript_path, 'w') as f:
-        json.dump(transcript_data, f)
-    
     return transcript_data
 
+def finish_transcript_job(video_name, job):
+    """Background task: fetch a job left over from a previous process into the transcript cache"""
+    try:
+        transcript_data = single_flight.run(
+            work_key("transcript", job['film_hash']),
+            lambda: wait_for_transcript(job['transcript_id']),
+            lambda: load_transcript(get_transcript_path(video_name))
+        )
+        save_transcript(video_name, transcript_data)
+        remove_transcript_job(video_name)
+        print(f"Finished resumed transcription of {video_name}")
+    except RuntimeError as e:
+        print(f"Transcription of {video_name} failed remotely: {str(e)}")
+        remove_transcript_job(video_name)
+    except Exception as e:
+        # Keep the job so the next start or upload can try again
+        print(f"Error resuming transcription of {video_name}: {str(e)}")
+
+def migrate_transcript_job_files():
+    """Move jobs recorded as {video}_transcript_job.json files into the job table"""
+    for name in os.listdir(TRANSCRIPTS_DIR):
+        if not name.endswith("_transcript_job.json"):
+            continue
+        job_path = os.path.join(TRANSCRIPTS_DIR, name)
+        video_name = name[:-len("_transcript_job.json")]
+        with open(job_path, 'r') as f:
+            job = json.load(f)
+        shared_state.put_job(get_transcript_job_id(video_name), "transcript", dict(job, video_name=video_name))
+        os.remove(job_path)
+
+def claim_transcript_jobs(include_own=False):
+    """Take over jobs whose replica stopped renewing them and finish them in the background"""
+    claimed = []
+    for _, job in shared_state.claim_jobs("transcript", REPLICA_ID, TRANSCRIPT_JOB_LEASE, include_own):
+        video_name = job['video_name']
+        if load_transcript(get_transcript_path(video_name)) is not None:
+            remove_transcript_job(video_name)
+        elif job.get('transcript_id'):
+            print(f"Resuming transcription job for {video_name}...")
+            threading.Thread(
+                target=finish_transcript_job,
+                args=(video_name, job),
+                name=f"resume-{video_name}",
+                daemon=True
+            ).start()
+            claimed.append(video_name)
+    return claimed
+
+def watch_transcript_jobs():
+    """Background loop: resume this host's jobs from before a restart, then pick up abandoned ones"""
+    include_own = True
+    while True:
+        try:
+            claim_transcript_jobs(include_own)
+            include_own = False
+        except Exception as e:
+            print(f"Error checking transcription jobs: {str(e)}")
+        time.sleep(TRANSCRIPT_JOB_POLL)
+
+@st.cache_resource
+def resume_transcript_jobs():
+    """Once per process, start watching the job table for transcriptions to finish"""
+    migrate_transcript_job_files()
+    watcher = threading.Thread(target=watch_transcript_jobs, name="transcript-jobs", daemon=True)
+    watcher.start()
+    return watcher
+
+# Command-line tools that import this module (e.g. backfill.py) set DFS_BACKGROUND_JOBS=0
+if os.getenv("DFS_BACKGROUND_JOBS", "1") == "1":
+    resume_transcript_jobs()
+
 def ms_to_timecode(ms):
     """Convert milliseconds to HH:MM:SS format"""
     seconds = int(ms / 1000)
@@ -310,15 +1799,206 @@ def ms_to_seconds(ms):
     """Convert milliseconds to seconds"""
     return ms / 1000.0
 
-def extract_chapter_clip(video_path, start_ms, end_ms, output_path):
-    """Extract a clip from the video based on start and end times"""
-    with VideoFileClip(video_path) as video:
+def get_media_index_path(video_name):
+    """Get the path of a film's probe results and keyframe index"""
+    return os.path.join(TRANSCRIPTS_DIR, f"{video_name}_media.json")
+
+@st.cache_resource
+def get_media_indexes():
+    return {}
+
+media_indexes = get_media_indexes()
+
+def get_media_index(video_path, video_name=None):
+    """Stream metadata and keyframes of a film, probed once and then read from disk"""
+    if video_name is None:
+        video_name = os.path.splitext(os.path.basename(video_path))[0]
+    index_path = get_media_index_path(video_name)
+    stat = os.stat(video_path)
+    index = media_indexes.get(index_path)
+    if index is not None and index.data.get("source") == {"size": stat.st_size, "mtime": stat.st_mtime}:
+        return index
+
+    def build():
+        index = MediaIndex.build(video_path, index_path)
+        storage.register(index_path, "artifact")
+        return index
+
+    index = single_flight.run(
+        work_key("probe", index_path),
+        build,
+        lambda: MediaIndex.load(video_path, index_path)
+    )
+    media_indexes[index_path] = index
+    return index
+
+def try_media_index(video_path, video_name=None):
+    """get_media_index, or None when the film can't be probed (e.g. ffprobe is not installed)"""
+    try:
+        return get_media_index(video_path, video_name)
+    except Exception as e:
+        print(f"Could not probe {os.path.basename(video_path)}: {str(e)}")
+        return None
+
+# Chapter clips can be tightened to the speech inside them, dropping the
+# silence and room tone at chapter boundaries
+TRIM_SILENCE_DEFAULT = os.getenv("TRIM_SILENCE", "0") == "1"
+# Most a clip's start or end is moved (ms)
+SILENCE_TRIM_TOLERANCE_MS = int(float(os.getenv("SILENCE_TRIM_TOLERANCE", "4")) * 1000)
+
+def get_energy_envelope_path(video_name):
+    """Get the path of a film's cached audio energy envelope"""
+    return os.path.join(TRANSCRIPTS_DIR, f"{video_name}_energy.npy")
+
+@st.cache_resource
+def get_energy_envelopes():
+    return {}
+
+energy_envelopes = get_energy_envelopes()
+
+def get_energy_envelope(video_path, video_name=None):
+    """Short-window RMS energy of a film's audio, computed once and then read from disk"""
+    import numpy as np
+    from audio_analysis import energy_envelope
+    if video_name is None:
+        video_name = os.path.splitext(os.path.basename(video_path))[0]
+    envelope_path = get_energy_envelope_path(video_name)
+    if envelope_path in energy_envelopes:
+        return energy_envelopes[envelope_path]
+
+    def load_existing():
+        if fetch_shared_file(envelope_path, "artifact") and os.path.getmtime(envelope_path) >= os.path.getmtime(video_path):
+            return envelope_path
+        return None
+
+    def build():
+        start = time.time()
+        envelope = energy_envelope(video_path)
+        tmp_path = f"{envelope_path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.save(f, envelope)
+        os.replace(tmp_path, envelope_path)
+        storage.register(envelope_path, "artifact")
+        publish_file(envelope_path)
+        print(f"Computed energy envelope of {video_name} in {time.time() - start:.1f}s")
+        return envelope_path
+
+    single_flight.run(work_key("energy", film_hash(video_path)), build, load_existing)
+    envelope = np.load(envelope_path)
+    energy_envelopes[envelope_path] = envelope
+    return envelope
+
+def tighten_to_speech(video_path, start_ms, end_ms, tolerance_ms=SILENCE_TRIM_TOLERANCE_MS):
+    """Chapter bounds moved in to the nearest speech onset and offset, as (start_ms, end_ms)"""
+    from audio_analysis import speech_bounds
+    envelope = get_energy_envelope(video_path)
+    new_start, new_end = speech_bounds(envelope, start_ms, end_ms, tolerance_ms)
+    return int(new_start), int(new_end)
+
+def extract_chapter_clip(video_path, start_ms, end_ms, output_path, trim_silence=False, words=None, burn_captions=False):
+    """Extract a clip from the video based on start and end times.
+
+    With trim_silence the clip is tightened to the speech inside it. Given the
+    transcript's words, SRT and WebVTT sidecars are written for the clip and,
+    with burn_captions, burned in by the same encode. Returns
+    (output_path, seconds trimmed from the start, seconds trimmed from the end).
+    """
+    trimmed = (0.0, 0.0)
+    if trim_silence:
+        try:
+            tight_start, tight_end = tighten_to_speech(video_path, start_ms, end_ms)
+            trimmed = (ms_to_seconds(tight_start - start_ms), ms_to_seconds(end_ms - tight_end))
+            start_ms, end_ms = tight_start, tight_end
+        except Exception as e:
+            print(f"Could not trim silence, extracting the full chapter: {str(e)}")
+
+    def extract():
         start_sec = ms_to_seconds(start_ms)
         end_sec = ms_to_seconds(end_ms)
-        clip = video.subclip(start_sec, end_sec)
-        clip.write_videofile(output_path, codec='libx264')
+        # Start decoding at the keyframe before the cut instead of letting ffmpeg search for
+        # it; without a keyframe index, a plain input -ss leaves the search to ffmpeg
+        media_index = try_media_index(video_path)
+        seek_sec = media_index.keyframe_before(start_sec) if media_index else start_sec
+        tmp_path = partial_path(output_path)
+        filters = []
+        burn_path = None
+        if burn_captions and words:
+            # Filters see timestamps from the seek point, so the burned captions are timed from there
+            burn_path = f"{os.path.splitext(output_path)[0]}.burn.srt"
+            captions.write_captions(words, burn_path, int(seek_sec * 1000), end_ms)
+            filters = ["-vf", captions.subtitles_filter(burn_path)]
+        try:
+            run_ffmpeg([
+                "-ss", f"{seek_sec:.3f}",
+                "-i", video_path,
+                "-ss", f"{start_sec - seek_sec:.3f}",
+                "-t", f"{end_sec - start_sec:.3f}",
+                "-map", "0:v:0", "-map", "0:a:0?"
+            ] + filters + [
+                "-c:v", "libx264",
+                "-c:a", "aac",
+                "-movflags", "+faststart",
+                tmp_path
+            ])
+        finally:
+            if burn_path and os.path.exists(burn_path):
+                os.remove(burn_path)
+        os.replace(tmp_path, output_path)
+        if words:
+            write_clip_captions(output_path, words, start_ms, end_ms)
+        storage.register(output_path, "clip")
+        storage.dedupe(output_path)
+        storage.enforce_quota(CHAPTERS_DIR, protect=[output_path])
+        publish_file(output_path)
+        return output_path
+
+    # Two sessions extracting the same chapter wait for one encode
+    single_flight.run(
+        work_key("clip", film_hash(video_path), start_ms, end_ms, bool(trim_silence), bool(burn_captions and words), output_path),
+        extract,
+        lambda: output_path if fetch_shared_file(output_path, "clip") else None
+    )
+    if any(trimmed):
+        print(f"Trimmed {trimmed[0]:.2f}s + {trimmed[1]:.2f}s of silence from {os.path.basename(output_path)}")
+    return output_path, trimmed[0], trimmed[1]
+
+# Opt-in rerun profiling: ?profile=1 in the URL or DFS_PROFILE=1
+PROFILE_LOG_PATH = os.getenv("DFS_PROFILE_LOG", os.path.join(CURRENT_DIR, "profile_log.jsonl"))
+
+def profiling_enabled():
+    """Whether this rerun should be profiled"""
+    return os.getenv("DFS_PROFILE", "0") == "1" or st.query_params.get("profile") == "1"
+
+def get_profiler():
+    return st.session_state.get("rerun_profiler")
+
+def show_video(data):
+    """st.video that counts the bytes sent to the browser when profiling"""
+    profiler = get_profiler()
+    if profiler is not None:
+        profiler.record_bytes("video", len(data))
+    st.video(data)
+
+def show_markdown(text, **kwargs):
+    """st.markdown that counts the bytes sent to the browser when profiling"""
+    profiler = get_profiler()
+    if profiler is not None:
+        profiler.record_bytes("markdown", len(text.encode()))
+    st.markdown(text, **kwargs)
 
 def main():
+    profiler = RerunProfiler(profiling_enabled(), PROFILE_LOG_PATH)
+    st.session_state.rerun_profiler = profiler
+    completed = False
+    try:
+        render_app(profiler)
+        completed = True
+    finally:
+        profiler.finish()
+        if completed:
+            profiler.render_sidebar(st)
+
+def render_app(profiler):
     st.title("Documentary Film Suite")
     
     if 'current_video' not in st.session_state:
@@ -338,8 +2018,114 @@ def main():
         
     if 'social_posts' not in st.session_state:
         st.session_state.social_posts = None
+
+    if 'prefetch_jobs' not in st.session_state:
+        st.session_state.prefetch_jobs = {}
+
+    if 'artifact_statuses' not in st.session_state:
+        st.session_state.artifact_statuses = None
+
+    prefetch_enabled = st.sidebar.checkbox(
+        "Pre-generate content in background",
+        value=PREFETCH_ENABLED_DEFAULT,
+        help="Start generating all text content as soon as the transcript is ready."
+    )
+    hls_clips = st.sidebar.checkbox(
+        "Instant chapter clips (HLS)",
+        value=HLS_CLIPS_DEFAULT,
+        help="Segment the film once and play chapters from playlists. MP4 clips are only written when exporting."
+    )
+    social_aspects = st.sidebar.multiselect(
+        "Social clip formats",
+        list(social_render.ASPECT_SIZES),
+        default=list(social_render.ASPECT_SIZES)
+    )
+    social_crop_mode = st.sidebar.selectbox(
+        "Social clip framing",
+        ["center", "saliency"],
+        help="Crop around the frame center, or around the area with the most detail and motion."
+    )
+    audio_only = st.sidebar.checkbox(
+        "Transcribe audio only",
+        value=TRANSCRIBE_AUDIO_ONLY_DEFAULT,
+        help="Upload just the audio track for transcription instead of the whole film."
+    )
+    trim_silence = st.sidebar.checkbox(
+        "Trim silence from chapter clips",
+        value=TRIM_SILENCE_DEFAULT,
+        help="Start and end chapter clips at the nearest speech instead of the chapter boundaries."
+    )
+    burn_captions = st.sidebar.checkbox(
+        "Burn captions into clips",
+        value=CAPTION_BURN_IN_DEFAULT,
+        help="Draw captions onto chapter and social clips while they are encoded. Caption files are written either way."
+    )
+    play_original = st.sidebar.checkbox(
+        "Play original quality",
+        value=False,
+        help="Stream the full-bitrate upload instead of the low-bitrate playback proxy."
+    )
     
+    with st.sidebar.expander("Storage Usage"):
+        for directory, usage in storage.usage().items():
+            quota = format_bytes(usage['quota']) if usage['quota'] else "no quota"
+            st.write(f"**{os.path.basename(directory)}:** {format_bytes(usage['bytes'])} / {quota} ({usage['files']} files)")
+
+    with st.sidebar.expander("Catalog Topics"):
+        # Expander bodies run on every rerun, so the matrix is only synced and
+        # queried once the user asks for it
+        if st.checkbox("Show catalog topics", key="show_catalog_topics"):
+            try:
+                topic_matrix = get_topic_matrix()
+                st.caption(f"{len(topic_matrix.films)} films, {len(topic_matrix.topics)} topics")
+                topic_query = st.text_input("Films strongest on a topic", placeholder="e.g. housing")
+                if topic_query:
+                    topics = topic_matrix.find_topics(topic_query)
+                    top_films = topic_matrix.top_films(topics)
+                    if top_films:
+                        st.dataframe(
+                            [{"Film": film, "Relevance": round(relevance, 3)} for film, relevance in top_films],
+                            hide_index=True
+                        )
+                    else:
+                        st.write("No films on that topic")
+                if topic_matrix.films:
+                    film = st.selectbox("Films similar to", topic_matrix.films)
+                    similar = topic_matrix.similar_films(film)
+                    if similar:
+                        st.dataframe(
+                            [{"Film": other, "Similarity": round(similarity, 3)} for other, similarity in similar],
+                            hide_index=True
+                        )
+                    st.write("**Catalog topic coverage**")
+                    st.dataframe(
+                        [
+                            {"Topic": topic, "Films": count, "Mean relevance": round(mean, 3)}
+                            for topic, count, mean in topic_matrix.topic_distribution(level=1)
+                        ],
+                        hide_index=True
+                    )
+            except Exception as e:
+                st.error(f"Error loading catalog topics: {str(e)}")
+
+    profiler.mark("upload")
     uploaded_file = st.file_uploader("Choose a video file", type=['mp4'])
+    with st.expander("Or ingest from a URL"):
+        ingest_url = st.text_input("HTTP(S) or S3 URL of the film", placeholder="https://... or s3://bucket/film.mp4")
+        if st.button("Ingest Film") and ingest_url:
+            progress_bar = st.progress(0.0, text="Downloading...")
+
+            def show_progress(done, total):
+                if total:
+                    progress_bar.progress(min(done / total, 1.0), text=f"Downloading... {format_bytes(done)} / {format_bytes(total)}")
+
+            try:
+                st.session_state.ingested_film = ingest_film(ingest_url.strip(), audio_only, show_progress)
+                progress_bar.progress(1.0, text="Download complete")
+            except Exception as e:
+                st.error(f"Error ingesting film: {str(e)}")
+    if uploaded_file is None and st.session_state.get('ingested_film'):
+        uploaded_file = IngestedFile(st.session_state.ingested_film)
     
     if uploaded_file is not None:
         # Initialize session state
@@ -354,11 +2140,29 @@ def main():
             st.session_state.target_audience = None
             st.session_state.discussion_questions = None
             st.session_state.social_posts = None
+            st.session_state.impact_orgs = None
+            st.session_state.artifact_statuses = None
+
+            # Drop background work queued for the previous video
+            cancel_prefetch(st.session_state.prefetch_jobs)
+            st.session_state.prefetch_jobs = {}
+            if st.session_state.current_video:
+                storage.release(os.path.join(UPLOADS_DIR, st.session_state.current_video), get_session_owner())
 
             # Save uploaded video
             video_path = os.path.join(UPLOADS_DIR, uploaded_file.name)
-            with open(video_path, "wb") as f:
-                f.write(uploaded_file.read())
+            if not isinstance(uploaded_file, IngestedFile):
+                # Never write in place: dedupe may have hard-linked this name to another film
+                uploaded_file.seek(0)
+                replace_file(video_path, uploaded_file)
+            storage.register(video_path, "upload")
+            storage.dedupe(video_path)
+            storage.hold(video_path, get_session_owner(), SESSION_HOLD_SECONDS)
+            storage.enforce_quota(UPLOADS_DIR, protect=[video_path], evict_sources=True)
+            media_executor.submit(publish_file, video_path)
+            # Probe streams and keyframes once, ahead of the proxy encode
+            media_executor.submit(try_media_index, video_path, os.path.splitext(uploaded_file.name)[0])
+            schedule_playback_proxies(video_path, os.path.splitext(uploaded_file.name)[0])
             
             # Update session state
             st.session_state.current_video = uploaded_file.name
@@ -370,28 +2174,114 @@ def main():
                     # transcript = create_transcript(video_path)
                     st.session_state.transcript_data = create_transcript(
                         video_path,
-                        os.path.splitext(uploaded_file.name)[0]
+                        os.path.splitext(uploaded_file.name)[0],
+                        audio_only
                     )
                     print("Transcript created.")
                     print("*"*100)
+                    if prefetch_enabled:
+                        st.session_state.prefetch_jobs = schedule_prefetch(
+                            os.path.splitext(uploaded_file.name)[0],
+                            st.session_state.transcript_data['text']
+                        )
                 except Exception as e:
                     st.error(f"Error processing video: {str(e)}")
                     print(f"Error details: {str(e)}")
                     return
         
+        profiler.mark("player")
+
         # Display video and analysis
         video_path = os.path.join(UPLOADS_DIR, uploaded_file.name)
+        if not os.path.exists(video_path):
+            st.error("This video is no longer stored on the server. Please upload it again.")
+            st.session_state.current_video = None
+            return
+        storage.hold(video_path, get_session_owner(), SESSION_HOLD_SECONDS)
         
-        # Display original video
+        # Display original video, streaming a low-bitrate proxy when one is ready.
+        # The master is never read into memory: full quality plays from its HLS segments.
         st.subheader("Original Video")
-        with open(video_path, 'rb') as video_file:
-            st.video(video_file.read())
+        if play_original:
+            try:
+                with st.spinner("Preparing full-quality playback..."):
+                    source_playlist = segment_film(video_path, os.path.splitext(uploaded_file.name)[0])
+                components.html(hls.hls_player_html(get_static_url(source_playlist)), height=380)
+            except Exception as e:
+                st.error(f"Error preparing full-quality playback: {str(e)}")
+        else:
+            playback_path = get_playback_path(video_path, os.path.splitext(uploaded_file.name)[0])
+            try:
+                if playback_path == video_path:
+                    raise FileNotFoundError(playback_path)
+                with open(playback_path, 'rb') as video_file:
+                    show_video(video_file.read())
+            except FileNotFoundError:
+                # Not encoded yet, or evicted between picking and opening it
+                show_playback_placeholder(video_path, os.path.splitext(uploaded_file.name)[0])
             
         st.divider()
         
         if st.session_state.transcript_data:
+            profiler.mark("transcript")
+            st.subheader("Transcript")
+            words = st.session_state.transcript_data.get('words')
+            if words:
+                try:
+                    caption_paths = write_film_captions(
+                        os.path.splitext(uploaded_file.name)[0],
+                        st.session_state.transcript_data
+                    )
+                    for (fmt, caption_path), col in zip(caption_paths.items(), st.columns(len(caption_paths))):
+                        with col:
+                            with open(caption_path, 'rb') as caption_file:
+                                st.download_button(
+                                    f"Download captions ({fmt.upper()})",
+                                    caption_file.read(),
+                                    file_name=os.path.basename(caption_path),
+                                    mime="text/vtt" if fmt == "vtt" else "application/x-subrip",
+                                    key=f"captions_{fmt}_{uploaded_file.name}"
+                                )
+                except Exception as e:
+                    st.error(f"Error writing captions: {str(e)}")
+            if not words:
+                st.caption("Word timings are not available for this transcript.")
+            elif st.checkbox("Show interactive transcript", key=f"show_transcript_{uploaded_file.name}"):
+                try:
+                    with st.spinner("Preparing transcript..."):
+                        playlist_url, words_url = prepare_transcript_viewer(
+                            video_path,
+                            os.path.splitext(uploaded_file.name)[0],
+                            words
+                        )
+                    if playlist_url is None:
+                        show_playback_placeholder(video_path, os.path.splitext(uploaded_file.name)[0])
+                    else:
+                        components.html(
+                            transcript_viewer.transcript_viewer_html(playlist_url, words_url),
+                            height=840
+                        )
+                except Exception as e:
+                    st.error(f"Error preparing transcript: {str(e)}")
+
+            st.divider()
+
+            profiler.mark("chapters")
+
             # Display chapters
             st.subheader("Video Chapters")
+            chapter_offsets = {}
+            if hls_clips:
+                try:
+                    with st.spinner("Segmenting video..."):
+                        chapter_offsets = prepare_chapter_playlists(
+                            video_path,
+                            os.path.splitext(uploaded_file.name)[0],
+                            st.session_state.transcript_data['chapters']
+                        )
+                except Exception as e:
+                    st.error(f"Error segmenting video, falling back to MP4 clips: {str(e)}")
+
             for idx, chapter in enumerate(st.session_state.transcript_data['chapters'], 1):
                 with st.expander(f"Chapter {idx}: {chapter['gist']}"):
                     col1, col2 = st.columns(2)
@@ -410,58 +2300,231 @@ def main():
                         st.write("**Summary:**")
                         st.write(chapter['summary'])     
 
+                    if st.button("Find Related Chapters", key=f"related_chapter_{idx}_{uploaded_file.name}"):
+                        with st.spinner("Searching the catalog..."):
+                            try:
+                                related = get_chapter_index().related_chapters(
+                                    os.path.splitext(uploaded_file.name)[0], idx
+                                )
+                                if related:
+                                    st.write("**Related chapters from other films:**")
+                                    for score, row in related:
+                                        st.write(f"- *{row['film']}*, Chapter {row['chapter']} ({ms_to_timecode(row['start'])}): {row['gist']} — {score:.2f}")
+                                else:
+                                    st.info("No related chapters found in other films yet.")
+                            except Exception as e:
+                                st.error(f"Error searching related chapters: {str(e)}")
+
+                    # Social clips for other aspect ratios
+                    video_name = os.path.splitext(uploaded_file.name)[0]
+                    rendered_aspects = [
+                        aspect for aspect in social_render.ASPECT_SIZES
+                        if os.path.exists(get_social_clip_path(video_name, idx, aspect))
+                    ]
+                    if rendered_aspects:
+                        st.write("**Social Clips:**")
+                        for aspect, col in zip(rendered_aspects, st.columns(len(rendered_aspects))):
+                            social_path = get_social_clip_path(video_name, idx, aspect)
+                            storage.touch(social_path)
+                            with col:
+                                st.caption(aspect.replace("x", ":"))
+                                with open(social_path, 'rb') as social_file:
+                                    show_video(social_file.read())
+                    missing_aspects = [aspect for aspect in social_aspects if aspect not in rendered_aspects]
+                    if missing_aspects:
+                        if st.button(f"Render Chapter {idx} Social Clips", key=f"social_chapter_{idx}_{uploaded_file.name}"):
+                            rendered = False
+                            with st.spinner("Rendering social clips..."):
+                                try:
+                                    render_chapter_social_clips(
+                                        video_path, video_name, idx, chapter, missing_aspects, social_crop_mode,
+                                        words=st.session_state.transcript_data.get('words'),
+                                        burn_captions=burn_captions
+                                    )
+                                    rendered = True
+                                except Exception as e:
+                                    st.error(f"Error rendering social clips: {str(e)}")
+                            if rendered:
+                                st.rerun()
+
+                    if idx in chapter_offsets:
+                        st.write("**Chapter Clip:**")
+                        playlist_path = get_chapter_playlist_path(os.path.splitext(uploaded_file.name)[0], idx)
+                        components.html(
+                            hls.hls_player_html(get_static_url(playlist_path), chapter_offsets[idx]),
+                            height=380
+                        )
+                        continue
+
                     # Check if clip already exists
-                    clip_path = get_chapter_clip_path(uploaded_file.name, idx)
+                    clip_path = get_chapter_clip_path(os.path.splitext(uploaded_file.name)[0], idx, trim_silence, bool(burn_captions and words))
                     
                     if os.path.exists(clip_path):
+                        storage.touch(clip_path)
                         st.write("**Chapter Clip:**")
                         with open(clip_path, 'rb') as clip_file:
-                            st.video(clip_file.read())
+                            show_video(clip_file.read())
 
                     button_key = f"extract_chapter_{idx}_{uploaded_file.name}"
                     if not os.path.exists(clip_path):
                         if st.button(f"Extract Chapter {idx} Clip", key=button_key):
                             with st.spinner("Extracting clip..."):
-                                extract_chapter_clip(
+                                _, trimmed_start, trimmed_end = extract_chapter_clip(
                                     video_path,
                                     chapter['start'],
                                     chapter['end'],
-                                    clip_path
+                                    clip_path,
+                                    trim_silence=trim_silence,
+                                    words=words,
+                                    burn_captions=burn_captions
                                 )
+                                if trim_silence:
+                                    st.caption(
+                                        f"Trimmed {trimmed_start:.1f}s of silence from the start "
+                                        f"and {trimmed_end:.1f}s from the end"
+                                    )
                                 # Read and display the clip
                                 with open(clip_path, 'rb') as clip_file:
-                                    st.video(clip_file.read())
+                                    show_video(clip_file.read())
                     else:
                         st.info("Chapter clip already extracted")
         	
             st.divider()
+
+            profiler.mark("highlight_reel")
+            st.subheader("Highlight Reel")
+            reel_path = get_highlight_reel_path(os.path.splitext(uploaded_file.name)[0])
+            reel_seconds = st.slider(
+                "Target length (seconds)",
+                min_value=30,
+                max_value=int(HIGHLIGHT_MAX_SECONDS),
+                value=int(HIGHLIGHT_TARGET_SECONDS),
+                step=5
+            )
+            if st.button("Create Highlight Reel"):
+                with st.spinner("Assembling highlight reel..."):
+                    try:
+                        reel_path, spans = create_highlight_reel(
+                            video_path,
+                            os.path.splitext(uploaded_file.name)[0],
+                            st.session_state.transcript_data,
+                            reel_seconds
+                        )
+                        st.success(f"Highlight reel created from {len(spans)} moments")
+                        for span in spans:
+                            st.caption(f"{ms_to_timecode(span['start'])} - {ms_to_timecode(span['end'])} (chapter {span['chapter']})")
+                    except Exception as e:
+                        st.error(f"Error creating highlight reel: {str(e)}")
+            if os.path.exists(reel_path):
+                storage.touch(reel_path)
+                with open(reel_path, 'rb') as reel_file:
+                    show_video(reel_file.read())
+
+            st.divider()
+
+            profiler.mark("generate_all")
+            st.subheader("Generate All Content")
+            st.write("Create the summary, target audience analysis, discussion guide and social media posts in a single request.")
+            if st.button("Generate All Content"):
+                with st.spinner("Generating all content..."):
+                    try:
+                        video_name = os.path.splitext(uploaded_file.name)[0]
+                        transcript_text = st.session_state.transcript_data['text']
+                        combined = generate_combined_content(transcript_text)
+                        for section, content in combined.items():
+                            if content:
+                                setattr(st.session_state, section, content)
+                                save_artifact(
+                                    video_name,
+                                    section,
+                                    content,
+                                    artifact_inputs(section, transcript_text, prompt=COMBINED_PROMPT)
+                                )
+                        missing = [section for section, content in combined.items() if not content]
+                        if missing:
+                            st.warning(f"Could not generate: {', '.join(missing)}")
+                        else:
+                            st.success("All content generated and saved!")
+                    except Exception as e:
+                        st.error(f"Error generating content: {str(e)}")
+
+            profiler.mark("refresh_stale")
+            st.subheader("Refresh Stale Content")
+            video_name = os.path.splitext(uploaded_file.name)[0]
+            transcript_text = st.session_state.transcript_data['text']
+            # Checking reads, hashes and (when shared) fetches every artifact, so it
+            # only happens on request and is kept for this transcript
+            status_key = (video_name, text_hash(transcript_text))
+            if st.button("Check Saved Content"):
+                st.session_state.artifact_statuses = {
+                    "key": status_key,
+                    "statuses": {
+                        artifact: artifact_status(video_name, artifact, transcript_text)
+                        for artifact in ARTIFACTS
+                    }
+                }
+            checked = st.session_state.artifact_statuses
+            if not checked or checked["key"] != status_key:
+                st.caption("Check whether saved content was generated from the current transcript, prompts and model.")
+            else:
+                statuses = checked["statuses"]
+                saved = {artifact: status for artifact, status in statuses.items() if status != "missing"}
+                if saved:
+                    st.write(", ".join(
+                        f"{artifact.replace('_', ' ').title()}: {status}"
+                        for artifact, status in saved.items()
+                    ))
+                include_untracked = False
+                if "untracked" in statuses.values():
+                    include_untracked = st.checkbox(
+                        "Also regenerate content saved without a record of its inputs",
+                        key=f"refresh_untracked_{video_name}"
+                    )
+                regenerate = {"stale", "untracked"} if include_untracked else {"stale"}
+                needs_refresh = [artifact for artifact, status in statuses.items() if status in regenerate]
+                if not needs_refresh:
+                    st.caption("Saved content is up to date with the transcript, prompts and model.")
+                elif st.button("Refresh Stale Content"):
+                    with st.spinner("Regenerating stale content..."):
+                        try:
+                            refreshed = refresh_stale_artifacts(video_name, transcript_text, include_untracked)
+                            for artifact, content in refreshed.items():
+                                setattr(st.session_state, artifact, content)
+                            if refreshed:
+                                st.success(f"Refreshed: {', '.join(refreshed)}")
+                            else:
+                                st.warning("Nothing could be refreshed")
+                        except Exception as e:
+                            st.error(f"Error refreshing content: {str(e)}")
+                        # Statuses changed; check again on request
+                        st.session_state.artifact_statuses = None
+
+            st.divider()
         
+            profiler.mark("summary")
             st.subheader("Summary")
             if st.button("Generate Summary") or st.session_state.summary:
                 if not st.session_state.summary: 
                     with st.spinner("Generating summary..."):
                         try:
                             transcript_text = st.session_state.transcript_data['text']
-                            completion = generate_summary(transcript_text)
+                            completion = take_prefetched_artifact("summary")
+                            if not completion:
+                                completion = generate_and_save_artifact(
+                                    os.path.splitext(uploaded_file.name)[0],
+                                    "summary",
+                                    transcript_text
+                                )
                             
                             if completion:
                                 st.session_state.summary = completion
-                                
-                                # Save the guide
-                                guide_path = os.path.join(
-                                    TRANSCRIPTS_DIR, 
-                                    f"{os.path.splitext(uploaded_file.name)[0]}_summary.txt"
-                                )
-                                with open(guide_path, 'w') as f:
-                                    f.write(completion)
-                                
                                 st.success("Summary generated and saved!")
                         except Exception as e:
                             st.error(f"Error generating summary: {str(e)}")
                 
                 # Display the guide if it exists
                 if st.session_state.summary:
-                    st.markdown(st.session_state.summary)
+                    show_markdown(st.session_state.summary)
                     
                     # Add regenerate option
                     # if st.button("Regenerate Summary"):
@@ -480,6 +2543,7 @@ def main():
             st.header("Film Marketing Content")
                     
             # Target Audience Analysis
+            profiler.mark("target_audience")
             st.subheader("Target Audience Analysis")
             if 'target_audience' not in st.session_state:
                 st.session_state.target_audience = None
@@ -488,29 +2552,28 @@ def main():
                 if not st.session_state.target_audience:
                     with st.spinner("Analyzing target audiences..."):
                         try:
-                            analysis = generate_target_audience(st.session_state.transcript_data['text'])
+                            analysis = take_prefetched_artifact("target_audience")
+                            if not analysis:
+                                analysis = generate_and_save_artifact(
+                                    os.path.splitext(uploaded_file.name)[0],
+                                    "target_audience",
+                                    st.session_state.transcript_data['text']
+                                )
                             if analysis:
                                 st.session_state.target_audience = analysis
-
-                                target_audience_path = os.path.join(
-                                    TRANSCRIPTS_DIR, 
-                                    f"{os.path.splitext(uploaded_file.name)[0]}_target_audience.txt"
-                                )
-                                with open(target_audience_path, 'w') as f:
-                                    f.write(analysis)
-                                
                                 st.success("Target audience analysis generated and saved!")
                         except Exception as e:
                             st.error(f"Error generating target audience analysis: {str(e)}")
                 
                 if st.session_state.target_audience:
-                    st.markdown(st.session_state.target_audience)
+                    show_markdown(st.session_state.target_audience)
                     # if st.button("Regenerate Target Audience Analysis"):
                     #     st.session_state.target_audience = None
                     #     st.rerun()
 
             st.divider()
             
+            profiler.mark("impact_orgs")
             st.subheader("Impact Organizations")
             if 'impact_orgs' not in st.session_state:
                 st.session_state.impact_orgs = None
@@ -521,34 +2584,30 @@ def main():
                     if not st.session_state.impact_orgs:
                         with st.spinner("Identifying relevant organizations..."):
                             try:
-                                impact_orgs = generate_impact_orgs(
-                                    st.session_state.transcript_data['text'],
-                                    st.session_state.target_audience
-                                )
+                                impact_orgs = take_prefetched_artifact("impact_orgs")
+                                if not impact_orgs:
+                                    impact_orgs = generate_and_save_artifact(
+                                        os.path.splitext(uploaded_file.name)[0],
+                                        "impact_orgs",
+                                        st.session_state.transcript_data['text'],
+                                        st.session_state.target_audience
+                                    )
                                 if impact_orgs:
                                     st.session_state.impact_orgs = impact_orgs
-                                    
-                                    # Save to file
-                                    impact_orgs_path = os.path.join(
-                                        TRANSCRIPTS_DIR, 
-                                        f"{os.path.splitext(uploaded_file.name)[0]}_impact_orgs.txt"
-                                    )
-                                    with open(impact_orgs_path, 'w') as f:
-                                        f.write(impact_orgs)
-                                    
                                     st.success("Impact organizations identified and saved!")
                                     # st.experimental_rerun()
                             except Exception as e:
                                 st.error(f"Error generating impact organizations: {str(e)}")
                     
                     if st.session_state.impact_orgs:
-                        st.markdown(st.session_state.impact_orgs)
+                        show_markdown(st.session_state.impact_orgs)
             else:
                 st.info("Please generate Target Audience Analysis first to identify relevant organizations.")
             
             st.divider()
             
             # Discussion Guide
+            profiler.mark("discussion_guide")
             st.subheader("Discussion Guide")
             if 'discussion_guide' not in st.session_state:
                 st.session_state.discussion_guide = None
@@ -557,22 +2616,21 @@ def main():
                 if not st.session_state.discussion_guide:
                     with st.spinner("Generating discussion guide..."):
                         try:
-                            questions = generate_discussion_guide(st.session_state.transcript_data['text'])
+                            questions = take_prefetched_artifact("discussion_guide")
+                            if not questions:
+                                questions = generate_and_save_artifact(
+                                    os.path.splitext(uploaded_file.name)[0],
+                                    "discussion_guide",
+                                    st.session_state.transcript_data['text']
+                                )
                             if questions:
                                 st.session_state.discussion_guide = questions
-                                discussion_guide_path = os.path.join(
-                                    TRANSCRIPTS_DIR, 
-                                    f"{os.path.splitext(uploaded_file.name)[0]}_discussion_guide.txt"
-                                )
-                                with open(discussion_guide_path, 'w') as f:
-                                    f.write(questions)
-                                
                                 st.success("Discussion guide analysis generated and saved!")
                         except Exception as e:
                             st.error(f"Error generating discussion guide: {str(e)}")
                 
                 if st.session_state.discussion_guide:
-                    st.markdown(st.session_state.discussion_guide)
+                    show_markdown(st.session_state.discussion_guide)
                     # if st.button("Regenerate Discussion Guide"):
                     #     st.session_state.discussion_guide = None
                     #     st.rerun()
@@ -580,6 +2638,7 @@ def main():
             st.divider()
 
             # Social Media Posts
+            profiler.mark("social_posts")
             st.subheader("Social Media Posts")
             if 'social_posts' not in st.session_state:
                 st.session_state.social_posts = None
@@ -588,28 +2647,75 @@ def main():
                 if not st.session_state.social_posts:
                     with st.spinner("Generating social media content..."):
                         try:
-                            posts = generate_social_posts(st.session_state.transcript_data['text'])
+                            posts = take_prefetched_artifact("social_posts")
+                            if not posts:
+                                posts = generate_and_save_artifact(
+                                    os.path.splitext(uploaded_file.name)[0],
+                                    "social_posts",
+                                    st.session_state.transcript_data['text']
+                                )
                             if posts:
                                 st.session_state.social_posts = posts
-                                social_posts_path = os.path.join(
-                                    TRANSCRIPTS_DIR, 
-                                    f"{os.path.splitext(uploaded_file.name)[0]}_social_posts.txt"
-                                )
-                                with open(social_posts_path, 'w') as f:
-                                    f.write(posts)
-                                
                                 st.success("Social media posts generated and saved!")
                         except Exception as e:
                             st.error(f"Error generating social media posts: {str(e)}")
                 
                 if st.session_state.social_posts:
-                    st.markdown(st.session_state.social_posts)
+                    show_markdown(st.session_state.social_posts)
                     # if st.button("Regenerate Social Media Posts"):
                     #     st.session_state.social_posts = None
                     #     st.rerun()
             st.divider()
             
+            # Localization
+            profiler.mark("localization")
+            st.header("Localization")
+            video_name = os.path.splitext(uploaded_file.name)[0]
+            available_artifacts = [
+                artifact for artifact in ARTIFACTS
+                if os.path.exists(get_artifact_path(video_name, artifact))
+            ]
+            if available_artifacts:
+                localize_selection = st.multiselect(
+                    "Content to translate",
+                    available_artifacts,
+                    default=[artifact for artifact in available_artifacts if artifact in LOCALIZABLE_ARTIFACTS]
+                )
+                language_selection = st.multiselect(
+                    "Languages",
+                    LOCALIZATION_LANGUAGES,
+                    default=LOCALIZATION_LANGUAGES
+                )
+                if st.button("Translate Content") and localize_selection and language_selection:
+                    with st.spinner("Translating content..."):
+                        try:
+                            _, errors = localize_artifacts(video_name, localize_selection, language_selection)
+                            if errors:
+                                st.warning("Could not translate: " + "; ".join(
+                                    f"{artifact} ({language}): {error}" for (artifact, language), error in errors.items()
+                                ))
+                            else:
+                                st.success("Translations ready!")
+                        except Exception as e:
+                            st.error(f"Error translating content: {str(e)}")
+
+                for language in LOCALIZATION_LANGUAGES:
+                    translated = [
+                        artifact for artifact in ARTIFACTS
+                        if os.path.exists(get_translation_path(video_name, artifact, language))
+                    ]
+                    if translated:
+                        with st.expander(f"{language} ({len(translated)} items)"):
+                            for artifact in translated:
+                                st.write(f"**{artifact.replace('_', ' ').title()}**")
+                                show_markdown(load_translation(video_name, artifact, language))
+            else:
+                st.info("Generate some content first to translate it.")
+
+            st.divider()
+
             # Export section at the bottom
+            profiler.mark("export")
             st.header("Export Content Package")
             if st.button("Create Content Package"):
                 try:
@@ -618,7 +2724,7 @@ def main():
                         zip_path = create_export_package(video_name, st.session_state.transcript_data)
                         
                         # Create download link
-                        st.markdown(
+                        show_markdown(
                             get_binary_file_downloader_html(
                                 zip_path, 
                                 f'{video_name} Content Package'
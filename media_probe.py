@@ -0,0 +1,142 @@
+import os
+import json
+import bisect
+import subprocess
+from ffmpeg_tools import get_ffprobe_binary
+
+# Bumped when probe_streams records new fields, so older indexes are probed again
+MEDIA_INDEX_VERSION = 2
+
+def run_ffprobe(args, timeout=None):
+    """Run ffprobe with the given arguments and return its stdout"""
+    result = subprocess.run(
+        [get_ffprobe_binary(), "-v", "error"] + list(args),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        timeout=timeout
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"ffprobe failed: {result.stderr.decode(errors='replace').strip()}")
+    return result.stdout.decode(errors='replace')
+
+def parse_rate(rate):
+    """'30000/1001' -> 29.97"""
+    try:
+        numerator, _, denominator = (rate or "").partition("/")
+        return float(numerator) / float(denominator or 1)
+    except (ValueError, ZeroDivisionError):
+        return None
+
+def probe_streams(video_path):
+    """Container and stream metadata of a media file"""
+    info = json.loads(run_ffprobe(["-show_format", "-show_streams", "-of", "json", video_path]))
+    container = info.get("format", {})
+    streams = []
+    for stream in info.get("streams", []):
+        streams.append({
+            "index": stream.get("index"),
+            "type": stream.get("codec_type"),
+            "codec": stream.get("codec_name"),
+            "duration": float(stream["duration"]) if stream.get("duration") else None,
+            "width": stream.get("width"),
+            "height": stream.get("height"),
+            "fps": parse_rate(stream.get("avg_frame_rate")),
+            "profile": stream.get("profile"),
+            "level": stream.get("level"),
+            "pix_fmt": stream.get("pix_fmt"),
+            "time_base": stream.get("time_base"),
+            "sample_rate": int(stream["sample_rate"]) if stream.get("sample_rate") else None,
+            "channels": stream.get("channels")
+        })
+    return {
+        "format": container.get("format_name"),
+        "duration": float(container["duration"]) if container.get("duration") else None,
+        "bit_rate": int(container["bit_rate"]) if container.get("bit_rate") else None,
+        "streams": streams
+    }
+
+def probe_keyframes(video_path):
+    """Sorted timestamps (seconds) of the first video stream's keyframes.
+
+    Reads packet headers only; nothing is decoded.
+    """
+    output = run_ffprobe([
+        "-select_streams", "v:0",
+        "-show_entries", "packet=pts_time,flags",
+        "-of", "csv=p=0",
+        video_path
+    ])
+    keyframes = []
+    for line in output.splitlines():
+        pts_time, _, flags = line.partition(",")
+        if "K" in flags and pts_time not in ("", "N/A"):
+            keyframes.append(float(pts_time))
+    keyframes.sort()
+    return keyframes
+
+class MediaIndex:
+    """Probe results and keyframe positions of one film, persisted as JSON.
+
+    The source is probed once; later cuts and seeks look keyframes up by binary
+    search. The record is tied to the source's size and mtime, so a replaced
+    upload is probed again.
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.keyframes = data["keyframes"]
+
+    @classmethod
+    def build(cls, video_path, index_path):
+        print(f"Probing {os.path.basename(video_path)}...")
+        stat = os.stat(video_path)
+        data = dict(probe_streams(video_path), keyframes=probe_keyframes(video_path))
+        data["source"] = {"size": stat.st_size, "mtime": stat.st_mtime}
+        data["version"] = MEDIA_INDEX_VERSION
+        tmp_path = f"{index_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, index_path)
+        return cls(data)
+
+    @classmethod
+    def load(cls, video_path, index_path):
+        """The saved index, or None if missing, outdated or recorded for a different file"""
+        if not os.path.exists(index_path):
+            return None
+        try:
+            with open(index_path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        stat = os.stat(video_path)
+        if data.get("source") != {"size": stat.st_size, "mtime": stat.st_mtime}:
+            return None
+        if data.get("version") != MEDIA_INDEX_VERSION:
+            return None
+        return cls(data)
+
+    @property
+    def duration(self):
+        return self.data.get("duration")
+
+    def stream(self, kind):
+        """First stream of the given type ('video' or 'audio'), or None"""
+        return next((stream for stream in self.data["streams"] if stream["type"] == kind), None)
+
+    def keyframe_before(self, seconds):
+        """Last keyframe at or before `seconds` (0.0 if there is none)"""
+        idx = bisect.bisect_right(self.keyframes, seconds + 1e-6)
+        return self.keyframes[idx - 1] if idx else 0.0
+
+    def keyframe_after(self, seconds):
+        """First keyframe at or after `seconds`, or None past the last one"""
+        idx = bisect.bisect_left(self.keyframes, seconds - 1e-6)
+        return self.keyframes[idx] if idx < len(self.keyframes) else None
+
+    def nearest_keyframe(self, seconds):
+        before = self.keyframe_before(seconds)
+        after = self.keyframe_after(seconds)
+        if after is None or seconds - before <= after - seconds:
+            return before
+        return after
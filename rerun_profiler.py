@@ -0,0 +1,86 @@
+import json
+import time
+
+class RerunProfiler:
+    """Times the top-level sections of one Streamlit rerun.
+
+    Sections are delimited with mark(): each call closes the running section and
+    opens the next one, so the page script doesn't need re-indenting. Bytes sent
+    to the browser through st.video/st.markdown are counted per section. All
+    methods are no-ops when profiling is disabled.
+    """
+
+    def __init__(self, enabled, log_path=None):
+        self.enabled = enabled
+        self.log_path = log_path
+        self.started = time.perf_counter()
+        self.sections = []
+        self._current = None
+        self._current_start = None
+        if enabled:
+            self.mark("setup")
+
+    def mark(self, section):
+        """End the running section and start timing the next one"""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self._close(now)
+        self._current = {"section": section, "ms": 0.0, "video_bytes": 0, "markdown_bytes": 0}
+        self._current_start = now
+
+    def _close(self, now):
+        if self._current is not None:
+            self._current["ms"] = (now - self._current_start) * 1000
+            self.sections.append(self._current)
+            self._current = None
+
+    def record_bytes(self, kind, num_bytes):
+        """Count bytes sent to the browser by st.video ('video') or st.markdown ('markdown')"""
+        if not self.enabled or self._current is None:
+            return
+        self._current[f"{kind}_bytes"] += num_bytes
+
+    def finish(self):
+        """Close the last section and append the breakdown to the log"""
+        if not self.enabled:
+            return None
+        now = time.perf_counter()
+        self._close(now)
+        report = {
+            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "total_ms": round((now - self.started) * 1000, 2),
+            "sections": [
+                dict(section, ms=round(section["ms"], 2))
+                for section in self.sections
+            ]
+        }
+        if self.log_path:
+            try:
+                with open(self.log_path, 'a') as f:
+                    f.write(json.dumps(report) + "\n")
+            except OSError as e:
+                print(f"Could not write profile log: {str(e)}")
+        self.report = report
+        return report
+
+    def render_sidebar(self, st):
+        """Show the per-section breakdown of this rerun in the sidebar"""
+        if not self.enabled or not getattr(self, "report", None):
+            return
+        with st.sidebar.expander("Rerun Profile", expanded=True):
+            st.write(f"**Total:** {self.report['total_ms']:.1f} ms")
+            st.dataframe(
+                [
+                    {
+                        "Section": section["section"],
+                        "ms": section["ms"],
+                        "Video KB": round(section["video_bytes"] / 1024, 1),
+                        "Markdown KB": round(section["markdown_bytes"] / 1024, 1)
+                    }
+                    for section in sorted(self.report["sections"], key=lambda s: s["ms"], reverse=True)
+                ],
+                hide_index=True
+            )
+            if self.log_path:
+                st.caption(f"Appended to {self.log_path}")
@@ -0,0 +1,268 @@
+import os
+import json
+import time
+import shutil
+import sqlite3
+import urllib.parse
+import urllib.request
+import urllib.error
+from contextlib import contextmanager
+
+# Bytes per read/write when streaming blobs
+BLOB_CHUNK_SIZE = 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS locks (key TEXT PRIMARY KEY, owner TEXT NOT NULL, expires REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY, kind TEXT NOT NULL, payload TEXT NOT NULL,
+    owner TEXT, lease_until REAL NOT NULL DEFAULT 0, updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_kind ON jobs (kind, lease_until);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL, updated REAL NOT NULL);
+"""
+
+class LocalState:
+    """Blob store, lock and job table, and cache metadata for one host.
+
+    Blobs are files under blob_root, addressed by a relative key such as
+    'transcripts/film_transcript.json'; locks, jobs and metadata live in SQLite,
+    which every process on the host can share. When blob_root is the app's own
+    working directory, publishing and fetching a file are no-ops.
+    """
+
+    shared = False
+
+    def __init__(self, blob_root, db_path):
+        self.blob_root = os.path.abspath(blob_root)
+        self.db_path = db_path
+        os.makedirs(self.blob_root, exist_ok=True)
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    @contextmanager
+    def _transaction(self):
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                yield db
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+
+    # Blobs
+
+    def blob_path(self, key):
+        """Local path of a blob; keys may not leave the blob root"""
+        path = os.path.normpath(os.path.join(self.blob_root, key))
+        if os.path.isabs(key) or not path.startswith(self.blob_root + os.sep):
+            raise ValueError(f"Invalid blob key: {key}")
+        return path
+
+    def has_blob(self, key):
+        return os.path.exists(self.blob_path(key))
+
+    def put_blob(self, key, path):
+        """Store a local file under key"""
+        blob_path = self.blob_path(key)
+        if os.path.abspath(path) == blob_path:
+            return
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        tmp_path = f"{blob_path}.partial"
+        shutil.copyfile(path, tmp_path)
+        os.replace(tmp_path, blob_path)
+
+    def fetch_blob(self, key, path):
+        """Copy a blob to path; False if there is no such blob"""
+        blob_path = self.blob_path(key)
+        if not os.path.exists(blob_path):
+            return False
+        if os.path.abspath(path) != blob_path:
+            tmp_path = f"{path}.partial"
+            shutil.copyfile(blob_path, tmp_path)
+            os.replace(tmp_path, path)
+        return True
+
+    def delete_blob(self, key):
+        blob_path = self.blob_path(key)
+        if os.path.exists(blob_path):
+            os.remove(blob_path)
+
+    # Locks
+
+    def acquire_lock(self, key, owner, ttl):
+        """Take or renew a lock that expires after ttl seconds; False if someone else holds it"""
+        now = time.time()
+        with self._transaction() as db:
+            row = db.execute("SELECT owner, expires FROM locks WHERE key = ?", (key,)).fetchone()
+            if row and row[0] != owner and row[1] > now:
+                return False
+            db.execute(
+                "INSERT OR REPLACE INTO locks (key, owner, expires) VALUES (?, ?, ?)",
+                (key, owner, now + ttl)
+            )
+            return True
+
+    def release_lock(self, key, owner):
+        with self._connect() as db:
+            db.execute("DELETE FROM locks WHERE key = ? AND owner = ?", (key, owner))
+
+    # Jobs
+
+    def put_job(self, job_id, kind, payload, owner=None, lease=0):
+        """Create or update a job; the owner holds it for lease seconds"""
+        now = time.time()
+        with self._connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO jobs (id, kind, payload, owner, lease_until, updated) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, kind, json.dumps(payload), owner, now + lease if owner else 0, now)
+            )
+
+    def get_job(self, job_id):
+        """A job's payload, or None"""
+        with self._connect() as db:
+            row = db.execute("SELECT payload FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def claim_jobs(self, kind, owner, lease, include_own=False):
+        """Take over jobs of a kind whose lease has run out.
+
+        include_own also returns jobs recorded under this owner, e.g. by the
+        process this one replaced. Returns [(job_id, payload)].
+        """
+        now = time.time()
+        with self._transaction() as db:
+            rows = db.execute(
+                "SELECT id, payload FROM jobs WHERE kind = ? AND (lease_until < ? OR owner IS NULL OR (? AND owner = ?))",
+                (kind, now, int(include_own), owner)
+            ).fetchall()
+            for job_id, _ in rows:
+                db.execute(
+                    "UPDATE jobs SET owner = ?, lease_until = ?, updated = ? WHERE id = ?",
+                    (owner, now + lease, now, job_id)
+                )
+        return [(job_id, json.loads(payload)) for job_id, payload in rows]
+
+    def delete_job(self, job_id):
+        with self._connect() as db:
+            db.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    # Metadata
+
+    def get_meta(self, key):
+        with self._connect() as db:
+            row = db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set_meta(self, key, value):
+        with self._connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO meta (key, value, updated) VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time())
+            )
+
+class RemoteState:
+    """The LocalState interface served by a shared state server (see state_server.py)"""
+
+    shared = True
+
+    def __init__(self, base_url, token=None, timeout=60):
+        self.base_url = base_url.rstrip("/")
+        self.token = token
+        self.timeout = timeout
+
+    def _request(self, method, path, data=None, headers=None):
+        headers = dict(headers or {})
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        request = urllib.request.Request(f"{self.base_url}{path}", data=data, headers=headers, method=method)
+        return urllib.request.urlopen(request, timeout=self.timeout)
+
+    def _call(self, operation, **params):
+        body = json.dumps(params).encode()
+        with self._request("POST", f"/api/{operation}", body, {"Content-Type": "application/json"}) as response:
+            return json.loads(response.read() or b"null")
+
+    def _blob_url(self, key):
+        return f"/blobs/{urllib.parse.quote(key)}"
+
+    def has_blob(self, key):
+        try:
+            with self._request("HEAD", self._blob_url(key)):
+                return True
+        except urllib.error.HTTPError as e:
+            if e.code == 404:
+                return False
+            raise
+
+    def put_blob(self, key, path):
+        with open(path, 'rb') as f:
+            headers = {"Content-Length": str(os.path.getsize(path)), "Content-Type": "application/octet-stream"}
+            with self._request("PUT", self._blob_url(key), f, headers):
+                pass
+
+    def fetch_blob(self, key, path):
+        try:
+            response = self._request("GET", self._blob_url(key))
+        except urllib.error.HTTPError as e:
+            if e.code == 404:
+                return False
+            raise
+        tmp_path = f"{path}.partial"
+        with response, open(tmp_path, 'wb') as f:
+            while True:
+                chunk = response.read(BLOB_CHUNK_SIZE)
+                if not chunk:
+                    break
+                f.write(chunk)
+        os.replace(tmp_path, path)
+        return True
+
+    def delete_blob(self, key):
+        with self._request("DELETE", self._blob_url(key)):
+            pass
+
+    def acquire_lock(self, key, owner, ttl):
+        return self._call("acquire_lock", key=key, owner=owner, ttl=ttl)
+
+    def release_lock(self, key, owner):
+        self._call("release_lock", key=key, owner=owner)
+
+    def put_job(self, job_id, kind, payload, owner=None, lease=0):
+        self._call("put_job", job_id=job_id, kind=kind, payload=payload, owner=owner, lease=lease)
+
+    def get_job(self, job_id):
+        return self._call("get_job", job_id=job_id)
+
+    def claim_jobs(self, kind, owner, lease, include_own=False):
+        return [tuple(job) for job in self._call("claim_jobs", kind=kind, owner=owner, lease=lease, include_own=include_own)]
+
+    def delete_job(self, job_id):
+        self._call("delete_job", job_id=job_id)
+
+    def get_meta(self, key):
+        return self._call("get_meta", key=key)
+
+    def set_meta(self, key, value):
+        self._call("set_meta", key=key, value=value)
+
+# Operations the state server exposes under /api/<operation>
+API_OPERATIONS = [
+    "acquire_lock", "release_lock",
+    "put_job", "get_job", "claim_jobs", "delete_job",
+    "get_meta", "set_meta"
+]
+
+def open_state(url, blob_root, db_path):
+    """RemoteState when url is set (STATE_URL), otherwise LocalState"""
+    if url:
+        return RemoteState(url, token=os.getenv("STATE_TOKEN"))
+    return LocalState(blob_root, db_path)
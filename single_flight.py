@@ -0,0 +1,137 @@
+import os
+import time
+import socket
+import hashlib
+import threading
+from contextlib import contextmanager
+from concurrent.futures import Future
+
+try:
+    import fcntl
+except ImportError:
+    # No cross-process locking on this platform; in-process coalescing still applies
+    fcntl = None
+
+# Shared locks expire after this many seconds unless their holder renews them,
+# so a crashed replica only blocks a key briefly
+SHARED_LOCK_TTL = 60
+SHARED_LOCK_RENEW = SHARED_LOCK_TTL / 3
+SHARED_LOCK_POLL = 1.0
+
+# Bytes hashed from the start, middle and end of a film to identify it
+FILM_HASH_SAMPLE = 4 * 1024 * 1024
+
+_film_hash_cache = {}
+
+def film_hash(path):
+    """Identify a film by its size and sampled content, cached per (path, size, mtime)"""
+    stat = os.stat(path)
+    cache_key = (os.path.abspath(path), stat.st_size, stat.st_mtime)
+    if cache_key not in _film_hash_cache:
+        digest = hashlib.sha256(str(stat.st_size).encode())
+        with open(path, 'rb') as f:
+            for offset in (0, max(stat.st_size // 2 - FILM_HASH_SAMPLE // 2, 0), max(stat.st_size - FILM_HASH_SAMPLE, 0)):
+                f.seek(offset)
+                digest.update(f.read(FILM_HASH_SAMPLE))
+        _film_hash_cache[cache_key] = digest.hexdigest()
+    return _film_hash_cache[cache_key]
+
+def text_hash(text):
+    return hashlib.sha256((text or "").encode()).hexdigest()
+
+def work_key(stage, *parts):
+    """Key identifying a unit of work, e.g. work_key('clip', film_hash, start, end)"""
+    return ":".join([stage] + [str(part) for part in parts])
+
+class SingleFlight:
+    """Runs each unit of work at most once at a time, across threads and processes.
+
+    The first caller for a key computes the result; later callers in the same
+    process wait for that result. Across processes a file lock per key serialises
+    the work, and load_existing lets the next holder pick up the result the
+    previous one wrote (e.g. an output file) instead of recomputing it.
+    With a shared state (see shared_state.py) the lock is taken in its lock
+    table instead, which serialises the work across replicas on other hosts.
+    """
+
+    def __init__(self, lock_dir, state=None):
+        self.lock_dir = lock_dir
+        self.state = state
+        os.makedirs(lock_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._in_flight = {}
+
+    @contextmanager
+    def _shared_lock(self, key):
+        owner = f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+        while not self.state.acquire_lock(key, owner, SHARED_LOCK_TTL):
+            time.sleep(SHARED_LOCK_POLL)
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=self._renew_shared_lock, args=(key, owner, stop), daemon=True)
+        heartbeat.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            heartbeat.join()
+            self.state.release_lock(key, owner)
+
+    def _renew_shared_lock(self, key, owner, stop):
+        """Keep a shared lock alive while its holder is still working"""
+        while not stop.wait(SHARED_LOCK_RENEW):
+            try:
+                if not self.state.acquire_lock(key, owner, SHARED_LOCK_TTL):
+                    print(f"Lost shared lock to another replica: {key}")
+                    return
+            except Exception as e:
+                # Keep trying; the lock only lapses if renewals fail for a whole TTL
+                print(f"Error renewing shared lock {key}: {str(e)}")
+
+    @contextmanager
+    def _file_lock(self, key):
+        if self.state is not None:
+            with self._shared_lock(key):
+                yield
+            return
+        if fcntl is None:
+            yield
+            return
+        lock_path = os.path.join(self.lock_dir, f"{hashlib.sha256(key.encode()).hexdigest()}.lock")
+        with open(lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def lock(self, key):
+        """Hold the lock for key without coalescing work, e.g. around a read-modify-write of a shared index"""
+        return self._file_lock(key)
+
+    def run(self, key, compute, load_existing=None):
+        """Return compute()'s result, sharing it with concurrent callers for the same key"""
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._in_flight[key] = future
+        if not leader:
+            print(f"Waiting for in-flight work: {key}")
+            return future.result()
+
+        try:
+            with self._file_lock(key):
+                result = load_existing() if load_existing else None
+                if result is None:
+                    result = compute()
+                else:
+                    print(f"Reusing result of finished work: {key}")
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
@@ -0,0 +1,120 @@
+import os
+import subprocess
+from ffmpeg_tools import get_ffmpeg_binary, partial_path, run_ffmpeg
+from captions import subtitles_filter
+
+# Output frame sizes per aspect ratio
+ASPECT_SIZES = {
+    "16x9": (1280, 720),
+    "1x1": (1080, 1080),
+    "9x16": (1080, 1920)
+}
+
+# Burned-in caption size per aspect, in libass units (1/288 of the frame height)
+CAPTION_FONT_SIZES = {
+    "16x9": 18,
+    "1x1": 12,
+    "9x16": 8
+}
+
+# Size of the downscaled grayscale frames used for saliency analysis
+SALIENCY_WIDTH = 160
+SALIENCY_HEIGHT = 90
+
+def saliency_center(video_path, start_sec, end_sec, samples=8):
+    """Estimate the horizontal center of interest (0-1) of a time range.
+
+    Decodes a few tiny grayscale frames and scores each column by spatial edge
+    energy plus frame-to-frame motion.
+    """
+    import numpy as np
+    duration = max(end_sec - start_sec, 0.1)
+    result = subprocess.run(
+        [
+            get_ffmpeg_binary(), "-hide_banner", "-loglevel", "error",
+            "-ss", f"{start_sec:.3f}", "-t", f"{duration:.3f}",
+            "-i", video_path,
+            "-vf", f"fps={samples / duration:.6f},scale={SALIENCY_WIDTH}:{SALIENCY_HEIGHT},format=gray",
+            "-f", "rawvideo", "pipe:1"
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE
+    )
+    frame_size = SALIENCY_WIDTH * SALIENCY_HEIGHT
+    frame_count = len(result.stdout) // frame_size
+    if result.returncode != 0 or frame_count == 0:
+        return 0.5
+    frames = np.frombuffer(result.stdout[:frame_count * frame_size], dtype=np.uint8)
+    frames = frames.reshape(frame_count, SALIENCY_HEIGHT, SALIENCY_WIDTH).astype(np.float32)
+
+    edges = np.abs(np.diff(frames, axis=2, prepend=frames[:, :, :1]))
+    edges += np.abs(np.diff(frames, axis=1, prepend=frames[:, :1, :]))
+    energy = edges.sum(axis=(0, 1))
+    if frame_count > 1:
+        energy += 2 * np.abs(np.diff(frames, axis=0)).sum(axis=(0, 1))
+    total = energy.sum()
+    if total <= 0:
+        return 0.5
+    columns = np.arange(SALIENCY_WIDTH) + 0.5
+    return float((energy * columns).sum() / total / SALIENCY_WIDTH)
+
+def crop_scale_filter(aspect, center_x=0.5):
+    """Filter chain that crops the largest window of the target aspect around center_x and scales it"""
+    width, height = ASPECT_SIZES[aspect]
+    ratio = width / height
+    crop_w = f"min(iw,trunc(ih*{ratio:.6f}/2)*2)"
+    crop_h = f"min(ih,trunc(iw/{ratio:.6f}/2)*2)"
+    crop_x = f"max(0,min(iw-ow,iw*{center_x:.4f}-ow/2))"
+    return (
+        f"crop=w='{crop_w}':h='{crop_h}':x='{crop_x}':y='(ih-oh)/2',"
+        f"scale={width}:{height},setsar=1"
+    )
+
+def render_social_clips(video_path, start_ms, end_ms, outputs, crop_mode="center", threads=2, niceness=None, timeout=None,
+                        captions_path=None):
+    """Render one chapter to several aspect ratios from a single decode.
+
+    outputs maps aspect (see ASPECT_SIZES) to output path. The decoded frames are
+    split once and fanned out to a crop/scale chain per aspect. threads caps the
+    decoder (-threads before -i) and the filter graph (-filter_complex_threads),
+    and the encoders split it between them, each getting at least one thread
+    (-threads after each output's codec). captions_path (timed from start_ms) is
+    burned into every output at the end of its chain.
+    """
+    start_sec = start_ms / 1000.0
+    end_sec = end_ms / 1000.0
+    center_x = 0.5
+    if crop_mode == "saliency":
+        center_x = saliency_center(video_path, start_sec, end_sec)
+        print(f"Saliency crop center: {center_x:.2f}")
+
+    aspects = list(outputs)
+    split_labels = "".join(f"[s{i}]" for i in range(len(aspects)))
+    graph = [f"[0:v]split={len(aspects)}{split_labels}"]
+    for i, aspect in enumerate(aspects):
+        chain = crop_scale_filter(aspect, center_x)
+        if captions_path:
+            chain += "," + subtitles_filter(captions_path, CAPTION_FONT_SIZES.get(aspect, 12))
+        graph.append(f"[s{i}]{chain}[v{i}]")
+
+    args = [
+        "-ss", f"{start_sec:.3f}", "-t", f"{end_sec - start_sec:.3f}",
+        "-i", video_path,
+        "-filter_complex", ";".join(graph),
+        "-filter_complex_threads", str(threads)
+    ]
+    encoder_threads = max(threads // len(aspects), 1)
+    tmp_paths = {}
+    for i, aspect in enumerate(aspects):
+        tmp_paths[aspect] = partial_path(outputs[aspect])
+        args += [
+            "-map", f"[v{i}]", "-map", "0:a:0?",
+            "-c:v", "libx264", "-preset", "veryfast", "-threads", str(encoder_threads),
+            "-c:a", "aac", "-b:a", "128k",
+            "-movflags", "+faststart",
+            tmp_paths[aspect]
+        ]
+    run_ffmpeg(args, niceness=niceness, threads=threads, timeout=timeout)
+    for aspect, tmp_path in tmp_paths.items():
+        os.replace(tmp_path, outputs[aspect])
+    return outputs
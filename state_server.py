@@ -0,0 +1,161 @@
+"""Shared state server for running several app replicas.
+
+Serves a LocalState (blob directory plus SQLite lock/job/metadata tables) over
+HTTP so replicas started with STATE_URL=http://host:port share films,
+transcripts, artifacts, locks and queued jobs. The same server, started on
+localhost, stands in for the shared deployment during development.
+
+Usage:
+    python state_server.py [--host 0.0.0.0] [--port 8765] [--root shared_state]
+
+Set STATE_TOKEN on the server and the replicas to require a bearer token.
+"""
+import os
+import json
+import argparse
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from shared_state import LocalState, API_OPERATIONS, BLOB_CHUNK_SIZE
+
+class StateRequestHandler(BaseHTTPRequestHandler):
+    state = None
+    token = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _authorized(self):
+        if self.token and self.headers.get("Authorization") != f"Bearer {self.token}":
+            self.send_error(401)
+            return False
+        return True
+
+    def _blob_key(self):
+        if not self.path.startswith("/blobs/"):
+            self.send_error(404)
+            return None
+        return urllib.parse.unquote(self.path[len("/blobs/"):])
+
+    def _blob_path(self):
+        key = self._blob_key()
+        if key is None:
+            return None
+        try:
+            return self.state.blob_path(key)
+        except ValueError:
+            self.send_error(400)
+            return None
+
+    def _send_json(self, value):
+        body = json.dumps(value).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_HEAD(self):
+        if not self._authorized():
+            return
+        path = self._blob_path()
+        if path is None:
+            return
+        if not os.path.exists(path):
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Length", str(os.path.getsize(path)))
+        self.end_headers()
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        path = self._blob_path()
+        if path is None:
+            return
+        if not os.path.exists(path):
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(os.path.getsize(path)))
+        self.end_headers()
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(BLOB_CHUNK_SIZE)
+                if not chunk:
+                    break
+                self.wfile.write(chunk)
+
+    def do_PUT(self):
+        if not self._authorized():
+            return
+        path = self._blob_path()
+        if path is None:
+            return
+        remaining = int(self.headers.get("Content-Length", 0))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Written next to the blob and renamed, so readers never see a partial file
+        tmp_path = f"{path}.{self.server.server_port}.{id(self)}.partial"
+        with open(tmp_path, 'wb') as f:
+            while remaining > 0:
+                chunk = self.rfile.read(min(BLOB_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                f.write(chunk)
+                remaining -= len(chunk)
+        if remaining > 0:
+            os.remove(tmp_path)
+            self.send_error(400, "Incomplete upload")
+            return
+        os.replace(tmp_path, path)
+        self._send_json(True)
+
+    def do_DELETE(self):
+        if not self._authorized():
+            return
+        key = self._blob_key()
+        if key is None:
+            return
+        try:
+            self.state.delete_blob(key)
+        except ValueError:
+            self.send_error(400)
+            return
+        self._send_json(True)
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        operation = self.path[len("/api/"):] if self.path.startswith("/api/") else None
+        if operation not in API_OPERATIONS:
+            self.send_error(404)
+            return
+        params = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        try:
+            result = getattr(self.state, operation)(**params)
+        except (TypeError, ValueError) as e:
+            self.send_error(400, str(e))
+            return
+        self._send_json(result)
+
+def make_server(host, port, state, token=None):
+    """A threaded HTTP server exposing `state`; call serve_forever() on it"""
+    handler = type("Handler", (StateRequestHandler,), {"state": state, "token": token})
+    return ThreadingHTTPServer((host, port), handler)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--root", default="shared_state", help="Folder for blobs and the state database")
+    args = parser.parse_args()
+
+    os.makedirs(args.root, exist_ok=True)
+    state = LocalState(os.path.join(args.root, "blobs"), os.path.join(args.root, "state.db"))
+    server = make_server(args.host, args.port, state, os.getenv("STATE_TOKEN"))
+    print(f"Serving shared state from {os.path.abspath(args.root)} on {args.host}:{args.port}")
+    server.serve_forever()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,430 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import atexit
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # No cross-process index lock on this platform
+    fcntl = None
+
+# Eviction tiers: files in lower tiers are evicted first
+TIER_REGENERABLE = 0
+TIER_EXPENSIVE = 1
+TIER_SOURCE = 2
+
+KIND_TIERS = {
+    "clip": TIER_REGENERABLE,
+    "export": TIER_REGENERABLE,
+    "proxy": TIER_REGENERABLE,
+    "segments": TIER_REGENERABLE,
+    "transcript": TIER_EXPENSIVE,
+    "artifact": TIER_EXPENSIVE,
+    "upload": TIER_SOURCE
+}
+
+# Batch last-access updates instead of rewriting the index on every rerun
+TOUCH_FLUSH_INTERVAL = 30
+
+def classify_file(path):
+    """Guess the kind of a derived file from its name"""
+    name = os.path.basename(path)
+    if os.path.isdir(path):
+        return "segments"
+    if name.endswith(".zip"):
+        return "export"
+    if name.endswith((".srt", ".vtt")):
+        return "artifact"
+    if name.startswith(("chapter_", "social_", "highlight_")):
+        return "clip"
+    if "_proxy_" in name:
+        return "proxy"
+    if name.endswith("_transcript.json"):
+        return "transcript"
+    if name.endswith(".txt") or name.endswith(".json"):
+        return "artifact"
+    return "upload"
+
+def is_temporary(name):
+    """Files still being written (downloads, encodes, fetches, links) are never tracked"""
+    return ".partial" in name or name.endswith((".tmp", ".linking"))
+
+def path_size(path):
+    """Size of a file, or of every file under a folder"""
+    if not os.path.isdir(path):
+        return os.stat(path).st_size
+    return sum(
+        os.stat(os.path.join(root, name)).st_size
+        for root, _, names in os.walk(path)
+        for name in names
+    )
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """Hash a file in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def link_or_copy(src, dst):
+    """Hard-link src to dst, falling back to a copy across filesystems"""
+    tmp_path = f"{dst}.linking"
+    try:
+        os.link(src, tmp_path)
+    except OSError:
+        shutil.copy2(src, tmp_path)
+    os.replace(tmp_path, dst)
+
+def replace_file(path, source, chunk_size=1024 * 1024):
+    """Write a file object's contents to path through a temporary file.
+
+    The new file gets its own inode, so files that dedupe hard-linked to the
+    old one keep their contents.
+    """
+    tmp_path = f"{path}.partial"
+    try:
+        with open(tmp_path, 'wb') as f:
+            shutil.copyfileobj(source, f, chunk_size)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return path
+
+class StorageManager:
+    """Tracks derived files and keeps directories under their byte quotas.
+
+    Every tracked file has a kind (see KIND_TIERS), size and last access time.
+    When a directory goes over quota, least-recently-used files are evicted,
+    cheapest-to-regenerate tiers first.
+
+    Server processes on one host share the index file. Changes are queued and
+    merged into the file's current contents under a file lock, so processes
+    never drop each other's entries.
+    """
+
+    def __init__(self, index_path, quotas, folder_dirs=()):
+        self.index_path = index_path
+        # {directory: max bytes, or None for unlimited}
+        self.quotas = quotas
+        # Managed directories whose entries are whole subfolders (e.g. HLS segments per film)
+        self.folder_dirs = {os.path.abspath(directory) for directory in folder_dirs}
+        self._lock = threading.RLock()
+        self._lock_file = None
+        self._lock_depth = 0
+        self._changes = []
+        self._last_save = 0
+        self._entries = self._load()
+        # Touches are batched; write what is left when the process exits
+        atexit.register(self.flush)
+
+    def _load(self):
+        if not os.path.exists(self.index_path):
+            return {}
+        try:
+            with open(self.index_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Could not read storage index, starting fresh: {str(e)}")
+            return {}
+
+    @contextmanager
+    def _index_lock(self):
+        """Hold the index across threads and, where fcntl exists, across processes"""
+        with self._lock:
+            if self._lock_depth == 0 and fcntl is not None:
+                self._lock_file = open(f"{self.index_path}.lock", 'a')
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0 and self._lock_file is not None:
+                    fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+                    self._lock_file.close()
+                    self._lock_file = None
+
+    @staticmethod
+    def _apply(entries, change):
+        op, path = change[0], change[1]
+        if op == "update":
+            entry = entries.setdefault(path, {})
+            for key in change[3]:
+                entry.pop(key, None)
+            entry.update(change[2])
+        elif op == "add":
+            entries.setdefault(path, dict(change[2]))
+        elif op == "touch":
+            if path in entries:
+                entries[path]["last_access"] = max(entries[path].get("last_access", 0), change[2])
+        elif op == "delete":
+            entries.pop(path, None)
+        elif op == "hold":
+            if path in entries:
+                holds = entries[path].setdefault("holds", {})
+                holds[change[2]] = max(holds.get(change[2], 0), change[3])
+        elif op == "release":
+            holds = entries.get(path, {}).get("holds", {})
+            holds.pop(change[2], None)
+            if not holds:
+                entries.get(path, {}).pop("holds", None)
+
+    def _change(self, *change):
+        """Apply a change in memory and queue it for the index file"""
+        self._apply(self._entries, change)
+        self._changes.append(change)
+
+    def _save(self):
+        """Merge queued changes into the index file and reload it"""
+        with self._index_lock():
+            entries = self._load()
+            for change in self._changes:
+                self._apply(entries, change)
+            tmp_path = f"{self.index_path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(entries, f)
+            os.replace(tmp_path, self.index_path)
+            self._entries = entries
+            self._changes = []
+            self._last_save = time.time()
+
+    def register(self, path, kind=None, sha256=None):
+        """Start tracking a file (or refresh its size after it was rewritten).
+
+        A sha256 the caller already computed is kept, so it is never hashed again.
+        """
+        path = os.path.abspath(path)
+        if not os.path.exists(path):
+            return
+        stat = os.stat(path)
+        with self._lock:
+            entry = self._entries.get(path, {})
+            update = {
+                "kind": kind or entry.get("kind") or classify_file(path),
+                "size": path_size(path),
+                "mtime": stat.st_mtime,
+                "last_access": time.time()
+            }
+            if sha256:
+                update["sha256"] = sha256
+            self._change("update", path, update,
+                         ["sha256"] if entry.get("mtime") != stat.st_mtime and not sha256 else [])
+            self._save()
+
+    def touch(self, path):
+        """Record that a file was just used"""
+        path = os.path.abspath(path)
+        with self._lock:
+            if path not in self._entries:
+                return
+            self._change("touch", path, time.time())
+            if time.time() - self._last_save > TOUCH_FLUSH_INTERVAL:
+                self._save()
+
+    def hold(self, path, owner, seconds):
+        """Keep a file from being evicted for the next seconds on behalf of owner.
+
+        Holds are renewed by calling this again (e.g. on every rerun); the
+        index is only rewritten once a hold is halfway to expiring.
+        """
+        path = os.path.abspath(path)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None:
+                return
+            if entry.get("holds", {}).get(owner, 0) - now > seconds / 2:
+                return
+            self._change("hold", path, owner, now + seconds)
+            self._save()
+
+    def release(self, path, owner):
+        """Drop owner's hold on a file"""
+        path = os.path.abspath(path)
+        with self._lock:
+            if owner in self._entries.get(path, {}).get("holds", {}):
+                self._change("release", path, owner)
+                self._save()
+
+    def is_tracked(self, path):
+        return os.path.abspath(path) in self._entries
+
+    def is_held(self, path):
+        now = time.time()
+        return any(until > now for until in self._entries.get(os.path.abspath(path), {}).get("holds", {}).values())
+
+    def forget(self, path):
+        with self._lock:
+            path = os.path.abspath(path)
+            if path in self._entries:
+                self._change("delete", path)
+                self._save()
+
+    def _sha256(self, path):
+        entry = self._entries[path]
+        if "sha256" not in entry:
+            self._change("update", path, {"sha256": file_sha256(path)}, [])
+        return self._entries[path]["sha256"]
+
+    def sha256(self, path):
+        """SHA-256 of a file, cached in the index until the file changes"""
+        path = os.path.abspath(path)
+        with self._lock:
+            if path not in self._entries:
+                return file_sha256(path)
+            return self._sha256(path)
+
+    def dedupe(self, path):
+        """Replace a tracked file with a hard link to an identical tracked file.
+
+        Only files of the same size are hashed, so unique files cost a stat.
+        Returns the path it was linked to, or None.
+        """
+        path = os.path.abspath(path)
+        with self._index_lock():
+            self._save()
+            entry = self._entries.get(path)
+            if entry is None:
+                return None
+            stat = os.stat(path)
+            for other_path, other in list(self._entries.items()):
+                if other_path == path or other["size"] != entry["size"]:
+                    continue
+                if not os.path.exists(other_path):
+                    continue
+                other_stat = os.stat(other_path)
+                if other_stat.st_ino == stat.st_ino and other_stat.st_dev == stat.st_dev:
+                    return other_path
+                if other_stat.st_dev != stat.st_dev:
+                    continue
+                if self._sha256(other_path) != self._sha256(path):
+                    continue
+                link_or_copy(other_path, path)
+                self._change("update", path, {"mtime": os.stat(path).st_mtime}, [])
+                self._save()
+                print(f"Hard-linked {os.path.basename(path)} to identical {os.path.basename(other_path)}")
+                return other_path
+            self._save()
+        return None
+
+    def scan(self, directory):
+        """Register untracked files in a directory and forget deleted ones"""
+        directory = os.path.abspath(directory)
+        with self._index_lock():
+            self._save()
+            for path in list(self._entries):
+                if os.path.dirname(path) == directory and not os.path.exists(path):
+                    self._change("delete", path)
+            for name in os.listdir(directory):
+                path = os.path.join(directory, name)
+                if path in self._entries or is_temporary(name):
+                    continue
+                if os.path.isfile(path) or (os.path.isdir(path) and directory in self.folder_dirs):
+                    stat = os.stat(path)
+                    self._change("add", path, {
+                        "kind": classify_file(path),
+                        "size": path_size(path),
+                        "mtime": stat.st_mtime,
+                        "last_access": stat.st_mtime
+                    })
+            self._save()
+
+    def directory_usage(self, directory):
+        """Bytes used by a directory, counting hard-linked files once"""
+        directory = os.path.abspath(directory)
+        seen = set()
+        total = 0
+        files = 0
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if os.path.isdir(path) and directory in self.folder_dirs:
+                files += 1
+                total += path_size(path)
+                continue
+            if not os.path.isfile(path):
+                continue
+            stat = os.stat(path)
+            files += 1
+            if (stat.st_dev, stat.st_ino) in seen:
+                continue
+            seen.add((stat.st_dev, stat.st_ino))
+            total += stat.st_size
+        return total, files
+
+    def usage(self):
+        """Current usage per managed directory"""
+        report = {}
+        for directory, quota in self.quotas.items():
+            used, files = self.directory_usage(directory)
+            report[directory] = {"bytes": used, "files": files, "quota": quota}
+        return report
+
+    def enforce_quota(self, directory, protect=(), evict_sources=False):
+        """Evict least-recently-used files until the directory is under its quota.
+
+        Regenerable files (clips, exports, proxies) go before expensive ones
+        (transcripts, LLM outputs), and sources go last, only with
+        evict_sources. Files in protect or held by a session or job (see hold)
+        are never evicted. Returns evicted paths.
+        """
+        directory = os.path.abspath(directory)
+        quota = self.quotas.get(directory)
+        if not quota:
+            return []
+        protected = {os.path.abspath(path) for path in protect}
+        evicted = []
+        with self._index_lock():
+            self.scan(directory)
+            used, _ = self.directory_usage(directory)
+            if used <= quota:
+                return []
+            candidates = sorted(
+                (
+                    (KIND_TIERS.get(entry["kind"], TIER_EXPENSIVE), entry["last_access"], path)
+                    for path, entry in self._entries.items()
+                    if os.path.dirname(path) == directory and path not in protected
+                    and not self.is_held(path)
+                    and (evict_sources or KIND_TIERS.get(entry["kind"], TIER_EXPENSIVE) != TIER_SOURCE)
+                )
+            )
+            for _, _, path in candidates:
+                if used <= quota:
+                    break
+                if os.path.isdir(path):
+                    size = path_size(path)
+                    shutil.rmtree(path, ignore_errors=True)
+                    used -= size
+                else:
+                    stat = os.stat(path)
+                    os.remove(path)
+                    # A hard-linked file only frees space when its last link goes
+                    if stat.st_nlink == 1:
+                        used -= stat.st_size
+                self._change("delete", path)
+                evicted.append(path)
+                print(f"Evicted {os.path.basename(path)} to stay under quota")
+            self._save()
+        if used > quota:
+            print(f"Warning: {directory} still over quota ({used} > {quota} bytes)")
+        return evicted
+
+    def flush(self):
+        """Write batched last-access updates"""
+        with self._lock:
+            if self._changes:
+                self._save()
+
+def format_bytes(num_bytes):
+    """Human readable byte count"""
+    for unit in ["B", "KB", "MB", "GB"]:
+        if num_bytes < 1024:
+            return f"{num_bytes:.1f} {unit}"
+        num_bytes /= 1024
+    return f"{num_bytes:.1f} TB"
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from audio_analysis import ENERGY_WINDOW_MS, FINGERPRINT_SAMPLE_RATE, peak_hashes, spectral_peaks, speech_bounds
+from fingerprint_index import FingerprintIndex
+
+def synthetic_film(seconds, seed):
+    """A quarter-second chord of three random tones after another"""
+    rng = np.random.default_rng(seed)
+    note = int(FINGERPRINT_SAMPLE_RATE * 0.25)
+    t = np.arange(note) / FINGERPRINT_SAMPLE_RATE
+    notes = []
+    for _ in range(int(seconds / 0.25)):
+        chord = sum(np.sin(2 * np.pi * freq * t) for freq in rng.uniform(200, 3500, size=3))
+        notes.append(chord * np.hanning(note))
+    return np.concatenate(notes).astype(np.float32)
+
+def fingerprint(samples, chunk_seconds=60):
+    chunk = FINGERPRINT_SAMPLE_RATE * chunk_seconds
+    return peak_hashes(*spectral_peaks(samples[i:i + chunk] for i in range(0, len(samples), chunk)))
+
+@pytest.fixture
+def index(tmp_path):
+    index = FingerprintIndex(str(tmp_path))
+    index.add("film", *fingerprint(synthetic_film(120, seed=1)))
+    return index
+
+def test_trimmed_noisy_copy_matches_at_its_offset(index):
+    film = synthetic_film(120, seed=1)
+    start = int(17.3 * FINGERPRINT_SAMPLE_RATE)
+    excerpt = film[start:start + 40 * FINGERPRINT_SAMPLE_RATE] * 0.5
+    excerpt += np.random.default_rng(2).normal(0, 0.3, len(excerpt)).astype(np.float32)
+
+    film_name, offset_ms, score = index.match(*fingerprint(excerpt))
+    assert film_name == "film"
+    # Within one analysis frame (32 ms)
+    assert offset_ms == pytest.approx(17300, abs=40)
+    assert score > 0.05
+
+def test_unrelated_audio_does_not_match(index):
+    noise = np.random.default_rng(3).normal(0, 1, 40 * FINGERPRINT_SAMPLE_RATE).astype(np.float32)
+    assert index.match(*fingerprint(noise)) is None
+    assert index.match(*fingerprint(synthetic_film(40, seed=5))) is None
+
+def envelope(*spans):
+    """Energy envelope from (seconds, rms) spans"""
+    return np.concatenate([
+        np.full(int(seconds * 1000 / ENERGY_WINDOW_MS), rms, dtype=np.float32) for seconds, rms in spans
+    ])
+
+def test_speech_bounds_tighten_to_speech_within_the_tolerance():
+    quiet_speech_quiet = envelope((1, 0.001), (2, 0.3), (2, 0.001))
+    assert speech_bounds(quiet_speech_quiet, 0, 5000, tolerance_ms=2000) == (850, 3150)
+    assert speech_bounds(quiet_speech_quiet, 0, 5000, tolerance_ms=500) == (500, 4500)
+
+def test_speech_bounds_leave_spans_without_speech_alone():
+    silence_then_speech = envelope((3, 0.001), (2, 0.3))
+    assert speech_bounds(silence_then_speech, 0, 2000, tolerance_ms=1000) == (0, 2000)
@@ -0,0 +1,52 @@
+import captions
+
+def words_from(text, start_ms=0, word_ms=300, gap_ms=0):
+    words = []
+    time_ms = start_ms
+    for text_word in text.split():
+        words.append([time_ms, time_ms + word_ms, text_word])
+        time_ms += word_ms + gap_ms
+    return words
+
+def test_cues_are_relative_to_the_clip_start():
+    words = words_from("before the clip", 0) + words_from("inside the clip", 10000)
+    cues = list(captions.iter_cues(words, start_ms=10000, end_ms=20000))
+    assert cues[0][0] == 0
+    assert cues[0][2] == ["inside the clip"]
+
+def test_cues_stay_up_long_enough_to_read_but_not_past_the_next():
+    words = [[0, 200, "Hi."]] + words_from("and then a long pause before this one", 5000)
+    first, second = list(captions.iter_cues(words))
+    # A short cue is held for the minimum duration
+    assert first[:2] == (0, captions.CAPTION_MIN_DURATION_MS)
+    assert second[0] == 5000
+
+    words = [[0, 200, "Quick"], [600, 800, "words"]]
+    first, _ = list(captions.iter_cues(words, max_line_chars=5, max_lines=1))
+    assert first[1] == 600
+
+def test_cues_are_clipped_to_the_end():
+    words = words_from("the last words of the clip", 0)
+    cues = list(captions.iter_cues(words, end_ms=1000))
+    assert cues[-1][1] == 1000
+    assert all(end <= 1000 for _, end, _ in cues)
+
+def test_long_text_splits_into_two_line_cues():
+    words = words_from(" ".join(["word"] * 60), 0, word_ms=100)
+    cues = list(captions.iter_cues(words))
+    assert len(cues) > 1
+    for start, end, lines in cues:
+        assert start < end
+        assert len(lines) <= captions.CAPTION_MAX_LINES
+        assert all(len(line) <= captions.CAPTION_MAX_LINE_CHARS for line in lines)
+    assert all(cues[i][1] <= cues[i + 1][0] for i in range(len(cues) - 1))
+
+def test_timestamps_and_formats(tmp_path):
+    assert captions.format_timestamp(3723004, ",") == "01:02:03,004"
+    words = [[1000, 1500, "Hello"], [1500, 2000, "world."]]
+    srt_path = tmp_path / "clip.srt"
+    vtt_path = tmp_path / "clip.vtt"
+    assert captions.write_captions(words, str(srt_path), start_ms=500) == 1
+    captions.write_captions(words, str(vtt_path), start_ms=500)
+    assert srt_path.read_text() == "1\n00:00:00,500 --> 00:00:01,500\nHello world.\n\n"
+    assert vtt_path.read_text() == "WEBVTT\n\n00:00:00.500 --> 00:00:01.500\nHello world.\n\n"
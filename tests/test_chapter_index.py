@@ -0,0 +1,44 @@
+import json
+import threading
+
+import numpy as np
+
+from chapter_index import ChapterIndex
+
+DIM = 8
+
+class StubIndex(ChapterIndex):
+    """Embeds text by hashing it, so no model is downloaded"""
+    def embed(self, texts):
+        vectors = [np.random.default_rng(abs(hash(text)) % 2**32).standard_normal(DIM) for text in texts]
+        vectors = np.array(vectors, dtype=np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def chapters(film, count=3):
+    return [
+        {"start": idx * 1000, "end": (idx + 1) * 1000, "gist": f"{film} {idx}", "summary": f"{film} chapter {idx}", "headline": f"{film} {idx}"}
+        for idx in range(count)
+    ]
+
+def test_concurrent_writers_keep_rows_and_vectors_aligned(tmp_path):
+    # Separate instances stand in for separate server processes
+    films = [f"film{idx}" for idx in range(8)]
+    threads = [
+        threading.Thread(target=StubIndex(str(tmp_path), model_name="stub").add_film, args=(film, chapters(film)))
+        for film in films
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    index = StubIndex(str(tmp_path), model_name="stub")
+    with open(tmp_path / "chapters.jsonl") as f:
+        rows = [json.loads(line) for line in f]
+    assert sorted({row["film"] for row in rows}) == films
+    assert len(rows) == len(films) * 3
+    assert (tmp_path / "vectors.f32").stat().st_size == len(rows) * DIM * 4
+    # Each row's vector is the one embedded for its own chapter
+    for row_idx, row in enumerate(rows):
+        expected = index.embed([f"{row['film']} {row['chapter'] - 1}. {row['film']} chapter {row['chapter'] - 1}"])[0]
+        assert np.allclose(index._get_matrix()[row_idx], expected)
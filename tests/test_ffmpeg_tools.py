@@ -0,0 +1,6 @@
+from ffmpeg_tools import partial_path
+
+def test_partial_path_keeps_the_extension():
+    assert partial_path("chapters/clip.mp4") == "chapters/clip.partial.mp4"
+    assert partial_path("chapters/clip.mov") == "chapters/clip.partial.mov"
+    assert partial_path("chapters/clip.final.mkv") == "chapters/clip.final.partial.mkv"
@@ -0,0 +1,31 @@
+from highlight_reel import encode_args, track_timescale
+from media_probe import MediaIndex
+
+def media_index(**video):
+    return MediaIndex({
+        "keyframes": [0.0],
+        "streams": [
+            dict({"type": "video", "codec": "h264", "width": 1920, "height": 1080, "fps": 23.976}, **video),
+            {"type": "audio", "codec": "aac", "sample_rate": 44100, "channels": 2}
+        ]
+    })
+
+def option(args, name):
+    return args[args.index(name) + 1] if name in args else None
+
+def test_boundary_encodes_match_the_source_stream():
+    index = media_index(profile="Main", level=31, pix_fmt="yuvj420p", time_base="1/24000")
+    args = encode_args(index)
+    assert option(args, "-profile:v") == "main"
+    assert option(args, "-level") == "3.1"
+    assert option(args, "-pix_fmt") == "yuvj420p"
+    assert option(args, "-s") == "1920x1080"
+    assert option(args, "-ar") == "44100"
+    assert track_timescale(index.stream("video")) == 24000
+
+def test_unknown_source_details_fall_back_to_defaults():
+    args = encode_args(media_index(profile="High 10 Intra", level=-99))
+    assert option(args, "-profile:v") is None
+    assert option(args, "-level") is None
+    assert option(args, "-pix_fmt") == "yuv420p"
+    assert track_timescale({}) is None
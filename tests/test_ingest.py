@@ -0,0 +1,66 @@
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import ingest
+
+DATA = bytes(range(256)) * 4096
+
+class DroppingHandler(BaseHTTPRequestHandler):
+    """Serves DATA with Range support; the first full response is cut off halfway"""
+    ranges = []
+    dropped = False
+
+    def do_GET(self):
+        range_header = self.headers.get("Range")
+        type(self).ranges.append(range_header)
+        start = int(range_header[len("bytes="):].rstrip("-")) if range_header else 0
+        body = DATA[start:]
+        if range_header:
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(DATA) - 1}/{len(DATA)}")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if not type(self).dropped:
+            type(self).dropped = True
+            self.wfile.write(body[:len(body) // 2])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server():
+    DroppingHandler.ranges = []
+    DroppingHandler.dropped = False
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), DroppingHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}/films/film.mp4"
+    httpd.shutdown()
+    httpd.server_close()
+
+def test_dropped_download_resumes_with_range(server, tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest.time, "sleep", lambda seconds: None)
+    dest_path = tmp_path / "film.mp4"
+
+    sha256 = ingest.stream_download(server, str(dest_path), chunk_size=64 * 1024)
+
+    assert DroppingHandler.ranges[0] is None
+    assert DroppingHandler.ranges[1] == f"bytes={len(DATA) // 2}-"
+    assert sha256 == hashlib.sha256(DATA).hexdigest()
+    assert dest_path.read_bytes() == DATA
+    assert not (tmp_path / "film.mp4.partial").exists()
+
+def test_filename_is_qualified_by_url():
+    first = ingest.filename_from_url("https://example.com/a/film.mp4")
+    second = ingest.filename_from_url("https://example.com/b/film.mp4")
+    assert first != second
+    assert first.startswith("film_") and first.endswith(".mp4")
@@ -0,0 +1,66 @@
+import threading
+import time
+
+import pytest
+
+import single_flight
+import state_server
+from shared_state import LocalState, RemoteState
+
+@pytest.fixture
+def remote(tmp_path):
+    state = LocalState(str(tmp_path / "blobs"), str(tmp_path / "state.db"))
+    server = state_server.make_server("127.0.0.1", 0, state, token="secret")
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield RemoteState(f"http://127.0.0.1:{server.server_address[1]}", token="secret", timeout=10)
+    server.shutdown()
+    server.server_close()
+
+def test_locks_are_exclusive_until_released(remote):
+    assert remote.acquire_lock("clip:abc", "replica-a", 60)
+    assert not remote.acquire_lock("clip:abc", "replica-b", 60)
+    # The holder renews by acquiring again
+    assert remote.acquire_lock("clip:abc", "replica-a", 60)
+    remote.release_lock("clip:abc", "replica-b")
+    assert not remote.acquire_lock("clip:abc", "replica-b", 60)
+    remote.release_lock("clip:abc", "replica-a")
+    assert remote.acquire_lock("clip:abc", "replica-b", 60)
+
+def test_locks_expire(remote):
+    assert remote.acquire_lock("transcript:abc", "crashed", 0.2)
+    assert not remote.acquire_lock("transcript:abc", "replica-b", 60)
+    time.sleep(0.3)
+    assert remote.acquire_lock("transcript:abc", "replica-b", 60)
+
+def test_blobs_round_trip(remote, tmp_path):
+    source = tmp_path / "film.mp4"
+    source.write_bytes(bytes(range(256)) * 1024)
+    key = "films/film one.mp4"
+
+    assert not remote.has_blob(key)
+    assert not remote.fetch_blob(key, str(tmp_path / "missing.mp4"))
+    remote.put_blob(key, str(source))
+    assert remote.has_blob(key)
+
+    fetched = tmp_path / "fetched.mp4"
+    assert remote.fetch_blob(key, str(fetched))
+    assert fetched.read_bytes() == source.read_bytes()
+
+    remote.delete_blob(key)
+    assert not remote.has_blob(key)
+
+def test_token_is_required(remote):
+    anonymous = RemoteState(remote.base_url, timeout=10)
+    with pytest.raises(Exception):
+        anonymous.acquire_lock("clip:abc", "replica-a", 60)
+
+def test_shared_lock_is_renewed_while_held(remote, tmp_path, monkeypatch):
+    monkeypatch.setattr(single_flight, "SHARED_LOCK_TTL", 0.3)
+    monkeypatch.setattr(single_flight, "SHARED_LOCK_RENEW", 0.1)
+    flight = single_flight.SingleFlight(str(tmp_path / "locks"), state=remote)
+
+    with flight.lock("clip:abc"):
+        time.sleep(0.6)
+        assert not remote.acquire_lock("clip:abc", "replica-b", 60)
+    assert remote.acquire_lock("clip:abc", "replica-b", 60)
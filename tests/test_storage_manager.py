@@ -0,0 +1,170 @@
+import io
+import os
+from storage_manager import StorageManager, replace_file
+
+def write(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
+
+def make_storage(tmp_path, quotas=None):
+    return StorageManager(str(tmp_path / "storage_index.json"), quotas or {})
+
+def test_dedupe_links_identical_files(tmp_path):
+    storage = make_storage(tmp_path)
+    a = tmp_path / "a.mp4"
+    b = tmp_path / "b.mp4"
+    write(a, b"film" * 1000)
+    write(b, b"film" * 1000)
+    storage.register(str(a), "upload")
+    storage.register(str(b), "upload")
+
+    assert storage.dedupe(str(b)) == str(a)
+    assert os.stat(a).st_ino == os.stat(b).st_ino
+
+def test_replacing_a_deduped_upload_leaves_its_twin_alone(tmp_path):
+    storage = make_storage(tmp_path)
+    a = tmp_path / "a.mp4"
+    b = tmp_path / "b.mp4"
+    write(a, b"film" * 1000)
+    write(b, b"film" * 1000)
+    storage.register(str(a), "upload")
+    storage.register(str(b), "upload")
+    storage.dedupe(str(b))
+
+    replace_file(str(a), io.BytesIO(b"new film"))
+
+    assert a.read_bytes() == b"new film"
+    assert b.read_bytes() == b"film" * 1000
+    assert not os.path.exists(f"{a}.partial")
+
+def test_scan_skips_files_still_being_written(tmp_path):
+    storage = make_storage(tmp_path)
+    uploads = tmp_path / "uploads"
+    uploads.mkdir()
+    for name in ("film.mp4", "film.mp4.partial", "clip.partial.mp4", "film_audio.partial.m4a", "x.json.tmp"):
+        write(uploads / name, b"data")
+
+    storage.scan(str(uploads))
+
+    assert list(storage._entries) == [str(uploads / "film.mp4")]
+
+def test_processes_sharing_an_index_keep_each_others_entries(tmp_path):
+    first = make_storage(tmp_path)
+    second = make_storage(tmp_path)
+    a = tmp_path / "a.txt"
+    b = tmp_path / "b.txt"
+    write(a, b"a")
+    write(b, b"b")
+
+    first.register(str(a))
+    second.register(str(b))
+
+    assert set(make_storage(tmp_path)._entries) == {str(a), str(b)}
+
+def test_flush_writes_batched_touches(tmp_path):
+    storage = make_storage(tmp_path)
+    a = tmp_path / "a.txt"
+    write(a, b"a")
+    storage.register(str(a))
+    before = make_storage(tmp_path)._entries[str(a)]["last_access"]
+
+    storage.touch(str(a))
+    assert make_storage(tmp_path)._entries[str(a)]["last_access"] == before
+    storage.flush()
+
+    assert make_storage(tmp_path)._entries[str(a)]["last_access"] > before
+
+def test_touches_are_saved_once_the_interval_passes(tmp_path, monkeypatch):
+    storage = make_storage(tmp_path)
+    a = tmp_path / "a.txt"
+    write(a, b"a")
+    storage.register(str(a))
+    before = make_storage(tmp_path)._entries[str(a)]["last_access"]
+
+    import storage_manager
+    now = storage_manager.time.time()
+    monkeypatch.setattr(storage_manager.time, "time", lambda: now + storage_manager.TOUCH_FLUSH_INTERVAL + 1)
+    storage.touch(str(a))
+
+    assert make_storage(tmp_path)._entries[str(a)]["last_access"] > before
+
+def test_eviction_takes_regenerable_files_first(tmp_path):
+    clips = tmp_path / "clips"
+    clips.mkdir()
+    storage = make_storage(tmp_path, {str(clips): 250})
+    for name, kind in (("chapter_1_a.mp4", "clip"), ("a_summary.txt", "artifact"), ("chapter_2_a.mp4", "clip")):
+        write(clips / name, b"x" * 100)
+        storage.register(str(clips / name), kind)
+
+    evicted = storage.enforce_quota(str(clips))
+
+    assert evicted == [str(clips / "chapter_1_a.mp4")]
+
+def test_eviction_skips_held_sources(tmp_path):
+    uploads = tmp_path / "uploads"
+    uploads.mkdir()
+    storage = make_storage(tmp_path, {str(uploads): 250})
+    for name in ("a.mp4", "b.mp4", "c.mp4"):
+        write(uploads / name, name.encode() * 50)
+        storage.register(str(uploads / name), "upload")
+    storage.hold(str(uploads / "a.mp4"), "session:other", 3600)
+
+    evicted = storage.enforce_quota(str(uploads), protect=[str(uploads / "c.mp4")], evict_sources=True)
+
+    assert evicted == [str(uploads / "b.mp4")]
+    assert (uploads / "a.mp4").exists()
+
+def test_holds_are_seen_by_other_processes_and_released(tmp_path):
+    uploads = tmp_path / "uploads"
+    uploads.mkdir()
+    write(uploads / "a.mp4", b"a" * 300)
+    first = make_storage(tmp_path, {str(uploads): 100})
+    first.register(str(uploads / "a.mp4"), "upload")
+    first.hold(str(uploads / "a.mp4"), "transcript:a", 3600)
+
+    second = make_storage(tmp_path, {str(uploads): 100})
+    assert second.enforce_quota(str(uploads), evict_sources=True) == []
+
+    first.release(str(uploads / "a.mp4"), "transcript:a")
+    assert second.enforce_quota(str(uploads), evict_sources=True) == [str(uploads / "a.mp4")]
+
+def test_derived_quotas_never_evict_sources(tmp_path):
+    transcripts = tmp_path / "transcripts"
+    transcripts.mkdir()
+    storage = make_storage(tmp_path, {str(transcripts): 100})
+    write(transcripts / "film.mp4", b"x" * 300)
+    storage.register(str(transcripts / "film.mp4"), "upload")
+
+    assert storage.enforce_quota(str(transcripts)) == []
+    assert (transcripts / "film.mp4").exists()
+
+def test_expired_holds_do_not_protect(tmp_path, monkeypatch):
+    uploads = tmp_path / "uploads"
+    uploads.mkdir()
+    storage = make_storage(tmp_path, {str(uploads): 100})
+    write(uploads / "a.mp4", b"a" * 300)
+    storage.register(str(uploads / "a.mp4"), "upload")
+    storage.hold(str(uploads / "a.mp4"), "session:gone", 60)
+
+    import storage_manager
+    now = storage_manager.time.time()
+    monkeypatch.setattr(storage_manager.time, "time", lambda: now + 120)
+
+    assert storage.enforce_quota(str(uploads), evict_sources=True) == [str(uploads / "a.mp4")]
+
+def test_segment_folders_are_evicted_whole(tmp_path):
+    segments = tmp_path / "segments"
+    (segments / "old").mkdir(parents=True)
+    (segments / "new").mkdir()
+    write(segments / "old" / "index.m3u8", b"#EXTM3U\n")
+    write(segments / "old" / "seg_00000.ts", b"o" * 200)
+    write(segments / "new" / "seg_00000.ts", b"n" * 200)
+    (segments / "new.partial").mkdir()
+    storage = StorageManager(str(tmp_path / "index.json"), {str(segments): 300}, folder_dirs=[str(segments)])
+    storage.register(str(segments / "old"), "segments")
+    storage.touch(str(segments / "old"))
+
+    assert storage.usage()[str(segments)]["bytes"] == 408
+    assert storage.enforce_quota(str(segments), protect=[str(segments / "new")]) == [str(segments / "old")]
+    assert not (segments / "old").exists()
+    assert (segments / "new.partial").exists()
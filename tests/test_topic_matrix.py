@@ -0,0 +1,28 @@
+import pytest
+
+from topic_matrix import TopicMatrix
+
+def test_writers_sharing_a_folder_keep_each_others_rows(tmp_path):
+    # Two instances stand in for two server processes
+    first = TopicMatrix(str(tmp_path))
+    second = TopicMatrix(str(tmp_path))
+    first.add_film("houseboat", {"Society>Housing": 0.9})
+    second.add_film("harbor", {"Science>Environment": 0.8})
+    first.add_film("tenants", {"Society>Housing": 0.7})
+
+    reopened = TopicMatrix(str(tmp_path))
+    assert sorted(reopened.films) == ["harbor", "houseboat", "tenants"]
+    [(film, relevance)] = reopened.top_films(["Science>Environment"])
+    assert film == "harbor" and relevance == pytest.approx(0.8)
+
+def test_similar_films_rank_by_topic_profile(tmp_path):
+    matrix = TopicMatrix(str(tmp_path))
+    matrix.add_film("houseboat", {"Society>Housing": 0.9, "Science>Environment": 0.4})
+    matrix.add_film("tenants", {"Society>Housing": 0.8, "Science>Environment": 0.3})
+    matrix.add_film("harbor", {"Science>Environment": 0.9})
+    matrix.add_film("recipes", {"Food & Drink>Cooking": 0.9})
+
+    similar = matrix.similar_films("houseboat")
+    assert [film for film, _ in similar] == ["tenants", "harbor"]
+    assert similar[0][1] == pytest.approx(1.0, abs=0.01)
+    assert matrix.similar_films("missing") == []
@@ -0,0 +1,51 @@
+import io
+import zipfile
+
+from zip_tools import copy_zip_entry_raw
+
+class Unseekable(io.RawIOBase):
+    """Write-only stream, so zipfile falls back to data descriptors"""
+    def __init__(self):
+        self.buffer = io.BytesIO()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        return self.buffer.write(data)
+
+def test_copied_entries_keep_their_bytes(tmp_path):
+    source_path = tmp_path / "previous.zip"
+    with zipfile.ZipFile(source_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+        zipf.writestr("summary.txt", "summary " * 1000)
+        zipf.writestr("clip.mp4", bytes(range(256)) * 64, compress_type=zipfile.ZIP_STORED)
+
+    target_path = tmp_path / "next.zip"
+    with zipfile.ZipFile(source_path, 'r') as previous, zipfile.ZipFile(target_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+        zipf.writestr("new.txt", "new content")
+        for name in ("summary.txt", "clip.mp4"):
+            copy_zip_entry_raw(previous.fp, previous.getinfo(name), zipf)
+        zipf.writestr("README.txt", "readme")
+
+    with zipfile.ZipFile(target_path, 'r') as zipf:
+        assert zipf.testzip() is None
+        assert zipf.namelist() == ["new.txt", "summary.txt", "clip.mp4", "README.txt"]
+        assert zipf.read("summary.txt") == b"summary " * 1000
+        assert zipf.read("clip.mp4") == bytes(range(256)) * 64
+        assert zipf.getinfo("summary.txt").compress_type == zipfile.ZIP_DEFLATED
+        assert zipf.getinfo("clip.mp4").compress_type == zipfile.ZIP_STORED
+
+def test_entries_written_with_data_descriptors_are_copied(tmp_path):
+    stream = Unseekable()
+    with zipfile.ZipFile(stream, 'w', zipfile.ZIP_DEFLATED) as zipf:
+        zipf.writestr("guide.txt", "question? " * 500)
+    source = io.BytesIO(stream.buffer.getvalue())
+
+    target_path = tmp_path / "next.zip"
+    with zipfile.ZipFile(source, 'r') as previous, zipfile.ZipFile(target_path, 'w') as zipf:
+        assert previous.getinfo("guide.txt").flag_bits & 0x08
+        copy_zip_entry_raw(previous.fp, previous.getinfo("guide.txt"), zipf)
+
+    with zipfile.ZipFile(target_path, 'r') as zipf:
+        assert zipf.testzip() is None
+        assert zipf.read("guide.txt") == b"question? " * 500
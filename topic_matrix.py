@@ -0,0 +1,200 @@
+import os
+import json
+import glob
+import threading
+from contextlib import contextmanager
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    # No cross-process lock on this platform
+    fcntl = None
+
+class TopicMatrix:
+    """Film-by-topic relevance matrix built from the IAB categories of every transcript.
+
+    Rows are films and columns IAB topics ('Society>Housing'); both grow as
+    transcripts are added. The matrix is a dense float32 array saved as
+    matrix.npy, with the film and topic vocabularies in vocab.json, so catalog
+    questions are single vectorized operations over it. Writers hold a file
+    lock and reload files another process saved first, so server processes
+    sharing the folder don't overwrite each other's rows.
+    """
+
+    def __init__(self, index_dir):
+        self.index_dir = index_dir
+        self.matrix_path = os.path.join(index_dir, "matrix.npy")
+        self.vocab_path = os.path.join(index_dir, "vocab.json")
+        self.lock_path = os.path.join(index_dir, "matrix.lock")
+        self._lock = threading.Lock()
+        self._loaded_mtime = None
+        self.films = []
+        self.topics = []
+        self._film_mtimes = {}
+        self._film_lookup = {}
+        self._topic_lookup = {}
+        self.matrix = np.zeros((0, 0), dtype=np.float32)
+        os.makedirs(index_dir, exist_ok=True)
+        self._load()
+
+    def _vocab_mtime(self):
+        try:
+            return os.stat(self.vocab_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _load(self):
+        if not os.path.exists(self.vocab_path) or not os.path.exists(self.matrix_path):
+            return
+        self._loaded_mtime = self._vocab_mtime()
+        with open(self.vocab_path, 'r') as f:
+            vocab = json.load(f)
+        self.films = vocab["films"]
+        self.topics = vocab["topics"]
+        self._film_mtimes = vocab.get("mtimes", {})
+        self.matrix = np.load(self.matrix_path)
+        self._film_lookup = {film: idx for idx, film in enumerate(self.films)}
+        self._topic_lookup = {topic: idx for idx, topic in enumerate(self.topics)}
+
+    def _save(self):
+        tmp_path = f"{self.matrix_path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.save(f, self.matrix)
+        os.replace(tmp_path, self.matrix_path)
+        tmp_path = f"{self.vocab_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({"films": self.films, "topics": self.topics, "mtimes": self._film_mtimes}, f)
+        os.replace(tmp_path, self.vocab_path)
+        self._loaded_mtime = self._vocab_mtime()
+
+    @contextmanager
+    def _write_lock(self):
+        """Hold the matrix across threads and processes, with the latest saved copy loaded"""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.lock_path, 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    # vocab.json is written last, so it changes whenever another process saved
+                    if self._vocab_mtime() != self._loaded_mtime:
+                        self._load()
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _set_rows(self, films):
+        """Write {film: {topic: relevance}} into the matrix, adding rows and columns as needed"""
+        topic_lookup = self._topic_lookup
+        film_lookup = self._film_lookup
+        new_topics = sorted({topic for categories in films.values() for topic in categories} - set(topic_lookup))
+        new_films = [film for film in films if film not in film_lookup]
+        for topic in new_topics:
+            topic_lookup[topic] = len(self.topics)
+            self.topics.append(topic)
+        for film in new_films:
+            film_lookup[film] = len(self.films)
+            self.films.append(film)
+        if new_topics or new_films:
+            grown = np.zeros((len(self.films), len(self.topics)), dtype=np.float32)
+            grown[:self.matrix.shape[0], :self.matrix.shape[1]] = self.matrix
+            self.matrix = grown
+        for film, categories in films.items():
+            row = self.matrix[film_lookup[film]]
+            row[:] = 0.0
+            if categories:
+                columns = np.fromiter((topic_lookup[topic] for topic in categories), dtype=np.int64, count=len(categories))
+                row[columns] = np.fromiter(categories.values(), dtype=np.float32, count=len(categories))
+
+    def add_film(self, film, categories, mtime=None):
+        """Add or replace one film's row (mtime of its transcript spares the next sync a re-read)"""
+        with self._write_lock():
+            self._set_rows({film: categories})
+            if mtime is not None:
+                self._film_mtimes[film] = mtime
+            self._save()
+
+    def _changed_transcripts(self, transcripts_dir):
+        """{film: (mtime, path)} for transcripts not added at their current mtime"""
+        changed = {}
+        for path in glob.glob(os.path.join(transcripts_dir, "*_transcript.json")):
+            film = os.path.basename(path)[:-len("_transcript.json")]
+            mtime = os.path.getmtime(path)
+            if self._film_mtimes.get(film) != mtime:
+                changed[film] = (mtime, path)
+        return changed
+
+    def sync(self, transcripts_dir):
+        """Add transcripts that are new or changed since the last sync"""
+        if not self._changed_transcripts(transcripts_dir):
+            return 0
+        with self._write_lock():
+            # Another process may have added them while this one waited
+            changed = {}
+            for film, (mtime, path) in self._changed_transcripts(transcripts_dir).items():
+                try:
+                    with open(path, 'r') as f:
+                        changed[film] = json.load(f).get('categories') or {}
+                except (OSError, ValueError):
+                    continue
+                self._film_mtimes[film] = mtime
+            if changed:
+                print(f"Adding {len(changed)} film(s) to the topic matrix")
+                self._set_rows(changed)
+                self._save()
+        return len(changed)
+
+    def find_topics(self, text):
+        """Topics whose name contains every word of text (case-insensitive)"""
+        words = text.lower().split()
+        return [topic for topic in self.topics if all(word in topic.lower() for word in words)]
+
+    def top_films(self, topics, k=10):
+        """Films most relevant to any of the topics, as [(film, relevance)]"""
+        columns = [self._topic_lookup[topic] for topic in topics if topic in self._topic_lookup]
+        if not columns or not self.films:
+            return []
+        scores = self.matrix[:, columns].max(axis=1)
+        k = min(k, len(scores))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [(self.films[idx], float(scores[idx])) for idx in best if scores[idx] > 0]
+
+    def similar_films(self, film, k=5):
+        """Films with the most similar topic profile (cosine similarity), as [(film, similarity)]"""
+        idx = self._film_lookup.get(film)
+        if idx is None or len(self.films) < 2:
+            return []
+        norms = np.linalg.norm(self.matrix, axis=1)
+        if norms[idx] == 0:
+            return []
+        similarity = self.matrix @ self.matrix[idx] / (np.where(norms > 0, norms, 1.0) * norms[idx])
+        similarity[idx] = -np.inf
+        k = min(k, len(self.films) - 1)
+        best = np.argpartition(-similarity, k - 1)[:k]
+        best = best[np.argsort(-similarity[best])]
+        return [(self.films[i], float(similarity[i])) for i in best if similarity[i] > 0]
+
+    def topic_distribution(self, level=None, threshold=0.5):
+        """Catalog-wide topic coverage as [(topic, films at or above threshold, mean relevance)].
+
+        level=1 rolls topics up to their top-level category ('Society'), taking
+        each film's strongest subtopic.
+        """
+        if not self.films or not self.topics:
+            return []
+        matrix = self.matrix
+        topics = self.topics
+        if level:
+            groups = [">".join(topic.split(">")[:level]) for topic in self.topics]
+            order = np.argsort(groups, kind="stable")
+            sorted_groups = [groups[i] for i in order]
+            starts = [i for i, group in enumerate(sorted_groups) if i == 0 or group != sorted_groups[i - 1]]
+            matrix = np.maximum.reduceat(matrix[:, order], starts, axis=1)
+            topics = [sorted_groups[i] for i in starts]
+        counts = (matrix >= threshold).sum(axis=0)
+        means = matrix.mean(axis=0)
+        order = np.lexsort((-means, -counts))
+        return [(topics[i], int(counts[i]), float(means[i])) for i in order]
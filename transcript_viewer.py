@@ -0,0 +1,168 @@
+import os
+import json
+from hls import HLS_JS_URL
+
+# Characters per transcript row; rows have a fixed height so only visible ones are rendered
+LINE_MAX_CHARS = 72
+# A pause this long (ms) between words starts a new row
+LINE_BREAK_PAUSE_MS = 1500
+
+def build_lines(words, max_chars=LINE_MAX_CHARS, pause_ms=LINE_BREAK_PAUSE_MS):
+    """Group [start_ms, end_ms, text] words into rows of [first word, end word) indices"""
+    lines = []
+    first = 0
+    length = 0
+    for i, (start, _, text) in enumerate(words):
+        if i > first:
+            previous_end = words[i - 1][1]
+            previous_text = words[i - 1][2]
+            if (
+                length + 1 + len(text) > max_chars
+                or start - previous_end >= pause_ms
+                or (previous_text[-1:] in ".?!" and length > max_chars // 2)
+            ):
+                lines.append([first, i])
+                first = i
+                length = 0
+        length += len(text) + (1 if length else 0)
+    if first < len(words):
+        lines.append([first, len(words)])
+    return lines
+
+def write_word_index(words, path):
+    """Write word timings as columns plus row boundaries for the viewer to fetch once"""
+    if os.path.exists(path):
+        return path
+    data = {
+        "start": [word[0] for word in words],
+        "end": [word[1] for word in words],
+        "text": [word[2] for word in words],
+        "lines": build_lines(words)
+    }
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, separators=(",", ":"))
+    os.replace(tmp_path, path)
+    return path
+
+def transcript_viewer_html(playlist_url, words_url, height=420, hls_js_url=HLS_JS_URL):
+    """HTML for an HLS player with a virtualized transcript that follows playback.
+
+    The word index is fetched from static serving, so a rerun only sends this
+    page; the browser keeps just the rows in view in the DOM.
+    """
+    return f"""
+    <style>
+        body {{ margin: 0; font-family: sans-serif; }}
+        #viewer {{ position: relative; height: {height}px; overflow-y: auto; border: 1px solid #ddd; border-radius: 4px; }}
+        #spacer {{ position: relative; }}
+        .row {{ position: absolute; left: 0; right: 0; height: 28px; line-height: 28px; padding: 0 8px;
+                white-space: nowrap; overflow: hidden; text-overflow: ellipsis; font-size: 15px; }}
+        .time {{ color: #888; font-size: 12px; margin-right: 8px; font-family: monospace; }}
+        .word {{ cursor: pointer; border-radius: 3px; }}
+        .word:hover {{ background: #eef; }}
+        .current {{ background: #ffe066; }}
+        #controls {{ font-size: 13px; margin: 6px 0; color: #555; }}
+    </style>
+    <video id="player" controls playsinline style="width:100%;max-height:360px;background:#000"></video>
+    <div id="controls"><label><input type="checkbox" id="follow" checked> Follow playback</label> <span id="status">Loading transcript...</span></div>
+    <div id="viewer"><div id="spacer"></div></div>
+    <script src="{hls_js_url}"></script>
+    <script>
+        var ROW = 28, OVERSCAN = 10;
+        var video = document.getElementById('player');
+        var viewer = document.getElementById('viewer');
+        var spacer = document.getElementById('spacer');
+        var follow = document.getElementById('follow');
+        var src = "{playlist_url}";
+        if (video.canPlayType('application/vnd.apple.mpegurl')) {{
+            video.src = src;
+        }} else if (window.Hls && Hls.isSupported()) {{
+            var hls = new Hls();
+            hls.loadSource(src);
+            hls.attachMedia(video);
+        }}
+
+        var data = null, lineStarts = [], current = -1, rendered = [-1, -1], pending = false;
+
+        function search(array, value) {{
+            // Index of the last element <= value, or -1
+            var lo = 0, hi = array.length - 1, found = -1;
+            while (lo <= hi) {{
+                var mid = (lo + hi) >> 1;
+                if (array[mid] <= value) {{ found = mid; lo = mid + 1; }} else {{ hi = mid - 1; }}
+            }}
+            return found;
+        }}
+
+        function timecode(ms) {{
+            var s = Math.floor(ms / 1000), h = Math.floor(s / 3600), m = Math.floor(s / 60) % 60;
+            return (h ? h + ':' : '') + (h && m < 10 ? '0' : '') + m + ':' + ('0' + (s % 60)).slice(-2);
+        }}
+
+        function render() {{
+            pending = false;
+            var first = Math.max(0, Math.floor(viewer.scrollTop / ROW) - OVERSCAN);
+            var last = Math.min(data.lines.length, Math.ceil((viewer.scrollTop + viewer.clientHeight) / ROW) + OVERSCAN);
+            if (first === rendered[0] && last === rendered[1]) return;
+            rendered = [first, last];
+            var html = [];
+            for (var l = first; l < last; l++) {{
+                var line = data.lines[l];
+                html.push('<div class="row" style="top:' + (l * ROW) + 'px"><span class="time">' + timecode(data.start[line[0]]) + '</span>');
+                for (var i = line[0]; i < line[1]; i++) {{
+                    html.push('<span class="word' + (i === current ? ' current' : '') + '" data-i="' + i + '">' +
+                        data.text[i].replace(/&/g, '&amp;').replace(/</g, '&lt;') + '</span> ');
+                }}
+                html.push('</div>');
+            }}
+            spacer.innerHTML = html.join('');
+        }}
+
+        function schedule() {{
+            if (!pending && data) {{ pending = true; requestAnimationFrame(render); }}
+        }}
+
+        function highlight() {{
+            if (!data) return;
+            var word = search(data.start, video.currentTime * 1000);
+            if (word === current) return;
+            var old = spacer.querySelector('.current');
+            if (old) old.classList.remove('current');
+            current = word;
+            var span = spacer.querySelector('[data-i="' + word + '"]');
+            if (span) span.classList.add('current');
+            if (follow.checked && word >= 0) {{
+                var top = search(lineStarts, word) * ROW;
+                if (top < viewer.scrollTop || top + ROW > viewer.scrollTop + viewer.clientHeight) {{
+                    viewer.scrollTop = Math.max(0, top - viewer.clientHeight / 3);
+                }}
+            }}
+        }}
+
+        function tick() {{
+            highlight();
+            if (!video.paused) requestAnimationFrame(tick);
+        }}
+
+        viewer.addEventListener('scroll', schedule);
+        video.addEventListener('play', function() {{ requestAnimationFrame(tick); }});
+        video.addEventListener('seeked', highlight);
+        spacer.addEventListener('click', function(event) {{
+            var i = event.target.getAttribute('data-i');
+            if (i === null) return;
+            video.currentTime = data.start[+i] / 1000;
+            video.play();
+        }});
+
+        fetch("{words_url}").then(function(response) {{ return response.json(); }}).then(function(result) {{
+            data = result;
+            lineStarts = data.lines.map(function(line) {{ return line[0]; }});
+            spacer.style.height = (data.lines.length * ROW) + 'px';
+            document.getElementById('status').textContent = data.text.length + ' words';
+            render();
+        }}).catch(function(error) {{
+            document.getElementById('status').textContent = 'Could not load transcript: ' + error;
+        }});
+    </script>
+    """
@@ -0,0 +1,35 @@
+import struct
+import zipfile
+
+def copy_zip_entry_raw(source_fp, info, target_zip):
+    """Copy an entry's compressed bytes into another ZIP without recompressing them"""
+    source_fp.seek(info.header_offset)
+    header = source_fp.read(zipfile.sizeFileHeader)
+    name_length, extra_length = struct.unpack("<HH", header[26:30])
+    source_fp.seek(info.header_offset + zipfile.sizeFileHeader + name_length + extra_length)
+
+    new_info = zipfile.ZipInfo(info.filename, info.date_time)
+    new_info.compress_type = info.compress_type
+    new_info.CRC = info.CRC
+    new_info.compress_size = info.compress_size
+    new_info.file_size = info.file_size
+    new_info.external_attr = info.external_attr
+    new_info.create_system = info.create_system
+    # Sizes go in the local header, so no trailing data descriptor
+    new_info.flag_bits = info.flag_bits & ~0x08
+
+    target_fp = target_zip.fp
+    target_fp.seek(target_zip.start_dir)
+    new_info.header_offset = target_fp.tell()
+    target_fp.write(new_info.FileHeader())
+    remaining = info.compress_size
+    while remaining > 0:
+        chunk = source_fp.read(min(remaining, 1024 * 1024))
+        if not chunk:
+            raise ValueError(f"Truncated entry in previous export: {info.filename}")
+        target_fp.write(chunk)
+        remaining -= len(chunk)
+    target_zip.filelist.append(new_info)
+    target_zip.NameToInfo[new_info.filename] = new_info
+    target_zip.start_dir = target_fp.tell()
+    target_zip._didModify = True